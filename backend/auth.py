@@ -2,16 +2,33 @@
 Authentication utilities for Host users
 """
 import os
+import time
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from database import get_supabase_client
+from cache import TTLCache
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with a different cost factor are transparently rehashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))  # Max concurrent bcrypt operations
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
@@ -21,6 +38,14 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# Verified-token and host-record caches so authenticated requests skip the JWT
+# decode and the hosts lookup on repeat calls
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+HOST_CACHE_TTL_SECONDS = int(os.getenv("HOST_CACHE_TTL_SECONDS", "300"))
+_token_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl_seconds=TOKEN_CACHE_TTL_SECONDS)  # sha256(token) -> host_id
+_host_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl_seconds=HOST_CACHE_TTL_SECONDS)  # host_id -> host record
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
@@ -32,6 +57,24 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the hashing pool
+    
+    Returns:
+        (valid, new_hash) - new_hash is set when the stored hash should be
+        replaced because the configured cost factor changed
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -58,11 +101,15 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def get_current_host(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    """Get the current authenticated host from JWT token"""
-    token = credentials.credentials
+def get_token_host_id(token: str) -> str:
+    """Get the host id from a JWT, using the verified-token cache"""
+    token_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    host_id = _token_cache.get(token_key)
+    if host_id is not None:
+        return host_id
+    
     payload = decode_token(token)
-    host_id: str = payload.get("sub")
+    host_id = payload.get("sub")
     
     if host_id is None:
         raise HTTPException(
@@ -70,17 +117,46 @@ async def get_current_host(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid authentication credentials",
         )
     
-    # Verify host exists in database
-    supabase = get_supabase_client()
-    response = supabase.table("hosts").select("id, email, name").eq("id", host_id).execute()
+    # Never cache a token past its own expiry
+    ttl = TOKEN_CACHE_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        _token_cache.set(token_key, host_id, ttl_seconds=ttl)
     
-    if not response.data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Host not found",
-        )
-    
-    return response.data[0]
+    return host_id
+
+
+def cache_host(host: dict):
+    """Store a host record (id, email, name) in the host cache"""
+    _host_cache.set(str(host["id"]), {"id": host["id"], "email": host["email"], "name": host["name"]})
+
+
+def invalidate_host(host_id: str):
+    """Drop a cached host record; call whenever a host row changes or is deleted"""
+    _host_cache.pop(str(host_id))
+
+
+async def get_current_host(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Get the current authenticated host from JWT token"""
+    host_id = get_token_host_id(credentials.credentials)
+    
+    host = _host_cache.get(host_id)
+    if host is None:
+        # Verify host exists in database
+        supabase = get_supabase_client()
+        response = await supabase.table("hosts").select("id, email, name").eq("id", host_id).execute()
+        
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Host not found",
+            )
+        
+        host = response.data[0]
+        cache_host(host)
+    
+    return dict(host)
 
 
 async def register_host(email: str, password: str, name: str) -> dict:
@@ -88,7 +164,7 @@ async def register_host(email: str, password: str, name: str) -> dict:
     supabase = get_supabase_client()
     
     # Check if email already exists
-    existing = supabase.table("hosts").select("id").eq("email", email).execute()
+    existing = await supabase.table("hosts").select("id").eq("email", email).execute()
     if existing.data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,7 +172,7 @@ async def register_host(email: str, password: str, name: str) -> dict:
         )
     
     # Hash password
-    password_hash = get_password_hash(password)
+    password_hash = await get_password_hash_async(password)
     
     # Create host
     host_data = {
@@ -105,7 +181,7 @@ async def register_host(email: str, password: str, name: str) -> dict:
         "password_hash": password_hash
     }
     
-    response = supabase.table("hosts").insert(host_data).execute()
+    response = await supabase.table("hosts").insert(host_data).execute()
     
     if not response.data:
         raise HTTPException(
@@ -114,6 +190,7 @@ async def register_host(email: str, password: str, name: str) -> dict:
         )
     
     host = response.data[0]
+    cache_host(host)
     
     # Generate JWT token
     access_token = create_access_token(data={"sub": str(host["id"])})
@@ -134,7 +211,7 @@ async def login_host(email: str, password: str) -> dict:
     supabase = get_supabase_client()
     
     # Find host by email
-    response = supabase.table("hosts").select("id, email, name, password_hash").eq("email", email).execute()
+    response = await supabase.table("hosts").select("id, email, name, password_hash").eq("email", email).execute()
     
     if not response.data:
         raise HTTPException(
@@ -145,12 +222,20 @@ async def login_host(email: str, password: str) -> dict:
     host = response.data[0]
     
     # Verify password
-    if not verify_password(password, host["password_hash"]):
+    valid, new_hash = await verify_password_async(password, host["password_hash"])
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    # Rehash with the current cost factor
+    if new_hash:
+        await supabase.table("hosts").update({"password_hash": new_hash}).eq("id", host["id"]).execute()
+        invalidate_host(host["id"])
+    
+    cache_host(host)
+    
     # Generate JWT token
     access_token = create_access_token(data={"sub": str(host["id"])})
     
@@ -0,0 +1,251 @@
+"""
+API load benchmark against local stand-ins for Supabase, Groq and edge-tts
+
+Runs the FastAPI app in-process (httpx ASGI transport, no network) with
+benchmarks.fakes in place of the external services, fires each scenario at a
+fixed concurrency and reports throughput, latency percentiles and Supabase
+round trips per request.
+
+Scenarios:
+    join              POST /api/participants/join (new participant each time)
+    call-host         POST /api/queue/call-host (fresh session each time)
+    dashboard-stats   GET  /api/dashboard/stats
+    dashboard-queue   GET  /api/dashboard/queue
+    process-audio     POST /process-audio (Whisper -> context -> Llama -> TTS)
+
+Usage (from backend/):
+    python -m benchmarks.bench_api --scenario all --requests 200 --concurrency 20
+    python -m benchmarks.bench_api --scenario process-audio --db-latency 0.01 --llm-latency 0.4
+"""
+import os
+import sys
+import math
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The real clients refuse to start without credentials; nothing leaves the process
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-service-role-key")
+os.environ.setdefault("GROQ_API_KEY", "bench-groq-key")
+
+import httpx  # noqa: E402
+from groq import AsyncGroq  # noqa: E402
+
+import auth  # noqa: E402
+import database  # noqa: E402
+import tts_cache  # noqa: E402
+import voice_pipeline  # noqa: E402
+import main  # noqa: E402
+from benchmarks.fakes import FakeCommunicate, FakeGroq, FakePostgrest  # noqa: E402
+
+SCENARIOS = ["join", "call-host", "dashboard-stats", "dashboard-queue", "process-audio"]
+
+ROOM_CONTEXT = (
+    "Project Atlas migrates the billing service to the new event pipeline.\n\n"
+    "Milestones: schema freeze in week 2, dual writes in week 4, cutover in week 6.\n\n"
+    "Risks: the legacy invoice exporter has no tests and the payments team is short-staffed."
+)
+
+# A few hundred bytes is enough; the fake Whisper never decodes it
+DUMMY_AUDIO = b"\x1a\x45\xdf\xa3" + bytes(512)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+class BenchEnvironment:
+    """Seeded fake Supabase plus a host, its rooms and their participants"""
+
+    def __init__(self, fake_db: FakePostgrest, hosts: int, rooms_per_host: int, participants_per_room: int):
+        self.fake_db = fake_db
+        self.hosts = []
+        self.rooms = []
+        self.sessions: List[str] = []
+
+        for h in range(hosts):
+            host = fake_db.insert("hosts", {
+                "email": f"host{h}@bench.local",
+                "name": f"Bench Host {h}",
+                "password_hash": "not-used"
+            })
+            self.hosts.append(host)
+            for r in range(rooms_per_host):
+                room = fake_db.insert("rooms", {
+                    "host_id": host["id"],
+                    "name": f"Room {h}-{r}",
+                    "context": ROOM_CONTEXT,
+                    "knowledge_base": {f"participant {p}": {"task": f"Task {p}"} for p in range(participants_per_room)},
+                    "invite_link": f"invite-{h}-{r}"
+                })
+                self.rooms.append(room)
+                for p in range(participants_per_room):
+                    self.sessions.append(self.add_session(room, f"participant {p}"))
+
+        self.host_tokens = [auth.create_access_token({"sub": host["id"]}) for host in self.hosts]
+
+    def add_session(self, room: dict, name: str) -> str:
+        """Create a participant with an active session, like /join does; returns the session id"""
+        participant = self.fake_db.insert("participants", {"room_id": room["id"], "name": name})
+        session = self.fake_db.insert("sessions", {"participant_id": participant["id"], "room_id": room["id"]})
+        self.fake_db.tables["participants"].update(participant, {"session_id": session["id"]})
+        return session["id"]
+
+
+def build_scenario(name: str, env: BenchEnvironment, requests: int) -> Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]:
+    """Get a function issuing request i of a scenario"""
+    if name == "join":
+        async def join(client, i):
+            room = env.rooms[i % len(env.rooms)]
+            return await client.post("/api/participants/join", json={
+                "invite_link": room["invite_link"],
+                "name": f"joiner {i}"
+            })
+        return join
+
+    if name == "call-host":
+        # One fresh session per request so every call creates a queue entry
+        sessions = [env.add_session(env.rooms[i % len(env.rooms)], f"caller {i}") for i in range(requests)]
+
+        async def call_host(client, i):
+            return await client.post("/api/queue/call-host", json={"session_id": sessions[i]})
+        return call_host
+
+    if name in ("dashboard-stats", "dashboard-queue"):
+        path = "/api/dashboard/stats" if name == "dashboard-stats" else "/api/dashboard/queue"
+
+        async def dashboard(client, i):
+            token = env.host_tokens[i % len(env.host_tokens)]
+            return await client.get(path, headers={"Authorization": f"Bearer {token}"})
+        return dashboard
+
+    if name == "process-audio":
+        async def process_audio(client, i):
+            session_id = env.sessions[i % len(env.sessions)]
+            return await client.post(
+                "/process-audio",
+                params={"session_id": session_id},
+                files={"audio": ("turn.webm", DUMMY_AUDIO, "audio/webm")}
+            )
+        return process_audio
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+async def run_scenario(client: httpx.AsyncClient, fake_db: FakePostgrest, request_fn, requests: int, concurrency: int) -> Dict[str, float]:
+    """Fire requests at a fixed concurrency; returns throughput, percentiles and error count"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(requests))
+    db_requests_before = fake_db.request_count
+
+    async def worker():
+        nonlocal errors
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                response = await request_fn(client, i)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            if failed:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies_ms, 0.50),
+        "p95_ms": percentile(latencies_ms, 0.95),
+        "p99_ms": percentile(latencies_ms, 0.99),
+        "db_per_request": (fake_db.request_count - db_requests_before) / requests
+    }
+
+
+async def _run(args) -> List[tuple]:
+    fake_db = FakePostgrest(latency_seconds=args.db_latency)
+    database._db_instance = database.Database(transport=fake_db)
+
+    fake_groq = FakeGroq(
+        stt_latency_seconds=args.stt_latency,
+        llm_first_token_seconds=args.llm_latency,
+        llm_token_seconds=args.llm_token_latency
+    )
+    voice_pipeline._groq_client = AsyncGroq(
+        api_key=os.environ["GROQ_API_KEY"],
+        http_client=httpx.AsyncClient(transport=fake_groq)
+    )
+
+    FakeCommunicate.latency_seconds = args.tts_latency
+    tts_dir = tempfile.TemporaryDirectory(prefix="sia-bench-tts-")
+    tts_cache._tts_cache = tts_cache.TTSCache(Path(tts_dir.name), tts_cache.TTS_CACHE_MAX_BYTES, tts_cache.TTS_CACHE_MAX_AGE_SECONDS)
+
+    env = BenchEnvironment(fake_db, args.hosts, args.rooms_per_host, args.participants_per_room)
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+
+    results = []
+    try:
+        with mock.patch.object(tts_cache.edge_tts, "Communicate", FakeCommunicate):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+                for name in scenarios:
+                    request_fn = build_scenario(name, env, args.requests)
+                    # Warm caches and connection pools outside the measurement
+                    for i in range(min(args.warmup, args.requests)):
+                        await request_fn(client, i)
+                    results.append((name, await run_scenario(client, fake_db, request_fn, args.requests, args.concurrency)))
+    finally:
+        await database.close_db()
+        await voice_pipeline._groq_client.close()
+        voice_pipeline._groq_client = None
+        tts_cache._tts_cache = None
+        tts_dir.cleanup()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline API load benchmark")
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before each scenario")
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--rooms-per-host", type=int, default=4)
+    parser.add_argument("--participants-per-room", type=int, default=10)
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per Supabase round trip")
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="seconds per Whisper call")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to the first Llama token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.005, help="seconds per further token")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds per edge-tts synthesis")
+    args = parser.parse_args()
+
+    # The per-request INFO logging would dominate the numbers
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"db {args.db_latency * 1000:.0f}ms, stt {args.stt_latency * 1000:.0f}ms, "
+          f"llm {args.llm_latency * 1000:.0f}ms, tts {args.tts_latency * 1000:.0f}ms")
+    print(f"{'scenario':<16} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7} {'db/req':>7}")
+    for name, result in asyncio.run(_run(args)):
+        print(f"{name:<16} {result['throughput']:>8.1f} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms "
+              f"{result['p99_ms']:>7.1f}ms {result['errors']:>7} {result['db_per_request']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
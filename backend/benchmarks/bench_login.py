@@ -0,0 +1,144 @@
+"""
+Login throughput benchmark
+
+Fires concurrent logins at auth.login_host against an in-memory hosts table and
+measures logins/second plus event loop lag (how late a 10 ms ticker wakes up).
+Runs once with bcrypt inline on the event loop, as login used to, and once
+with the hashing pool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login --logins 50 --concurrency 10 --rounds 12
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+
+TICK_SECONDS = 0.01
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _HostsTable:
+    """Just enough of the PostgREST query builder for login_host"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = {}
+        self.update_values = None
+
+    def select(self, *columns):
+        return self
+
+    def update(self, values):
+        self.update_values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    async def execute(self):
+        matches = [row for row in self.rows if all(row.get(k) == v for k, v in self.filters.items())]
+        if self.update_values:
+            for row in matches:
+                row.update(self.update_values)
+        return _Result([dict(row) for row in matches])
+
+
+class _FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return _HostsTable(self.rows)
+
+
+async def _measure_loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def _run(logins: int, concurrency: int, inline: bool) -> dict:
+    rows = [{
+        "id": "host-1",
+        "email": "host@example.com",
+        "name": "Host",
+        "password_hash": auth.pwd_context.hash("correct horse battery staple")
+    }]
+    supabase = _FakeSupabase(rows)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def verify_inline(plain, hashed):
+        # Old behaviour: bcrypt directly on the event loop
+        return auth.pwd_context.verify_and_update(plain, hashed)
+
+    async def one_login():
+        async with semaphore:
+            await auth.login_host("host@example.com", "correct horse battery staple")
+
+    stop = asyncio.Event()
+    lags: list = []
+    ticker = asyncio.create_task(_measure_loop_lag(stop, lags))
+
+    patches = [mock.patch.object(auth, "get_supabase_client", lambda: supabase)]
+    if inline:
+        patches.append(mock.patch.object(auth, "verify_password_async", verify_inline))
+
+    for patch in patches:
+        patch.start()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for patch in patches:
+            patch.stop()
+        stop.set()
+        await ticker
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "logins_per_second": logins / elapsed,
+        "lag_p50_ms": statistics.median(lags_ms),
+        "lag_p99_ms": lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))],
+        "lag_max_ms": lags_ms[-1]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput / event loop lag benchmark")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=auth.BCRYPT_ROUNDS, help="bcrypt cost factor")
+    args = parser.parse_args()
+
+    auth.pwd_context.update(
+        bcrypt__default_rounds=args.rounds,
+        bcrypt__min_rounds=args.rounds,
+        bcrypt__max_rounds=args.rounds
+    )
+
+    print(f"{args.logins} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}, "
+          f"{auth.PASSWORD_HASH_WORKERS} hash workers")
+    print(f"{'mode':<10} {'logins/s':>10} {'lag p50':>10} {'lag p99':>10} {'lag max':>10}")
+    for mode, inline in (("inline", True), ("pool", False)):
+        result = asyncio.run(_run(args.logins, args.concurrency, inline))
+        print(f"{mode:<10} {result['logins_per_second']:>10.1f} {result['lag_p50_ms']:>8.1f}ms "
+              f"{result['lag_p99_ms']:>8.1f}ms {result['lag_max_ms']:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+WebSocket fan-out soak test
+
+Starts the app under uvicorn in a child process, backed by the in-memory
+Supabase from benchmarks.fakes, then opens thousands of /ws/participant and
+/ws/host connections from this process and drives:
+    - notify_queue_update bursts to every room (fired inside the server)
+    - WebRTC signaling: participant offers and ICE candidates relayed to hosts
+
+Reports connect time, server memory per connection, delivery latency
+(p50/p95/p99, measured from a timestamp stamped into each message) and
+server event loop lag for each phase.
+
+Client and server share the machine; on small boxes the clients' own JSON
+parsing shows up in the latency numbers.
+
+Usage (from backend/):
+    python -m benchmarks.bench_websocket --hosts 20 --rooms-per-host 5 --participants-per-room 20
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import resource
+import threading
+import multiprocessing
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TICK_SECONDS = 0.01
+
+
+def _raise_fd_limit():
+    """Each connection needs a file descriptor on both ends"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current, but better than nothing off Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    """Count and p50/p95/p99/max of a list of seconds, in milliseconds"""
+    from benchmarks.bench_api import percentile
+
+    values_ms = sorted(value * 1000 for value in values)
+    return {
+        "count": len(values_ms),
+        "p50_ms": percentile(values_ms, 0.50),
+        "p95_ms": percentile(values_ms, 0.95),
+        "p99_ms": percentile(values_ms, 0.99),
+        "max_ms": values_ms[-1] if values_ms else 0.0
+    }
+
+
+# Server side (child process)
+
+def _serve(conn, args):
+    """Child process: seeded fake Supabase + uvicorn, controlled over a pipe"""
+    _raise_fd_limit()
+    os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+    os.environ.setdefault("SUPABASE_KEY", "bench-service-role-key")
+
+    import uvicorn
+    import database
+    import main
+    from benchmarks.bench_api import BenchEnvironment
+    from benchmarks.fakes import FakePostgrest
+    from routes.websocket import manager, notify_queue_update
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fake_db = FakePostgrest(latency_seconds=args.db_latency)
+    database._db_instance = database.Database(transport=fake_db)
+    env = BenchEnvironment(fake_db, args.hosts, args.rooms_per_host, args.participants_per_room)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    # Listen before reporting the port so early clients queue in the backlog instead of being refused
+    sock.listen(4096)
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning", ws="websockets", backlog=4096))
+    lags: List[float] = []
+
+    async def measure_loop_lag():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+    async def burst(size: int) -> float:
+        # Every room gets `size` queue updates at once, as if that many call-host requests landed together
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            notify_queue_update(room["id"], {"id": f"bench-{i}", "status": "waiting", "sent_at": time.time()}, "new")
+            for room in env.rooms for i in range(size)
+        ))
+        return time.perf_counter() - start
+
+    def stats() -> dict:
+        return {
+            "rss": _rss_bytes(),
+            "connections": {kind: len(connections) for kind, connections in manager.connections.items()},
+            "lag": _summary(lags)
+        }
+
+    def control(loop):
+        while True:
+            command, *params = conn.recv()
+            if command == "stats":
+                conn.send(stats())
+            elif command == "reset_lag":
+                lags.clear()
+                conn.send(None)
+            elif command == "burst":
+                conn.send(asyncio.run_coroutine_threadsafe(burst(*params), loop).result())
+            elif command == "stop":
+                server.should_exit = True
+                conn.send(None)
+                return
+
+    async def run():
+        ticker = asyncio.create_task(measure_loop_lag())
+        threading.Thread(target=control, args=(asyncio.get_running_loop(),), daemon=True).start()
+        conn.send({
+            "port": sock.getsockname()[1],
+            "rooms": {room["id"]: room["host_id"] for room in env.rooms},
+            "hosts": [host["id"] for host in env.hosts],
+            "sessions": [
+                (session["id"], session["room_id"])
+                for session in fake_db.rows("sessions")
+            ]
+        })
+        await server.serve(sockets=[sock])
+        ticker.cancel()
+
+    asyncio.run(run())
+
+
+# Client side
+
+class Recorder:
+    """Delivery latencies by message type"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+
+    def record(self, message_type: str, seconds: float):
+        self.latencies.setdefault(message_type, []).append(seconds)
+
+    def count(self, *message_types: str) -> int:
+        return sum(len(self.latencies.get(message_type, [])) for message_type in message_types)
+
+    def reset(self):
+        self.latencies.clear()
+
+
+async def _read(websocket, recorder: Recorder):
+    async for raw in websocket:
+        received_at = time.time()
+        message = json.loads(raw)
+        message_type = message.get("type")
+        if message_type == "queue_update":
+            payload = message.get("queue_item") or {}
+        elif message_type in ("webrtc_offer", "webrtc_ice_candidate"):
+            payload = message.get("offer") or message.get("candidate") or {}
+        elif message_type == "webrtc_ice_candidates":
+            # Coalesced by the server; count each candidate
+            for candidate in message.get("candidates", []):
+                if "sent_at" in candidate:
+                    recorder.record("webrtc_ice_candidate", received_at - candidate["sent_at"])
+            continue
+        else:
+            continue
+        if "sent_at" in payload:
+            recorder.record(message_type, received_at - payload["sent_at"])
+
+
+async def _wait_for(recorder: Recorder, expected: int, timeout: float, *message_types: str) -> int:
+    """Wait until `expected` messages of the given types arrived (or timeout); returns the count"""
+    deadline = time.perf_counter() + timeout
+    while recorder.count(*message_types) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    return recorder.count(*message_types)
+
+
+async def _connect_all(port: int, paths: List[str], recorder: Recorder, ramp: int):
+    """Open a connection per path (returned in path order), at most `ramp` handshakes in flight"""
+    import websockets
+
+    semaphore = asyncio.Semaphore(ramp)
+    connections = [None] * len(paths)
+    readers = []
+
+    async def open_one(i, path):
+        async with semaphore:
+            websocket = await websockets.connect(f"ws://127.0.0.1:{port}{path}", open_timeout=60, max_queue=None)
+            welcome = json.loads(await websocket.recv())
+            if welcome.get("type") != "connected":
+                raise RuntimeError(f"Unexpected welcome on {path}: {welcome}")
+            connections[i] = websocket
+            readers.append(asyncio.create_task(_read(websocket, recorder)))
+
+    await asyncio.gather(*(open_one(i, path) for i, path in enumerate(paths)))
+    return connections, readers
+
+
+async def _run_clients(conn, setup: dict, args) -> None:
+    port = setup["port"]
+    rooms: Dict[str, str] = setup["rooms"]
+    recorder = Recorder()
+
+    def server(*command):
+        conn.send(command)
+        return conn.recv()
+
+    baseline = server("stats")
+
+    # Hosts first so they are subscribed to their rooms before any traffic
+    start = time.perf_counter()
+    host_connections, host_readers = await _connect_all(port, [f"/ws/host/{host_id}" for host_id in setup["hosts"]], recorder, args.ramp)
+    participant_connections, participant_readers = await _connect_all(
+        port, [f"/ws/participant/{session_id}" for session_id, _ in setup["sessions"]], recorder, args.ramp
+    )
+    connect_seconds = time.perf_counter() - start
+    total_connections = len(host_connections) + len(participant_connections)
+
+    connected = server("stats")
+    per_connection = (connected["rss"] - baseline["rss"]) / max(total_connections, 1)
+    print(f"connections      {total_connections} ({len(host_connections)} hosts, {len(participant_connections)} participants)"
+          f" in {connect_seconds:.1f}s ({total_connections / connect_seconds:.0f}/s)")
+    print(f"server memory    {connected['rss'] / 2**20:.1f} MiB, {per_connection / 1024:.1f} KiB per connection")
+    print()
+    print(f"{'phase':<12} {'delivered':>12} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'lag p99':>9} {'lag max':>9}")
+
+    def report(phase: str, delivered: int, expected: int, latencies: List[float], lag: dict):
+        summary = _summary(latencies)
+        print(f"{phase:<12} {delivered:>6}/{expected:<5} {summary['p50_ms']:>7.1f}ms {summary['p95_ms']:>7.1f}ms "
+              f"{summary['p99_ms']:>7.1f}ms {summary['max_ms']:>7.1f}ms {lag['p99_ms']:>7.1f}ms {lag['max_ms']:>7.1f}ms")
+
+    # Queue update bursts: every subscriber of every room gets burst_size messages per burst
+    # (a host is subscribed once per room it owns)
+    subscribers = len(rooms) + len(participant_connections)
+    for b in range(args.bursts):
+        recorder.reset()
+        server("reset_lag")
+        expected = args.burst_size * subscribers
+        server("burst", args.burst_size)
+        delivered = await _wait_for(recorder, expected, args.timeout, "queue_update")
+        report(f"burst {b + 1}", delivered, expected, recorder.latencies.get("queue_update", []), server("stats")["lag"])
+        await asyncio.sleep(args.interval)
+
+    # Signaling: participants send an offer then a trickle of ICE candidates to their host
+    recorder.reset()
+    server("reset_lag")
+    # Spread signaling across rooms (sessions are seeded room by room)
+    per_room = args.participants_per_room
+    order = sorted(range(len(participant_connections)), key=lambda i: (i % per_room, i // per_room))
+    signaling = [(setup["sessions"][i], participant_connections[i]) for i in order[:args.signaling_sessions]]
+
+    async def signal(session, websocket):
+        _, room_id = session
+        host_id = rooms[room_id]
+        await websocket.send(json.dumps({"type": "webrtc_offer", "offer": {"type": "offer", "sdp": "v=0" + "x" * 2000, "sent_at": time.time()}}))
+        for i in range(args.ice_candidates):
+            await websocket.send(json.dumps({
+                "type": "webrtc_ice_candidate",
+                "target_id": host_id,
+                "candidate": {"candidate": f"candidate:{i} 1 udp 2122260223 10.0.0.1 5{i:04d} typ host", "sent_at": time.time()}
+            }))
+
+    await asyncio.gather(*(signal(session, websocket) for session, websocket in signaling))
+    expected = len(signaling) * (1 + args.ice_candidates)
+    delivered = await _wait_for(recorder, expected, args.timeout, "webrtc_offer", "webrtc_ice_candidate")
+    report("signaling", delivered, expected,
+           recorder.latencies.get("webrtc_offer", []) + recorder.latencies.get("webrtc_ice_candidate", []),
+           server("stats")["lag"])
+
+    for reader in host_readers + participant_readers:
+        reader.cancel()
+    await asyncio.gather(*(websocket.close() for websocket in host_connections + participant_connections), return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out soak test")
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--rooms-per-host", type=int, default=5)
+    parser.add_argument("--participants-per-room", type=int, default=20)
+    parser.add_argument("--ramp", type=int, default=200, help="max WebSocket handshakes in flight")
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=5, help="queue updates per room per burst")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between bursts")
+    parser.add_argument("--signaling-sessions", type=int, default=500, help="participants that send an offer")
+    parser.add_argument("--ice-candidates", type=int, default=5, help="ICE candidates per offer")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per Supabase round trip")
+    parser.add_argument("--timeout", type=float, default=60.0, help="max seconds to wait for a phase's deliveries")
+    args = parser.parse_args()
+
+    _raise_fd_limit()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rooms = args.hosts * args.rooms_per_host
+    print(f"{args.hosts} hosts, {rooms} rooms, {rooms * args.participants_per_room} participants, "
+          f"db {args.db_latency * 1000:.0f}ms")
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(target=_serve, args=(child_conn, args), daemon=True)
+    process.start()
+    try:
+        setup = parent_conn.recv()
+        asyncio.run(_run_clients(parent_conn, setup, args))
+    finally:
+        if process.is_alive():
+            parent_conn.send(("stop",))
+            parent_conn.recv()
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,623 @@
+"""
+Local stand-ins for Supabase, Groq and edge-tts
+
+FakePostgrest is an httpx transport speaking enough of the PostgREST protocol
+for the queries in routes/ (select/insert/upsert/update/delete, eq/neq/gt/lt/in/is
+filters, order, limit, Prefer: count=exact, rpc, many-to-one embeds like
+rooms!fk_room(host_id), resolved through the schema's foreign keys) over in-memory copies of the
+tables in supabase_setup.sql, with the host_stats triggers emulated. Plug it in
+with database.Database(transport=...), so the real supabase/postgrest client
+code still runs.
+
+FakeGroq is an httpx transport for the Groq transcription and chat completion
+endpoints (including SSE streaming), for AsyncGroq(http_client=...).
+FakeCommunicate replaces edge_tts.Communicate.
+
+All three sleep for a configurable latency instead of doing real work.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import string
+import asyncio
+import itertools
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qsl
+import httpx
+
+# Column defaults from supabase_setup.sql
+TABLE_DEFAULTS: Dict[str, Dict[str, Callable[[], Any]]] = {
+    "hosts": {"created_at": lambda: _now(), "updated_at": lambda: _now()},
+    "rooms": {
+        "context": lambda: None,
+        "knowledge_base": lambda: {},
+        "tone": lambda: "professional",
+        "created_at": lambda: _now(),
+        "updated_at": lambda: _now(),
+        "active": lambda: True,
+    },
+    "participants": {"session_id": lambda: None, "joined_at": lambda: _now(), "status": lambda: "active"},
+    "sessions": {"started_at": lambda: _now(), "ended_at": lambda: None, "transcript": lambda: []},
+    "queue": {"requested_at": lambda: _now(), "status": lambda: "waiting", "accepted_at": lambda: None},
+    "transcript_turns": {"created_at": lambda: _now()},
+    "host_stats": {
+        "total_rooms": lambda: 0,
+        "active_rooms": lambda: 0,
+        "total_participants": lambda: 0,
+        "active_sessions": lambda: 0,
+        "pending_queue_requests": lambda: 0,
+    },
+}
+
+# Tables whose primary key is not `id`
+PRIMARY_KEYS = {"host_stats": "host_id"}
+
+# Tables with a BIGSERIAL id instead of a UUID
+SERIAL_TABLES = {"transcript_turns"}
+
+# UNIQUE columns (a duplicate insert or update answers 409 like PostgREST does)
+UNIQUE_COLUMNS = {
+    "hosts": ["email"],
+    "rooms": ["invite_link"],
+    "participants": ["session_id"],
+}
+
+# Foreign keys in supabase_setup.sql: table -> referenced table -> [(constraint, column)]
+# Inline REFERENCES get Postgres' default <table>_<column>_fkey name. Where a table has
+# two constraints to the same target, PostgREST needs a !constraint hint to embed it.
+FOREIGN_KEYS = {
+    "rooms": {"hosts": [("rooms_host_id_fkey", "host_id")]},
+    "participants": {"rooms": [("participants_room_id_fkey", "room_id"), ("fk_room", "room_id")]},
+    "sessions": {
+        "participants": [("sessions_participant_id_fkey", "participant_id"), ("fk_participant", "participant_id")],
+        "rooms": [("sessions_room_id_fkey", "room_id"), ("fk_room", "room_id")],
+    },
+    "queue": {
+        "participants": [("queue_participant_id_fkey", "participant_id"), ("fk_participant", "participant_id")],
+        "rooms": [("queue_room_id_fkey", "room_id"), ("fk_room", "room_id")],
+    },
+    "transcript_turns": {"sessions": [("transcript_turns_session_id_fkey", "session_id")]},
+    "host_stats": {"hosts": [("host_stats_host_id_fkey", "host_id")]},
+}
+
+# Columns with an index in supabase_setup.sql; equality filters on these skip the full scan
+INDEXED_COLUMNS = {
+    "hosts": ["email"],
+    "rooms": ["host_id", "invite_link"],
+    "participants": ["room_id", "session_id"],
+    "sessions": ["participant_id", "room_id"],
+    "queue": ["room_id", "participant_id", "status"],
+    "transcript_turns": ["session_id"],
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _literal(value: Any) -> str:
+    """Render a column value the way PostgREST filter literals are written"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _coerce(literal: str, like: Any) -> Any:
+    """Convert a filter literal to the type of the column value it is compared with"""
+    if isinstance(like, bool):
+        return literal.lower() == "true"
+    if isinstance(like, int):
+        return int(literal)
+    if isinstance(like, float):
+        return float(literal)
+    return literal
+
+
+def _postgrest_error(status_code: int, code: str, message: str) -> httpx.Response:
+    return httpx.Response(status_code, json={"code": code, "message": message, "details": None, "hint": None})
+
+
+class RaisedException(Exception):
+    """RAISE EXCEPTION ... USING ERRCODE inside a fake database function"""
+
+    def __init__(self, code: str, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+class _Table:
+    """Rows of one table plus hash indexes on its indexed and unique columns"""
+
+    def __init__(self, name: str, on_change: Optional[Callable[[str, Optional[dict], Optional[dict]], None]] = None):
+        self.name = name
+        self.key = PRIMARY_KEYS.get(name, "id")
+        # Called with (table, old row, new row) after every write, like an AFTER ROW trigger
+        self.on_change = on_change
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.index_columns = set(INDEXED_COLUMNS.get(name, [])) | set(UNIQUE_COLUMNS.get(name, []))
+        self.indexes: Dict[str, Dict[str, Set[Any]]] = {column: {} for column in self.index_columns}
+
+    def _index_add(self, row: Dict[str, Any]):
+        for column in self.index_columns:
+            self.indexes[column].setdefault(_literal(row.get(column)), set()).add(row[self.key])
+
+    def _index_remove(self, row: Dict[str, Any]):
+        for column in self.index_columns:
+            ids = self.indexes[column].get(_literal(row.get(column)))
+            if ids is not None:
+                ids.discard(row[self.key])
+
+    def violates_unique(self, row: Dict[str, Any]) -> Optional[str]:
+        for column in UNIQUE_COLUMNS.get(self.name, []):
+            value = row.get(column)
+            if value is None:
+                continue
+            if self.indexes[column].get(_literal(value), set()) - {row.get(self.key)}:
+                return column
+        return None
+
+    def insert(self, row: Dict[str, Any]):
+        self.rows[row[self.key]] = row
+        self._index_add(row)
+        if self.on_change:
+            self.on_change(self.name, None, row)
+
+    def update(self, row: Dict[str, Any], values: Dict[str, Any]):
+        old = dict(row)
+        self._index_remove(row)
+        row.update(values)
+        self._index_add(row)
+        if self.on_change:
+            self.on_change(self.name, old, row)
+
+    def delete(self, row: Dict[str, Any]):
+        self._index_remove(row)
+        del self.rows[row[self.key]]
+        if self.on_change:
+            self.on_change(self.name, row, None)
+
+    def candidates(self, filters: List[tuple]) -> List[Dict[str, Any]]:
+        """Narrow the scan with the first indexed eq/in filter, if any"""
+        for column, operator, value in filters:
+            if operator not in ("eq", "in"):
+                continue
+            values = [value] if operator == "eq" else value
+            if column == self.key:
+                return [self.rows[v] for v in values if v in self.rows]
+            if column in self.index_columns:
+                ids: Set[Any] = set()
+                for v in values:
+                    ids |= self.indexes[column].get(v, set())
+                return [self.rows[i] for i in ids]
+        return list(self.rows.values())
+
+
+class FakePostgrest(httpx.AsyncBaseTransport):
+    """In-memory PostgREST for the Sia schema"""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.tables: Dict[str, _Table] = {name: _Table(name, self._maintain_host_stats) for name in TABLE_DEFAULTS}
+        self._serial = itertools.count(1)
+        self.request_count = 0
+        # RPC name -> function(fake, params) returning JSON-serializable data
+        self.rpc_functions: Dict[str, Callable[["FakePostgrest", Dict[str, Any]], Any]] = {
+            "get_session_context": _rpc_get_session_context,
+            "get_next_queue_position": _rpc_get_next_queue_position,
+            "generate_invite_link": lambda fake, params: "".join(random.choices(string.ascii_letters + string.digits, k=16)),
+            "transition_queue_request": _rpc_transition_queue_request,
+            "claim_queue_engine": _rpc_claim_queue_engine,
+            "release_queue_engine": _rpc_release_queue_engine,
+        }
+        # The queue_engine_lease row: (holder, expires at on the monotonic clock)
+        self.queue_engine_lease: Optional[tuple] = None
+
+    # Direct access for seeding data and assertions
+
+    def insert(self, table: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a row with the schema's defaults applied; returns the stored row"""
+        row = {column: default() for column, default in TABLE_DEFAULTS[table].items()}
+        row.update(values)
+        if table not in PRIMARY_KEYS and "id" not in row:
+            row["id"] = next(self._serial) if table in SERIAL_TABLES else str(uuid.uuid4())
+        self.tables[table].insert(row)
+        return row
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        """All rows of a table"""
+        return list(self.tables[table].rows.values())
+
+    def get(self, table: str, row_id: Any) -> Optional[Dict[str, Any]]:
+        """One row by id"""
+        return self.tables[table].rows.get(row_id)
+
+    def _maintain_host_stats(self, table: str, old: Optional[dict], new: Optional[dict]):
+        """The host_stats triggers from supabase_setup.sql: take back the old row's counts, add the new row's"""
+        for row, sign in ((old, -1), (new, 1)):
+            if row is None:
+                continue
+            if table == "rooms":
+                host_id = row.get("host_id")
+                counts = {"total_rooms": 1, "active_rooms": 1 if row.get("active") else 0}
+            elif table in ("participants", "sessions", "queue"):
+                room = self.get("rooms", row.get("room_id"))
+                host_id = room["host_id"] if room else None
+                if table == "participants":
+                    counts = {"total_participants": 1}
+                elif table == "sessions":
+                    counts = {"active_sessions": 1 if row.get("ended_at") is None else 0}
+                else:
+                    counts = {"pending_queue_requests": 1 if row.get("status") == "waiting" else 0}
+            else:
+                return
+            if host_id is None:
+                continue
+            stats = self.get("host_stats", host_id) or self.insert("host_stats", {"host_id": host_id})
+            for column, count in counts.items():
+                stats[column] += sign * count
+
+    # httpx transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.request_count += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+
+        parts = [part for part in request.url.path.split("/") if part]
+        if len(parts) < 3 or parts[:2] != ["rest", "v1"]:
+            return _postgrest_error(404, "PGRST000", f"Unknown path {request.url.path}")
+
+        body = json.loads(request.content) if request.content else None
+        if parts[2] == "rpc" and len(parts) == 4:
+            function = self.rpc_functions.get(parts[3])
+            if function is None:
+                return _postgrest_error(404, "PGRST202", f"Could not find the function public.{parts[3]}")
+            try:
+                return httpx.Response(200, json=function(self, body or {}))
+            except RaisedException as e:
+                return _postgrest_error(e.status_code, e.code, e.message)
+
+        table = self.tables.get(parts[2])
+        if table is None:
+            return _postgrest_error(404, "42P01", f'relation "public.{parts[2]}" does not exist')
+
+        try:
+            params = parse_qsl(request.url.query.decode(), keep_blank_values=True)
+            select, filters, order, limit, offset = self._parse_params(params)
+        except ValueError as e:
+            return _postgrest_error(400, "PGRST100", str(e))
+
+        try:
+            # PostgREST resolves embeds before running the query, so a bad one fails even with no rows
+            self._embeds(table.name, select)
+        except RaisedException as e:
+            return _postgrest_error(e.status_code, e.code, e.message)
+
+        if request.method == "POST":
+            return self._handle_insert(table, body, "resolution=merge-duplicates" in request.headers.get("prefer", ""))
+
+        matched = [row for row in table.candidates(filters) if self._matches(row, filters)]
+
+        if request.method == "GET":
+            total = len(matched)
+            for column, descending in reversed(order):
+                # NULLs sort last ascending, first descending, as in Postgres
+                matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=descending)
+            matched = matched[offset:offset + limit if limit is not None else None]
+            headers = {}
+            if "count=exact" in request.headers.get("prefer", ""):
+                headers["content-range"] = f"{offset}-{offset + len(matched) - 1}/{total}" if matched else f"*/{total}"
+            return httpx.Response(200, json=[self._project(table.name, row, select) for row in matched], headers=headers)
+
+        if request.method == "PATCH":
+            for row in matched:
+                conflict = table.violates_unique({**row, **body})
+                if conflict:
+                    return _postgrest_error(409, "23505", f"duplicate key value violates unique constraint on {conflict}")
+            for row in matched:
+                table.update(row, body)
+            return httpx.Response(200, json=[dict(row) for row in matched])
+
+        if request.method == "DELETE":
+            for row in matched:
+                table.delete(row)
+            return httpx.Response(200, json=[dict(row) for row in matched])
+
+        return _postgrest_error(405, "PGRST000", f"Unsupported method {request.method}")
+
+    def _handle_insert(self, table: _Table, body: Any, merge_duplicates: bool = False) -> httpx.Response:
+        values_list = body if isinstance(body, list) else [body]
+        for values in values_list:
+            if values.get(table.key) in table.rows and not merge_duplicates:
+                return _postgrest_error(409, "23505", f"duplicate key value violates unique constraint on {table.key}")
+            conflict = table.violates_unique(values)
+            if conflict:
+                return _postgrest_error(409, "23505", f"duplicate key value violates unique constraint on {conflict}")
+        inserted = []
+        for values in values_list:
+            existing = table.rows.get(values.get(table.key))
+            if existing is not None:
+                # Upsert on the primary key
+                table.update(existing, values)
+                inserted.append(dict(existing))
+            else:
+                inserted.append(dict(self.insert(table.name, values)))
+        return httpx.Response(201, json=inserted)
+
+    @staticmethod
+    def _parse_params(params: List[tuple]):
+        select = None
+        filters = []
+        order = []
+        limit = None
+        offset = 0
+        for key, value in params:
+            if key == "select":
+                # Split on commas outside embeds: "id, rooms(host_id, name)"
+                select = None if value == "*" else [column.strip() for column in re.split(r",(?![^(]*\))", value)]
+            elif key == "order":
+                for term in value.split(","):
+                    column, _, direction = term.partition(".")
+                    order.append((column, direction.startswith("desc")))
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            elif key == "columns":
+                continue
+            else:
+                operator, _, literal = value.partition(".")
+                if operator == "in":
+                    literal = [item.strip().strip('"') for item in literal.strip("()").split(",") if item.strip()]
+                elif operator not in ("eq", "neq", "gt", "gte", "lt", "lte", "is"):
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                filters.append((key, operator, literal))
+        return select, filters, order, limit, offset
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], filters: List[tuple]) -> bool:
+        for column, operator, literal in filters:
+            value = row.get(column)
+            if operator == "is":
+                if _literal(value) != literal.lower():
+                    return False
+                continue
+            if operator == "in":
+                if _literal(value) not in literal:
+                    return False
+                continue
+            if value is None:
+                return False
+            other = _coerce(literal, value)
+            if operator == "eq" and not value == other:
+                return False
+            if operator == "neq" and not value != other:
+                return False
+            if operator == "gt" and not value > other:
+                return False
+            if operator == "gte" and not value >= other:
+                return False
+            if operator == "lt" and not value < other:
+                return False
+            if operator == "lte" and not value <= other:
+                return False
+        return True
+
+    def _project(self, table: str, row: Dict[str, Any], select: Optional[List[str]]) -> Dict[str, Any]:
+        if select is None:
+            return dict(row)
+        embeds = self._embeds(table, select)
+        projected = {}
+        for column in select:
+            if column not in embeds:
+                projected[column] = row.get(column)
+                continue
+            target, foreign_key, columns = embeds[column]
+            parent = self.get(target, row.get(foreign_key))
+            projected[target] = self._project(target, parent, columns) if parent else None
+        return projected
+
+    def _embeds(self, table: str, select: Optional[List[str]]) -> Dict[str, tuple]:
+        """Embedded resources of a select: term -> (table, foreign key column, columns)"""
+        embeds = {}
+        for column in select or []:
+            embed = re.fullmatch(r"(\w+)(?:!(\w+))?\((.*)\)", column)
+            if embed is None:
+                continue
+            target, hint, columns = embed.groups()
+            columns = self._parse_params([("select", columns)])[0]
+            self._embeds(target, columns)
+            embeds[column] = (target, self._embed_column(table, target, hint), columns)
+        return embeds
+
+    @staticmethod
+    def _embed_column(table: str, target: str, hint: Optional[str]) -> str:
+        """Foreign key column for a many-to-one embed, failing like PostgREST on a missing or ambiguous one"""
+        keys = FOREIGN_KEYS.get(table, {}).get(target, [])
+        if hint is not None:
+            keys = [key for key in keys if key[0] == hint]
+        if not keys:
+            raise RaisedException("PGRST200", f"Could not find a relationship between '{table}' and '{target}' in the schema cache")
+        if len(keys) > 1:
+            raise RaisedException(
+                "PGRST201",
+                f"Could not embed because more than one relationship was found for '{table}' and '{target}'",
+                status_code=300
+            )
+        return keys[0][1]
+
+
+def _rpc_get_session_context(fake: FakePostgrest, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    session = fake.get("sessions", params.get("p_session_id"))
+    if session is None:
+        return None
+    participant = fake.get("participants", session["participant_id"])
+    room = fake.get("rooms", session["room_id"])
+    host = fake.get("hosts", room["host_id"]) if room else None
+    if participant is None or room is None or host is None:
+        return None
+    return {
+        "session_id": session["id"],
+        "participant_id": participant["id"],
+        "participant_name": participant["name"],
+        "room_id": room["id"],
+        "room_name": room["name"],
+        "room_context": room.get("context"),
+        "knowledge_base": room.get("knowledge_base"),
+        "tone": room.get("tone"),
+        "room_updated_at": room.get("updated_at"),
+        "host_id": host["id"],
+        "host_name": host["name"],
+    }
+
+
+def _rpc_get_next_queue_position(fake: FakePostgrest, params: Dict[str, Any]) -> int:
+    positions = [
+        row["position"] for row in fake.tables["queue"].candidates([("room_id", "eq", params.get("p_room_id"))])
+        if row["room_id"] == params.get("p_room_id") and row["status"] == "waiting"
+    ]
+    return max(positions, default=0) + 1
+
+
+def _rpc_transition_queue_request(fake: FakePostgrest, params: Dict[str, Any]) -> Dict[str, Any]:
+    new_status = params.get("p_status")
+    if new_status not in ("accepted", "declined"):
+        raise RaisedException("22023", f"Invalid queue status: {new_status}")
+    item = fake.get("queue", params.get("p_queue_id"))
+    if item is None:
+        raise RaisedException("P0002", "Queue request not found")
+    room = fake.get("rooms", item["room_id"])
+    if room is None or room["host_id"] != params.get("p_host_id"):
+        # PostgREST answers 42501 with 403 for an authenticated role
+        raise RaisedException("42501", "Not authorized to change this request", 403)
+    if item["status"] != "waiting":
+        raise RaisedException("55000", f"Queue request already {item['status']}")
+    values = {"status": new_status}
+    if new_status == "accepted":
+        values["accepted_at"] = _now()
+    fake.tables["queue"].update(item, values)
+    participant = fake.get("participants", item["participant_id"])
+    return {
+        "queue_id": item["id"],
+        "room_id": item["room_id"],
+        "participant_id": item["participant_id"],
+        "session_id": participant.get("session_id") if participant else None,
+        "status": new_status,
+    }
+
+
+def _rpc_claim_queue_engine(fake: FakePostgrest, params: Dict[str, Any]) -> bool:
+    holder, now = params.get("p_holder"), time.monotonic()
+    lease = fake.queue_engine_lease
+    if lease is not None and lease[0] != holder and lease[1] >= now:
+        return False
+    fake.queue_engine_lease = (holder, now + params.get("p_lease_seconds"))
+    return True
+
+
+def _rpc_release_queue_engine(fake: FakePostgrest, params: Dict[str, Any]) -> None:
+    if fake.queue_engine_lease is not None and fake.queue_engine_lease[0] == params.get("p_holder"):
+        fake.queue_engine_lease = None
+
+
+class FakeGroq(httpx.AsyncBaseTransport):
+    """Groq API stand-in: Whisper transcription and (streaming) chat completions"""
+
+    def __init__(
+        self,
+        stt_latency_seconds: float = 0.3,
+        llm_first_token_seconds: float = 0.2,
+        llm_token_seconds: float = 0.005,
+        transcript: str = "Can you give me an update on the project timeline?",
+        reply: str = "The backend work is on track. Testing starts next week. Anything else you need?",
+        unique_replies: bool = True
+    ):
+        self.stt_latency_seconds = stt_latency_seconds
+        self.llm_first_token_seconds = llm_first_token_seconds
+        self.llm_token_seconds = llm_token_seconds
+        self.transcript = transcript
+        self.reply = reply
+        # A different reply per call keeps the TTS cache from turning every turn into a hit
+        self.unique_replies = unique_replies
+        self._replies = itertools.count(1)
+
+    def _next_reply(self) -> str:
+        if self.unique_replies:
+            return f"{self.reply} (#{next(self._replies)})"
+        return self.reply
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/audio/transcriptions"):
+            await asyncio.sleep(self.stt_latency_seconds)
+            return httpx.Response(200, json={"text": self.transcript})
+
+        if path.endswith("/chat/completions"):
+            body = json.loads(request.content)
+            reply = self._next_reply()
+            tokens = reply.split(" ")
+            if body.get("stream"):
+                return httpx.Response(
+                    200,
+                    headers={"content-type": "text/event-stream"},
+                    content=self._stream_reply(body["model"], tokens)
+                )
+            await asyncio.sleep(self.llm_first_token_seconds + self.llm_token_seconds * len(tokens))
+            return httpx.Response(200, json={
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+
+        return httpx.Response(404, json={"error": {"message": f"Unknown path {path}"}})
+
+    async def _stream_reply(self, model: str, tokens: List[str]):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        await asyncio.sleep(self.llm_first_token_seconds)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.llm_token_seconds)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token if i == 0 else f" {token}"}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+        yield b"data: [DONE]\n\n"
+
+
+class FakeCommunicate:
+    """edge_tts.Communicate stand-in producing dummy mp3 bytes after a delay"""
+
+    # Class-level so the benchmark can configure it before patching it in
+    latency_seconds = 0.3
+    chunks = 8
+    chunk_bytes = 4096
+
+    def __init__(self, text: str, voice: str, **kwargs):
+        self.text = text
+        self.voice = voice
+
+    async def stream(self):
+        # Roughly: the first chunk takes most of the latency, the rest trickle in
+        await asyncio.sleep(self.latency_seconds / 2)
+        for _ in range(self.chunks):
+            await asyncio.sleep(self.latency_seconds / 2 / self.chunks)
+            yield {"type": "audio", "data": b"\xff\xfb" + bytes(self.chunk_bytes - 2)}
+
+    async def save(self, audio_fname: str):
+        with open(audio_fname, "wb") as f:
+            async for message in self.stream():
+                f.write(message["data"])
@@ -1,17 +1,103 @@
 """
 Context Engine - Dynamic prompt generation based on room context and participant info
 """
+import os
 import logging
 from typing import Dict, Any, Optional
 from database import get_supabase_client
+from cache import TTLCache
+from knowledge_index import RoomIndex, build_room_index, get_room_index, normalize_key
 
 logger = logging.getLogger(__name__)
 
+# Per-session context cache (session/participant/room/host rows don't change mid-conversation)
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "600"))
+CONTEXT_CACHE_MAX_SESSIONS = int(os.getenv("CONTEXT_CACHE_MAX_SESSIONS", "10000"))
+_context_cache = TTLCache(max_size=CONTEXT_CACHE_MAX_SESSIONS, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS)
 
-def get_participant_context(session_id: str) -> Optional[Dict[str, Any]]:
+# Compiled prompt cache keyed on (room_id, room updated_at, participant key); a room
+# update bumps updated_at, so stale prompts are never served and simply age out
+PROMPT_CACHE_MAX_SIZE = int(os.getenv("PROMPT_CACHE_MAX_SIZE", "5000"))
+PROMPT_CACHE_TTL_SECONDS = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+_prompt_cache = TTLCache(max_size=PROMPT_CACHE_MAX_SIZE, ttl_seconds=PROMPT_CACHE_TTL_SECONDS)
+
+# Stand in for the participant's display name and the retrieved project context inside compiled prompts
+PARTICIPANT_NAME_PLACEHOLDER = "\x00participant_name\x00"
+ROOM_CONTEXT_PLACEHOLDER = "\x00room_context\x00"
+
+
+async def get_participant_context(session_id: str) -> Optional[Dict[str, Any]]:
     """
     Get all context information for a participant session
     
+    Served from the per-session cache after the first lookup; see
+    invalidate_session() and invalidate_room() for when entries are dropped.
+    
+    Returns:
+        Same dict as fetch_participant_context(), or None if not found
+    """
+    context = _context_cache.get(session_id)
+    if context is not None:
+        return context
+    
+    context = await fetch_participant_context(session_id)
+    if context is not None:
+        _context_cache.set(session_id, context)
+    return context
+
+
+async def invalidate_session(session_id: str):
+    """Drop the cached context for a session (e.g. when it ends), on every worker"""
+    _drop_session(session_id)
+    await _publish_invalidation({"session_id": session_id})
+
+
+async def invalidate_room(room_id: str):
+    """Drop cached context for every session in a room (e.g. when the room changes), on every worker"""
+    _drop_room(room_id)
+    await _publish_invalidation({"room_id": room_id})
+
+
+def handle_invalidation(envelope: Dict[str, Any]):
+    """Apply an invalidation published by another worker (registered as a backplane handler)"""
+    if envelope.get("session_id"):
+        _drop_session(envelope["session_id"])
+    if envelope.get("room_id"):
+        _drop_room(envelope["room_id"])
+
+
+async def _publish_invalidation(envelope: Dict[str, Any]):
+    # Sessions on other workers would otherwise keep the old context until the cache TTL
+    from routes.websocket import manager
+    
+    if manager.backplane.distributed and not await manager.publish({"kind": "context_invalidation", **envelope}):
+        logger.warning(f"Failed to publish context invalidation {envelope}; other workers may serve it "
+                       f"for up to {CONTEXT_CACHE_TTL_SECONDS}s")
+
+
+def _drop_session(session_id: str):
+    if _context_cache.pop(session_id) is not None:
+        logger.info(f"Invalidated cached context for session: {session_id}")
+
+
+def _drop_room(room_id: str):
+    stale = [
+        session_id for session_id in _context_cache.keys()
+        if (_context_cache.get(session_id) or {}).get("room_id") == room_id
+    ]
+    for session_id in stale:
+        _context_cache.pop(session_id)
+    if stale:
+        logger.info(f"Invalidated cached context for {len(stale)} sessions in room: {room_id}")
+
+
+async def fetch_participant_context(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch all context information for a participant session from the database
+    
+    Resolves sessions -> participants -> rooms -> hosts in a single round trip
+    via the get_session_context database function.
+    
     Returns:
         {
             "host_name": str,
@@ -20,87 +106,44 @@ def get_participant_context(session_id: str) -> Optional[Dict[str, Any]]:
             "participant_task": dict (from knowledge_base),
             "tone": str,
             "room_id": str,
-            "host_id": str
+            "host_id": str,
+            "room_name": str,
+            "room_updated_at": str,
+            "room_index": RoomIndex (for context retrieval)
         }
     """
     supabase = get_supabase_client()
     
     try:
-        # Get session information
-        session_response = supabase.table("sessions")\
-            .select("participant_id, room_id, created_at")\
-            .eq("id", session_id)\
-            .execute()
-        
-        if not session_response.data:
-            logger.warning(f"Session not found: {session_id}")
-            return None
-        
-        session = session_response.data[0]
-        participant_id = session["participant_id"]
-        room_id = session["room_id"]
-        
-        # Get participant information
-        participant_response = supabase.table("participants")\
-            .select("name, room_id")\
-            .eq("id", participant_id)\
-            .execute()
+        response = await supabase.rpc("get_session_context", {"p_session_id": session_id}).execute()
+        row = response.data
+        if isinstance(row, list):
+            row = row[0] if row else None
         
-        if not participant_response.data:
-            logger.warning(f"Participant not found: {participant_id}")
+        if not row:
+            logger.warning(f"Session context not found: {session_id}")
             return None
         
-        participant_name = participant_response.data[0]["name"]
-        
-        # Get room information (context, knowledge_base, tone, host_id)
-        room_response = supabase.table("rooms")\
-            .select("context, knowledge_base, tone, host_id, name")\
-            .eq("id", room_id)\
-            .execute()
-        
-        if not room_response.data:
-            logger.warning(f"Room not found: {room_id}")
-            return None
-        
-        room = room_response.data[0]
-        host_id = room["host_id"]
-        room_context = room.get("context", "")
-        knowledge_base = room.get("knowledge_base", {})
-        tone = room.get("tone", "professional")
-        
-        # Get host information
-        host_response = supabase.table("hosts")\
-            .select("name")\
-            .eq("id", host_id)\
-            .execute()
-        
-        if not host_response.data:
-            logger.warning(f"Host not found: {host_id}")
-            return None
-        
-        host_name = host_response.data[0]["name"]
-        
-        # Get participant-specific task from knowledge_base
-        # Knowledge base keys are lowercase participant names
-        participant_key = participant_name.lower().strip()
-        participant_task = knowledge_base.get(participant_key, {})
-        
-        # If exact match not found, try case-insensitive search
-        if not participant_task:
-            for key, value in knowledge_base.items():
-                if key.lower() == participant_key:
-                    participant_task = value
-                    break
+        participant_name = row["participant_name"]
+        room_context = row.get("room_context") or ""
+        room_index = get_room_index(
+            row["room_id"],
+            row.get("room_updated_at"),
+            room_context,
+            row.get("knowledge_base") or {}
+        )
         
         return {
-            "host_name": host_name,
+            "host_name": row["host_name"],
             "room_context": room_context,
             "participant_name": participant_name,
-            "participant_task": participant_task,
-            "tone": tone,
-            "room_id": room_id,
-            "host_id": host_id,
-            "room_name": room.get("name", "")
+            "participant_task": room_index.participant_task(participant_name),
+            "tone": row.get("tone") or "professional",
+            "room_id": row["room_id"],
+            "host_id": row["host_id"],
+            "room_name": row.get("room_name") or "",
+            "room_updated_at": row.get("room_updated_at"),
+            "room_index": room_index
         }
     
     except Exception as e:
@@ -192,33 +235,89 @@ def build_system_prompt(context: Dict[str, Any]) -> str:
     return "\n".join(prompt_parts)
 
 
-def get_dynamic_prompt(session_id: str) -> Optional[str]:
+async def get_dynamic_prompt(session_id: str, query: Optional[str] = None) -> Optional[str]:
     """
     Get dynamic system prompt for a session
     
     Args:
         session_id: Session ID
+        query: Current user utterance, used to pick the relevant parts of large room contexts
     
     Returns:
         System prompt string or None if context not found
     """
-    context = get_participant_context(session_id)
+    context = await get_participant_context(session_id)
     
     if not context:
         logger.warning(f"Could not get context for session: {session_id}")
         return None
     
-    return build_system_prompt(context)
+    return get_compiled_prompt(context, query)
+
+
+def _compile_prompt_template(context: Dict[str, Any]) -> str:
+    """Build a prompt with placeholders for the participant name and project context"""
+    return build_system_prompt({
+        **context,
+        "participant_name": PARTICIPANT_NAME_PLACEHOLDER,
+        "room_context": ROOM_CONTEXT_PLACEHOLDER if context.get("room_context") else ""
+    })
+
+
+def get_compiled_prompt(context: Dict[str, Any], query: Optional[str] = None) -> str:
+    """
+    Get the system prompt for a context, compiling it on first use
+    
+    Equivalent to build_system_prompt(context), but memoized per
+    (room_id, room updated_at, participant key). Room contexts larger than the
+    token budget are reduced to the chunks most relevant to the query.
+    """
+    participant_name = context.get("participant_name", "the participant")
+    cache_key = (context.get("room_id"), context.get("room_updated_at"), normalize_key(participant_name))
+    
+    template = _prompt_cache.get(cache_key)
+    if template is None:
+        template = _compile_prompt_template(context)
+        _prompt_cache.set(cache_key, template)
+    
+    room_index = context.get("room_index") or RoomIndex(context.get("room_context") or "", {})
+    return template\
+        .replace(ROOM_CONTEXT_PLACEHOLDER, room_index.select_context(query))\
+        .replace(PARTICIPANT_NAME_PLACEHOLDER, participant_name)
+
+
+def precompile_room_prompts(room: Dict[str, Any], host_name: str):
+    """
+    Index a room and compile the prompt for every knowledge_base entry
+    
+    Called when a room is created or updated so the first turn of each
+    participant is already a cache hit.
+    
+    Args:
+        room: Room row (must include id, updated_at, context, knowledge_base, tone)
+        host_name: Name of the room's host
+    """
+    room_index = build_room_index(room)
+    for key, task in room_index.participants.items():
+        template = _compile_prompt_template({
+            "host_name": host_name,
+            "room_context": room.get("context") or "",
+            "participant_task": task if isinstance(task, dict) else {},
+            "tone": room.get("tone") or "professional",
+        })
+        _prompt_cache.set((room["id"], room.get("updated_at"), key), template)
+    
+    logger.info(f"Precompiled {len(room_index.participants)} prompts for room {room['id']}")
 
 
-def get_context_summary(session_id: str) -> Optional[Dict[str, Any]]:
+async def get_context_summary(session_id: str) -> Optional[Dict[str, Any]]:
     """
     Get a summary of context for debugging/logging
     
     Returns:
         Dict with context summary (without full prompts)
     """
-    context = get_participant_context(session_id)
+    context = await get_participant_context(session_id)
     
     if not context:
         return None
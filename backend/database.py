@@ -1,12 +1,20 @@
 """
 Supabase database connection and utilities
+
+The client is the async Supabase client on an explicitly pooled, keep-alive
+httpx transport, so PostgREST queries from route handlers run concurrently
+instead of blocking the event loop.
 """
 import os
+import importlib.util
 from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client, Client
+import httpx
+from supabase import AsyncClient, AsyncClientOptions
+from postgrest.exceptions import APIError
 from typing import Optional
 import logging
+from metrics import InstrumentedTransport
 
 logger = logging.getLogger(__name__)
 
@@ -19,20 +27,76 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")  # Service role key for backend
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")  # Anon key for client
 
+# HTTP transport configuration
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "100"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+SUPABASE_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY_SECONDS", "30"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+SUPABASE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "5"))
+# HTTP/2 multiplexes queries over a few connections; needs the h2 package
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+
+# SQLSTATE classes for errors caused by a row itself (data exception, integrity
+# constraint violation, e.g. a malformed or deleted foreign key); retrying won't help
+ROW_ERROR_SQLSTATE_CLASSES = ("22", "23")
+
+
+def is_row_error(error: Exception) -> bool:
+    """Whether a failed write was rejected for its data rather than e.g. a connection problem"""
+    return isinstance(error, APIError) and str(error.code or "")[:2] in ROW_ERROR_SQLSTATE_CLASSES
+
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Create the pooled keep-alive HTTP client used for all PostgREST traffic
+    
+    Every request is timed per route and table by metrics.InstrumentedTransport.
+    """
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            http2=SUPABASE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(SUPABASE_TIMEOUT_SECONDS, connect=SUPABASE_CONNECT_TIMEOUT_SECONDS),
+        follow_redirects=True,
+        transport=InstrumentedTransport(transport)
+    )
+
+
 class Database:
     """Supabase database client wrapper"""
-    
-    def __init__(self):
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
-        
-        self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        logger.info("Supabase client initialized")
-    
-    def get_client(self) -> Client:
+
+        self.http_client = create_http_client(transport)
+        self.client: AsyncClient = AsyncClient(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=AsyncClientOptions(
+                httpx_client=self.http_client,
+                # Service role key is the bearer token; no user sessions on the backend
+                headers={"Authorization": f"Bearer {SUPABASE_KEY}"},
+                auto_refresh_token=False,
+                persist_session=False
+            )
+        )
+        logger.info(f"Supabase async client initialized (http2={SUPABASE_HTTP2}, max_connections={SUPABASE_POOL_MAX_CONNECTIONS})")
+
+    def get_client(self) -> AsyncClient:
         """Get the Supabase client instance"""
         return self.client
 
+    async def close(self):
+        """Close pooled HTTP connections"""
+        await self.http_client.aclose()
+
 # Global database instance
 _db_instance: Optional[Database] = None
 
@@ -43,6 +107,13 @@ def get_db() -> Database:
         _db_instance = Database()
     return _db_instance
 
-def get_supabase_client() -> Client:
-    """Get Supabase client directly"""
+def get_supabase_client() -> AsyncClient:
+    """Get Supabase client directly (queries must be awaited: await ....execute())"""
     return get_db().get_client()
+
+async def close_db():
+    """Close the database instance, if one was created"""
+    global _db_instance
+    if _db_instance is not None:
+        await _db_instance.close()
+        _db_instance = None
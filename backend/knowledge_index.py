@@ -0,0 +1,168 @@
+"""
+Knowledge Index - Per-room retrieval over the knowledge base and project context
+
+Each room version gets an index with O(1) normalized participant lookup and a
+BM25 index over chunks of the room context, so large project docs are trimmed
+to the chunks relevant to the current question before they reach the prompt.
+"""
+import os
+import re
+import math
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Retrieval configuration
+KB_CONTEXT_TOKEN_BUDGET = int(os.getenv("KB_CONTEXT_TOKEN_BUDGET", "800"))  # Max context tokens per prompt
+KB_CHUNK_TOKENS = int(os.getenv("KB_CHUNK_TOKENS", "120"))  # Target chunk size
+KB_INDEX_CACHE_SIZE = int(os.getenv("KB_INDEX_CACHE_SIZE", "1000"))
+KB_INDEX_TTL_SECONDS = int(os.getenv("KB_INDEX_TTL_SECONDS", str(24 * 60 * 60)))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+CHUNK_SEPARATOR = "\n...\n"
+
+# Room indexes keyed on (room_id, room updated_at)
+_index_cache = TTLCache(max_size=KB_INDEX_CACHE_SIZE, ttl_seconds=KB_INDEX_TTL_SECONDS)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Llama prompts (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for scoring"""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def normalize_key(name: str) -> str:
+    """Normalize a participant name or knowledge_base key"""
+    return " ".join(name.lower().split())
+
+
+def chunk_text(text: str, chunk_tokens: int) -> List[str]:
+    """Split text into chunks of roughly chunk_tokens, on paragraph then sentence boundaries"""
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= chunk_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(s.strip() for s in SENTENCE_PATTERN.split(paragraph) if s.strip())
+
+    # Merge small neighbouring pieces up to the target size
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}\n{piece}" if current else piece
+        if current and estimate_tokens(candidate) > chunk_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class RoomIndex:
+    """Retrieval index for one version of a room"""
+
+    def __init__(self, context: str, knowledge_base: Dict[str, Any]):
+        self.context = context or ""
+        self.context_tokens = estimate_tokens(self.context)
+        self.participants: Dict[str, Any] = {
+            normalize_key(key): value for key, value in (knowledge_base or {}).items()
+        }
+
+        self.chunks = chunk_text(self.context, KB_CHUNK_TOKENS)
+        self.chunk_tokens = [estimate_tokens(chunk) for chunk in self.chunks]
+        self.term_freqs = [Counter(tokenize(chunk)) for chunk in self.chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        doc_freqs: Counter = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(self.chunks)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()
+        }
+
+    def participant_task(self, participant_name: str) -> Dict[str, Any]:
+        """Get a participant's knowledge_base entry by normalized name"""
+        task = self.participants.get(normalize_key(participant_name), {})
+        return task if isinstance(task, dict) else {}
+
+    def score(self, query: str) -> List[float]:
+        """BM25 score of every chunk against the query"""
+        query_terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def select_context(self, query: Optional[str], token_budget: int = KB_CONTEXT_TOKEN_BUDGET) -> str:
+        """
+        Get the room context to inject into the prompt
+
+        Small contexts are returned whole. Larger ones are reduced to the
+        highest-scoring chunks for the query that fit the token budget,
+        kept in document order. Without a usable query the leading chunks are used.
+        """
+        if self.context_tokens <= token_budget:
+            return self.context
+
+        scores = self.score(query) if query else [0.0] * len(self.chunks)
+        ranked = sorted(range(len(self.chunks)), key=lambda i: (-scores[i], i))
+
+        selected = []
+        used = 0
+        for i in ranked:
+            if used + self.chunk_tokens[i] > token_budget:
+                continue
+            selected.append(i)
+            used += self.chunk_tokens[i]
+
+        return CHUNK_SEPARATOR.join(self.chunks[i] for i in sorted(selected))
+
+
+def build_room_index(room: Dict[str, Any]) -> RoomIndex:
+    """
+    Build and cache the index for a room row
+
+    Called when a room is created or updated.
+    """
+    index = RoomIndex(room.get("context") or "", room.get("knowledge_base") or {})
+    _index_cache.set((room["id"], room.get("updated_at")), index)
+    logger.info(f"Indexed room {room['id']}: {len(index.chunks)} chunks, {len(index.participants)} participants")
+    return index
+
+
+def get_room_index(room_id: str, updated_at: Optional[str], context: str, knowledge_base: Dict[str, Any]) -> RoomIndex:
+    """Get the index for a room version, building it if it isn't cached"""
+    index = _index_cache.get((room_id, updated_at))
+    if index is None:
+        index = build_room_index({
+            "id": room_id,
+            "updated_at": updated_at,
+            "context": context,
+            "knowledge_base": knowledge_base
+        })
+    return index
@@ -1,13 +1,13 @@
 import os
+import time
+import asyncio
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
 from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from groq import Groq
-import edge_tts
-import tempfile
-import shutil
 from pathlib import Path
 
 # Configure logging
@@ -51,6 +51,8 @@ try:
 except ImportError:
     print("Warning: python-dotenv not installed. Using environment variables only.")
 
+from metrics import MetricsMiddleware, StageTimer, render_metrics, set_stage_labels, voice_stage
+
 app = FastAPI(title="Sia AI Meeting Assistant", version="1.0.0")
 
 # CORS middleware - allow both ports 3000 and 3001
@@ -60,10 +62,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Sia-Text", "X-Sia-Text-Truncated", "X-Sia-End-Meeting", "Server-Timing"],
 )
 
+# Per-route latency and database round-trip metrics (exported at /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Import and include routers
 from routes import auth, rooms, dashboard, participants, queue, websocket
+from routes.websocket import manager
+from voice_pipeline import (
+    END_MEETING_TAG,
+    SentenceSplitter,
+    get_groq_client,
+    transcribe_audio,
+    get_chat_completion,
+    stream_chat_completion,
+)
+from tts_cache import get_tts_cache
+from transcript_store import get_transcript_buffer
+from queue_engine import get_queue_engine
+from database import close_db
 
 app.include_router(auth.router)
 app.include_router(rooms.router)
@@ -82,20 +101,211 @@ app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 # System prompt for the AI
 SYSTEM_PROMPT = "You are Sia, an AI Project Manager built by Avinash. Be concise and professional."
 
-# Groq client will be initialized lazily
-def get_groq_client():
-    """Get or create Groq client instance"""
-    api_key = os.getenv("GROQ_API_KEY", "")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not set in environment variables")
-    return Groq(api_key=api_key)
+# Voices for TTS
+ENGLISH_VOICE = "en-US-AriaNeural"  # English female voice
+HINDI_VOICE = "hi-IN-MadhurNeural"  # Hindi male voice
+
+# Cap on the URL-encoded X-Sia-Text header of /process-audio/stream; proxies commonly
+# reject response headers beyond 4-8 KB, and Devanagari encodes to 9 bytes per character
+STREAM_TEXT_HEADER_MAX_BYTES = int(os.getenv("STREAM_TEXT_HEADER_MAX_BYTES", "2048"))
+
+
+def text_header(text: str, max_bytes: int) -> Tuple[str, bool]:
+    """
+    URL-encode text for a response header, cut at a character boundary to fit max_bytes
+    
+    Returns:
+        (header value, whether the text was truncated)
+    """
+    encoded = quote(text)
+    if len(encoded) <= max_bytes:
+        return encoded, False
+    parts = []
+    size = 0
+    for char in text:
+        part = quote(char)
+        if size + len(part) > max_bytes:
+            break
+        parts.append(part)
+        size += len(part)
+    return "".join(parts), True
+
+
+def select_voice(text: str) -> str:
+    """Select a TTS voice based on the script of the text"""
+    # Check if text contains Devanagari script (Hindi) - Unicode range U+0900 to U+097F
+    has_devanagari = any('\u0900' <= char <= '\u097F' for char in text)
+    
+    if has_devanagari:
+        logger.info(f"Detected Hindi text, using Hindi voice: {HINDI_VOICE}")
+        return HINDI_VOICE
+    
+    logger.info(f"Detected English text, using English voice: {ENGLISH_VOICE}")
+    return ENGLISH_VOICE
+
+
+async def get_system_prompt(session_id: Optional[str], user_text: Optional[str] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Get the system prompt for a session, falling back to the default prompt
+    
+    Returns:
+        (system prompt, participant context or None if the session did not resolve)
+    """
+    default_prompt = f"{SYSTEM_PROMPT}\n\nWhen the conversation naturally ends and the user says goodbye, append [END_MEETING] to the end of your response."
+    
+    # Use context engine if session_id is provided, otherwise use default prompt
+    if not session_id:
+        # Default prompt for backward compatibility
+        logger.info("Using default prompt (no session_id provided)")
+        return default_prompt, None
+    
+    from context_engine import get_dynamic_prompt, get_participant_context
+    dynamic_prompt = await get_dynamic_prompt(session_id, user_text)
+    if dynamic_prompt:
+        logger.info(f"Using dynamic prompt for session: {session_id}")
+        # Already cached by get_dynamic_prompt; no extra query
+        context = await get_participant_context(session_id)
+        set_stage_labels(room=context and context.get("room_id"))
+        return dynamic_prompt, context
+    
+    # Fallback to default if context not found
+    logger.warning(f"Could not get dynamic prompt for session {session_id}, using default")
+    return default_prompt, None
+
+
+async def transcribe_upload(audio: UploadFile) -> str:
+    """Read the uploaded audio and transcribe it with Groq Whisper"""
+    try:
+        # Initialize Groq client (shared async client)
+        get_groq_client()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Read uploaded audio into memory (already spooled; receiving it is the "upload" stage)
+    audio_bytes = await audio.read()
+    
+    try:
+        logger.info(f"Transcribing audio upload ({len(audio_bytes)} bytes)")
+        with voice_stage("whisper"):
+            user_text = await transcribe_audio(
+                audio_bytes,
+                audio.filename or "audio.webm",
+                audio.content_type or "audio/webm"
+            )
+        logger.info(f"Transcription successful: {user_text[:50]}...")
+        return user_text
+    except Exception as e:
+        logger.error(f"Transcription failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+
+async def build_messages(user_text: str, session_id: Optional[str]) -> Tuple[List[Dict[str, str]], Optional[Dict[str, Any]]]:
+    """
+    Build the chat messages for a conversation turn
+    
+    Returns:
+        (messages, participant context or None if the session did not resolve)
+    """
+    with voice_stage("context"):
+        system_prompt, context = await get_system_prompt(session_id, user_text)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_text}
+    ]
+    return messages, context
+
+
+async def generate_reply(audio: UploadFile, session_id: Optional[str]) -> Tuple[str, bool]:
+    """
+    Transcribe the uploaded audio and get the AI response
+    
+    Returns:
+        (ai_response with the end meeting tag removed, end_meeting flag)
+    """
+    # Step 1: Transcribe with Groq Whisper
+    user_text = await transcribe_upload(audio)
+    
+    # Step 2: Get AI response from Groq Llama
+    try:
+        messages, context = await build_messages(user_text, session_id)
+        
+        logger.info("Getting AI response from Groq...")
+        with voice_stage("llm"):
+            ai_response = await get_chat_completion(messages)
+        logger.info(f"AI response received: {ai_response[:50]}...")
+    except Exception as e:
+        logger.error(f"AI response failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"AI response failed: {str(e)}")
+    
+    # Step 3: Check for end meeting tag
+    end_meeting = False
+    if END_MEETING_TAG in ai_response:
+        end_meeting = True
+        ai_response = ai_response.replace(END_MEETING_TAG, "").strip()
+    
+    record_turn(session_id, context, user_text, ai_response)
+    
+    return ai_response, end_meeting
+
+
+def record_turn(session_id: Optional[str], context: Optional[Dict[str, Any]], user_text: str, ai_response: str):
+    """
+    Buffer a conversation turn for the session transcript (written behind, in batches)
+    
+    Only turns of a session the context engine resolved are recorded; an unknown or
+    malformed session_id would fail the transcript_turns insert for the whole batch.
+    """
+    if not session_id or not context:
+        return
+    transcript_buffer = get_transcript_buffer()
+    transcript_buffer.record(session_id, "user", user_text)
+    transcript_buffer.record(session_id, "assistant", ai_response)
+
+
+async def synthesize_segment(text: str) -> str:
+    """Synthesize one reply segment, falling back to the English voice; returns the cache key"""
+    tts_cache = get_tts_cache()
+    voice = select_voice(text)
+    set_stage_labels(voice=voice)
+    try:
+        return await tts_cache.synthesize(text, voice)
+    except Exception as e:
+        if voice == ENGLISH_VOICE:
+            raise
+        logger.warning(f"TTS failed with Hindi voice ({e}), trying English voice as fallback...")
+        set_stage_labels(voice=ENGLISH_VOICE)
+        return await tts_cache.synthesize(text, ENGLISH_VOICE)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    get_transcript_buffer().start()
+    get_queue_engine().start()
+    await manager.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await manager.stop()
+    await get_transcript_buffer().stop()
+    await get_queue_engine().stop()
+    await close_db()
+
 
 @app.get("/")
 async def root():
     return {"message": "Sia AI Meeting Assistant API"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.post("/process-audio")
 async def process_audio(
+    response: Response,
     audio: UploadFile = File(...), 
     session_id: Optional[str] = Query(None, description="Session ID for dynamic context")
 ):
@@ -103,136 +313,256 @@ async def process_audio(
     Process audio input:
     1. Transcribe with Groq Whisper
     2. Get AI response from Groq Llama (with dynamic context if session_id provided)
-    3. Generate TTS with edge-tts
+    3. Generate TTS with edge-tts (cached by text and voice)
     4. Return audio URL and text
     
+    Per-stage timings are recorded in sia_voice_stage_duration_seconds and
+    returned in the Server-Timing header (also on errors).
+    
     Args:
         audio: Audio file to process
         session_id: Optional session ID for dynamic context (if provided, uses context engine)
     """
-    try:
-        # Initialize Groq client
-        groq_client = get_groq_client()
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    try:
-        # Save uploaded audio to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_audio:
-            shutil.copyfileobj(audio.file, temp_audio)
-            temp_audio_path = temp_audio.name
-        
-        # Step 1: Transcribe with Groq Whisper
-        user_text = ""
+    with StageTimer() as timer:
         try:
-            logger.info(f"Transcribing audio file: {temp_audio_path}")
-            with open(temp_audio_path, "rb") as audio_file:
-                transcription = groq_client.audio.transcriptions.create(
-                    file=(audio.filename or "audio.webm", audio_file, audio.content_type or "audio/webm"),
-                    model="whisper-large-v3",
-                    language="en"
-                )
-            user_text = transcription.text
-            logger.info(f"Transcription successful: {user_text[:50]}...")
-        except Exception as e:
-            logger.error(f"Transcription failed: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_audio_path):
-                os.unlink(temp_audio_path)
-        
-        # Step 2: Get AI response from Groq Llama
-        try:
-            # Use context engine if session_id is provided, otherwise use default prompt
-            if session_id:
-                from context_engine import get_dynamic_prompt
-                dynamic_prompt = get_dynamic_prompt(session_id)
-                if dynamic_prompt:
-                    system_prompt_to_use = dynamic_prompt
-                    logger.info(f"Using dynamic prompt for session: {session_id}")
-                else:
-                    # Fallback to default if context not found
-                    system_prompt_to_use = f"{SYSTEM_PROMPT}\n\nWhen the conversation naturally ends and the user says goodbye, append [END_MEETING] to the end of your response."
-                    logger.warning(f"Could not get dynamic prompt for session {session_id}, using default")
-            else:
-                # Default prompt for backward compatibility
-                system_prompt_to_use = f"{SYSTEM_PROMPT}\n\nWhen the conversation naturally ends and the user says goodbye, append [END_MEETING] to the end of your response."
-                logger.info("Using default prompt (no session_id provided)")
+            ai_response, end_meeting = await generate_reply(audio, session_id)
             
-            messages = [
-                {"role": "system", "content": system_prompt_to_use},
-                {"role": "user", "content": user_text}
-            ]
+            # Step 4: Generate TTS with edge-tts
+            try:
+                logger.info(f"Generating TTS for: {ai_response[:50]}...")
+                with voice_stage("tts"):
+                    audio_key = await synthesize_segment(ai_response)
+                logger.info(f"TTS ready: {audio_key}")
+            except Exception as e:
+                logger.error(f"TTS failed: {str(e)}", exc_info=True)
+                raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
             
-            logger.info("Getting AI response from Groq...")
-            chat_completion = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            ai_response = chat_completion.choices[0].message.content
-            logger.info(f"AI response received: {ai_response[:50]}...")
-        except Exception as e:
-            logger.error(f"AI response failed: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"AI response failed: {str(e)}")
-        
-        # Step 3: Check for end meeting tag
-        end_meeting = False
-        if "[END_MEETING]" in ai_response:
-            end_meeting = True
-            ai_response = ai_response.replace("[END_MEETING]", "").strip()
+            timer.observe("ok")
+            response.headers["Server-Timing"] = timer.server_timing()
+            
+            # Return response
+            return {
+                "audio_url": f"http://localhost:8000/static/tts/{audio_key}.mp3",
+                "text": ai_response,
+                "end_meeting": end_meeting
+            }
         
-        # Step 4: Generate TTS with edge-tts
+        except HTTPException as e:
+            timer.observe("error")
+            e.headers = {**(e.headers or {}), "Server-Timing": timer.server_timing()}
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in process_audio: {str(e)}", exc_info=True)
+            timer.observe("error")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Processing failed: {str(e)}",
+                headers={"Server-Timing": timer.server_timing()}
+            )
+
+
+@app.post("/process-audio/stream")
+async def process_audio_stream(
+    audio: UploadFile = File(...), 
+    session_id: Optional[str] = Query(None, description="Session ID for dynamic context")
+):
+    """
+    Process audio input and stream the spoken reply back as it is synthesized
+    
+    The response body is audio/mpeg, sent chunk by chunk as edge-tts produces it.
+    The reply text and end meeting flag are sent up front in the
+    X-Sia-Text (URL-encoded) and X-Sia-End-Meeting headers. A reply longer than
+    STREAM_TEXT_HEADER_MAX_BYTES encoded is cut short and X-Sia-Text-Truncated
+    is "true"; with a session_id the full text is then pushed to
+    /ws/participant/{session_id} as {"type": "reply_text", "text": str, "end_meeting": bool}.
+    
+    Stage timings (mode "stream") are recorded once the last chunk is sent: "tts"
+    runs until then and "first_audio" until the first chunk was ready. Server-Timing
+    carries the stages up to the first chunk.
+    
+    Args:
+        audio: Audio file to process
+        session_id: Optional session ID for dynamic context (if provided, uses context engine)
+    """
+    with StageTimer(mode="stream") as timer:
         try:
-            # Detect language and select appropriate voice
-            # Check if text contains Devanagari script (Hindi) - Unicode range U+0900 to U+097F
-            has_devanagari = any('\u0900' <= char <= '\u097F' for char in ai_response)
-            
-            if has_devanagari:
-                # Use Hindi voice for Hindi text
-                voice = "hi-IN-MadhurNeural"  # Hindi male voice
-                logger.info("Detected Hindi text, using Hindi voice: hi-IN-MadhurNeural")
-            else:
-                # Use English voice for English text
-                voice = "en-US-AriaNeural"  # English female voice
-                logger.info("Detected English text, using English voice: en-US-AriaNeural")
+            ai_response, end_meeting = await generate_reply(audio, session_id)
             
-            output_path = STATIC_DIR / "reply.mp3"
-            
-            logger.info(f"Generating TTS for: {ai_response[:50]}...")
-            communicate = edge_tts.Communicate(text=ai_response, voice=voice)
-            await communicate.save(str(output_path))
-            logger.info(f"TTS generated successfully: {output_path}")
-        except Exception as e:
-            logger.error(f"TTS failed: {str(e)}", exc_info=True)
-            # If Hindi voice fails, try English voice as fallback
-            if has_devanagari:
+            # Step 4: Start streaming TTS; pull the first chunk before committing to a 200
+            tts_cache = get_tts_cache()
+            voice = select_voice(ai_response)
+            set_stage_labels(voice=voice)
+            logger.info(f"Streaming TTS for: {ai_response[:50]}...")
+            tts_start = time.perf_counter()
+            try:
+                audio_stream = tts_cache.stream(ai_response, voice)
+                first_chunk = await audio_stream.__anext__()
+            except Exception as e:
+                logger.error(f"TTS stream failed: {str(e)}", exc_info=True)
+                if voice == ENGLISH_VOICE:
+                    raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
+                # If Hindi voice fails, try English voice as fallback
                 logger.info("TTS failed with Hindi voice, trying English voice as fallback...")
+                set_stage_labels(voice=ENGLISH_VOICE)
                 try:
-                    voice = "en-US-AriaNeural"
-                    communicate = edge_tts.Communicate(text=ai_response, voice=voice)
-                    await communicate.save(str(output_path))
-                    logger.info(f"TTS generated successfully with fallback English voice: {output_path}")
+                    audio_stream = tts_cache.stream(ai_response, ENGLISH_VOICE)
+                    first_chunk = await audio_stream.__anext__()
                 except Exception as fallback_error:
                     logger.error(f"Fallback TTS also failed: {str(fallback_error)}")
                     raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
-            else:
-                raise HTTPException(status_code=500, detail=f"TTS failed: {str(e)}")
+            timer.mark("first_audio")
+            
+            async def body():
+                outcome = "error"
+                try:
+                    yield first_chunk
+                    async for chunk in audio_stream:
+                        yield chunk
+                    outcome = "ok"
+                finally:
+                    # Also on a failed or abandoned stream
+                    timer.add("tts", time.perf_counter() - tts_start)
+                    timer.observe(outcome)
+            
+            text, truncated = text_header(ai_response, STREAM_TEXT_HEADER_MAX_BYTES)
+            if truncated and session_id:
+                await manager.send_personal_message({
+                    "type": "reply_text",
+                    "text": ai_response,
+                    "end_meeting": end_meeting
+                }, "participant", session_id)
+            
+            return StreamingResponse(
+                body(),
+                media_type="audio/mpeg",
+                headers={
+                    "X-Sia-Text": text,
+                    "X-Sia-Text-Truncated": "true" if truncated else "false",
+                    "X-Sia-End-Meeting": "true" if end_meeting else "false",
+                    "Cache-Control": "no-store",
+                    "Server-Timing": timer.server_timing()
+                }
+            )
         
-        # Return response
-        return {
-            "audio_url": f"http://localhost:8000/static/reply.mp3",
-            "text": ai_response,
-            "end_meeting": end_meeting
-        }
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in process_audio: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        except HTTPException as e:
+            timer.observe("error")
+            e.headers = {**(e.headers or {}), "Server-Timing": timer.server_timing()}
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in process_audio_stream: {str(e)}", exc_info=True)
+            timer.observe("error")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Processing failed: {str(e)}",
+                headers={"Server-Timing": timer.server_timing()}
+            )
+
+@app.post("/process-audio/pipelined")
+async def process_audio_pipelined(
+    response: Response,
+    audio: UploadFile = File(...), 
+    session_id: str = Query(..., description="Session ID; audio segments are pushed to its participant WebSocket")
+):
+    """
+    Process audio input with the LLM and TTS stages overlapped
+    
+    The chat completion is streamed and cut at sentence boundaries. Each sentence is
+    sent to TTS while the LLM keeps generating, and segments are pushed in order over
+    /ws/participant/{session_id} as they become ready:
+        {"type": "tts_segment", "seq": int, "text": str, "audio_url": str}
+    followed by a final
+        {"type": "tts_segment_end", "segments": int, "text": str, "end_meeting": bool}
+    
+    Returns the full reply text and end meeting flag once all segments are sent.
+    Stage timings (mode "pipelined") are recorded then and returned in Server-Timing:
+    "llm" is the whole completion stream, "tts" the time after it until the last
+    segment was sent, and "first_audio" the time until the first segment was sent.
+    """
+    with StageTimer(mode="pipelined") as timer:
+        try:
+            user_text = await transcribe_upload(audio)
+            messages, context = await build_messages(user_text, session_id)
+            
+            splitter = SentenceSplitter()
+            segments: asyncio.Queue = asyncio.Queue()
+            sentences: List[str] = []
+            
+            async def push_segments():
+                # Send segments strictly in order, each as soon as its audio is ready
+                seq = 0
+                while True:
+                    item = await segments.get()
+                    if item is None:
+                        return
+                    text, tts_task = item
+                    audio_key = await tts_task
+                    await manager.send_personal_message({
+                        "type": "tts_segment",
+                        "seq": seq,
+                        "text": text,
+                        "audio_url": f"http://localhost:8000/static/tts/{audio_key}.mp3"
+                    }, "participant", session_id)
+                    if seq == 0:
+                        timer.mark("first_audio")
+                    seq += 1
+            
+            def enqueue(sentence: str):
+                sentences.append(sentence)
+                segments.put_nowait((sentence, asyncio.create_task(synthesize_segment(sentence))))
+            
+            pusher = asyncio.create_task(push_segments())
+            try:
+                logger.info("Streaming AI response from Groq...")
+                with voice_stage("llm"):
+                    async for delta in stream_chat_completion(messages):
+                        for sentence in splitter.feed(delta):
+                            enqueue(sentence)
+                    for sentence in splitter.flush():
+                        enqueue(sentence)
+                segments.put_nowait(None)
+                with voice_stage("tts"):
+                    await pusher
+            except Exception as e:
+                pusher.cancel()
+                while not segments.empty():
+                    item = segments.get_nowait()
+                    if item is not None:
+                        item[1].cancel()
+                logger.error(f"Pipelined response failed: {str(e)}", exc_info=True)
+                raise HTTPException(status_code=500, detail=f"AI response failed: {str(e)}")
+            
+            ai_response = " ".join(sentences)
+            record_turn(session_id, context, user_text, ai_response)
+            logger.info(f"Pipelined response sent in {len(sentences)} segments: {ai_response[:50]}...")
+            
+            await manager.send_personal_message({
+                "type": "tts_segment_end",
+                "segments": len(sentences),
+                "text": ai_response,
+                "end_meeting": splitter.end_meeting
+            }, "participant", session_id)
+            
+            timer.observe("ok")
+            response.headers["Server-Timing"] = timer.server_timing()
+            
+            return {
+                "text": ai_response,
+                "end_meeting": splitter.end_meeting,
+                "segments": len(sentences)
+            }
+        
+        except HTTPException as e:
+            timer.observe("error")
+            e.headers = {**(e.headers or {}), "Server-Timing": timer.server_timing()}
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in process_audio_pipelined: {str(e)}", exc_info=True)
+            timer.observe("error")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Processing failed: {str(e)}",
+                headers={"Server-Timing": timer.server_timing()}
+            )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,302 @@
+"""
+Metrics - Prometheus instrumentation for HTTP routes, database round trips
+and voice pipeline stages
+
+Every PostgREST call made through the client from database.get_supabase_client
+passes through InstrumentedTransport, which times it per table. MetricsMiddleware
+attributes those calls to the route that made them, so per-route query counts
+(and N+1 regressions) show up at /metrics. StageTimer breaks a voice turn down
+into upload, Whisper, context, Llama and TTS time, and for the streaming modes
+the time until the first audio went out.
+"""
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+import httpx
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Route label for database calls made outside an HTTP request (WebSockets, background tasks)
+BACKGROUND_ROUTE = "background"
+
+DB_QUERY_SECONDS = Histogram(
+    "sia_db_query_duration_seconds",
+    "Supabase (PostgREST) round-trip time",
+    ["route", "table", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+DB_QUERY_ERRORS = Counter(
+    "sia_db_query_errors_total",
+    "Supabase (PostgREST) calls that failed or returned an error status",
+    ["route", "table", "method"]
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "sia_db_queries_per_request",
+    "Supabase round trips made while handling one HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "sia_http_request_duration_seconds",
+    "HTTP request handling time",
+    ["route", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+WS_SLOW_CONSUMER_EVENTS = Counter(
+    "sia_ws_slow_consumer_events_total",
+    "WebSocket send queue overflows, by the action taken (drop or disconnect)",
+    ["connection_type", "action"]
+)
+
+WS_CONNECTIONS = Gauge(
+    "sia_ws_connections",
+    "Open WebSocket connections",
+    ["connection_type"],
+    multiprocess_mode="livesum"
+)
+WS_IDENTITIES = Gauge(
+    "sia_ws_identities",
+    "Hosts and participant sessions with at least one open WebSocket, as of the last heartbeat sweep",
+    ["connection_type"],
+    multiprocess_mode="livesum"
+)
+WS_ROOMS = Gauge(
+    "sia_ws_rooms",
+    "Rooms with WebSocket subscribers, as of the last heartbeat sweep",
+    multiprocess_mode="livesum"
+)
+WS_REAPED_CONNECTIONS = Counter(
+    "sia_ws_reaped_connections_total",
+    "WebSocket connections evicted by the heartbeat for not answering in time",
+    ["connection_type"]
+)
+
+# Label for a voice or room that was never resolved (e.g. the turn failed first)
+UNKNOWN_LABEL = "none"
+
+VOICE_STAGE_SECONDS = Histogram(
+    "sia_voice_stage_duration_seconds",
+    "Voice pipeline stage latency per turn (upload, whisper, context, llm, tts, first_audio, total) "
+    "by mode (buffered, stream, pipelined)",
+    ["stage", "voice", "room", "mode", "outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+)
+
+class RequestQueries(list):
+    """
+    Database calls recorded for one HTTP request: (table, method, seconds, failed)
+
+    Tasks started during the request (write-behind flushes and the like) inherit
+    the context and outlive the request; once it is closed their calls are
+    recorded under BACKGROUND_ROUTE instead of landing in a list nobody exports.
+    """
+
+    closed = False
+
+
+class RequestTiming:
+    """When the current HTTP request arrived and when its body was fully received"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.body_received: Optional[float] = None
+
+
+# Database calls recorded for the current HTTP request
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+# Timing of the current HTTP request
+_request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+# Stage timer for the voice turn being handled, if any
+_stage_timer: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+def table_from_path(path: str) -> str:
+    """Get the table (or rpc:function) name from a PostgREST URL path"""
+    # /rest/v1/<table> or /rest/v1/rpc/<function>
+    parts = [part for part in path.split("/") if part]
+    if len(parts) >= 4 and parts[2] == "rpc":
+        return f"rpc:{parts[3]}"
+    if len(parts) >= 3:
+        return parts[2]
+    return path
+
+
+def record_db_query(table: str, method: str, seconds: float, failed: bool):
+    """Record one database round trip against the current request, or directly if there is none"""
+    queries = _request_queries.get()
+    if queries is not None and not queries.closed:
+        # Labelled with the route once the request finishes and the route is known
+        queries.append((table, method, seconds, failed))
+        return
+
+    DB_QUERY_SECONDS.labels(BACKGROUND_ROUTE, table, method).observe(seconds)
+    if failed:
+        DB_QUERY_ERRORS.labels(BACKGROUND_ROUTE, table, method).inc()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper that times every PostgREST request"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        table = table_from_path(request.url.path)
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            record_db_query(table, request.method, time.perf_counter() - start, True)
+            raise
+        record_db_query(table, request.method, time.perf_counter() - start, response.status_code >= 400)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and database round trips per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _request_queries.set(queries)
+        timing = RequestTiming()
+        timing_token = _request_timing.set(timing)
+        status_holder = {"status": 500}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                timing.body_received = time.perf_counter()
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            _request_timing.reset(timing_token)
+            queries.closed = True
+            elapsed = time.perf_counter() - timing.start
+
+            # Route template (e.g. /api/rooms/{room_id}) keeps label cardinality bounded
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+
+            HTTP_REQUEST_SECONDS.labels(route_label, scope["method"], str(status_holder["status"])).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route_label).observe(len(queries))
+            for table, method, seconds, failed in queries:
+                DB_QUERY_SECONDS.labels(route_label, table, method).observe(seconds)
+                if failed:
+                    DB_QUERY_ERRORS.labels(route_label, table, method).inc()
+
+
+class StageTimer:
+    """
+    Stage timings for one voice turn
+    
+    Use as a context manager around the turn; voice_stage() blocks inside it
+    add to the timer, and observe() records every stage plus the total.
+    Inside an HTTP request the turn starts when the request arrived, and the
+    "upload" stage is the time until its body was fully received. mode tells
+    the endpoints apart: "buffered" (/process-audio), "stream" or "pipelined".
+    """
+
+    def __init__(self, mode: str = "buffered"):
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        timing = _request_timing.get()
+        if timing is not None:
+            self.start = timing.start
+            if timing.body_received is not None:
+                self.stages["upload"] = timing.body_received - timing.start
+        self.voice = UNKNOWN_LABEL
+        self.room = UNKNOWN_LABEL
+        self._token = None
+
+    def __enter__(self) -> "StageTimer":
+        self._token = _stage_timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _stage_timer.reset(self._token)
+
+    def add(self, stage: str, seconds: float):
+        """Add time to a stage (a stage entered twice, e.g. on a TTS fallback, accumulates)"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def mark(self, stage: str):
+        """Record the time from the start of the turn until now as a stage (e.g. "first_audio")"""
+        self.stages[stage] = time.perf_counter() - self.start
+
+    def observe(self, outcome: str):
+        """Record all stages and the total with the voice, room, mode and outcome ("ok" or "error")"""
+        self.stages["total"] = time.perf_counter() - self.start
+        for stage, seconds in self.stages.items():
+            VOICE_STAGE_SECONDS.labels(stage, self.voice, self.room, self.mode, outcome).observe(seconds)
+
+    def server_timing(self) -> str:
+        """Get the stage timings as a Server-Timing header value"""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items())
+
+
+@contextmanager
+def voice_stage(stage: str):
+    """Time a block as a stage of the current voice turn (no-op outside a StageTimer)"""
+    timer = _stage_timer.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            timer.add(stage, time.perf_counter() - start)
+
+
+def set_stage_labels(voice: Optional[str] = None, room: Optional[str] = None):
+    """Set the voice and/or room labels of the current voice turn"""
+    timer = _stage_timer.get()
+    if timer is None:
+        return
+    if voice:
+        timer.voice = voice
+    if room:
+        timer.room = room
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in Prometheus text format; returns (body, content_type)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate across uvicorn workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
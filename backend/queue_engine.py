@@ -0,0 +1,731 @@
+"""
+Queue Engine - Authoritative in-memory Call Host queues, written through to the queue table
+
+Every room's waiting entries are held in a RoomQueue, a Fenwick tree over
+queue positions, so enqueue, dequeue and "how many are ahead of me" are all
+O(log n) and a new position is handed out without the read-max-then-insert
+race. call_host and the queue status endpoint answer from memory; new entries
+are written to the queue table in the background, in order, and the engine is
+rebuilt from the table's waiting rows on startup.
+
+The `position` column is only the order of arrival. What participants and
+hosts are shown is the place in line (position_of()), which closes up as
+entries ahead are dequeued; participants whose place changed get one
+queue_status push per notify tick, however many entries left meanwhile.
+
+Anything else that reads or changes queue rows in the database syncs the
+engine first (sync()), so it never sees a table that is behind the engine.
+
+Only one worker runs the engine, so the queues cannot diverge: every worker
+campaigns for a lease in the queue_engine_lease table (claim_queue_engine),
+and the holder loads the queues and renews it. The other workers forward
+their queue operations (request()) to the holder over the WebSocket
+backplane, so several uvicorn workers or pods need WS_BACKPLANE=redis; if no
+leader answers, the operation fails with QueueUnavailable (the routes answer
+503). When the leader stops, another worker takes over at its next renewal.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from database import get_supabase_client, is_row_error
+
+logger = logging.getLogger(__name__)
+
+# Write-through configuration
+QUEUE_WRITE_RETRY_SECONDS = float(os.getenv("QUEUE_WRITE_RETRY_SECONDS", "1"))
+QUEUE_LOAD_PAGE_SIZE = int(os.getenv("QUEUE_LOAD_PAGE_SIZE", "1000"))  # PostgREST caps a response at 1000 rows by default
+
+# Place-in-line pushes to participants are coalesced over this window
+QUEUE_NOTIFY_INTERVAL_MS = int(os.getenv("QUEUE_NOTIFY_INTERVAL_MS", "100"))
+
+# Leader election: the lease is renewed every third of its length; a leader that could not
+# renew it before it ran out stops serving queues
+QUEUE_ENGINE_LEASE_SECONDS = float(os.getenv("QUEUE_ENGINE_LEASE_SECONDS", "15"))
+
+# How long a worker waits for the leader to answer a forwarded queue operation
+QUEUE_FORWARD_TIMEOUT_SECONDS = float(os.getenv("QUEUE_FORWARD_TIMEOUT_SECONDS", "5"))
+
+# How long the leader holds an operation back while the queues are still being rebuilt
+QUEUE_LOAD_WAIT_SECONDS = float(os.getenv("QUEUE_LOAD_WAIT_SECONDS", "5"))
+
+# Smallest Fenwick tree allocated for a room
+MIN_TREE_CAPACITY = 16
+
+
+class QueueUnavailable(Exception):
+    """No worker running the queue engine answered (none elected yet, or unreachable)"""
+
+
+class RoomQueue:
+    """
+    Waiting entries of one room, ordered by position
+
+    Positions are indexed in a Fenwick tree offset by `base` (slot 1 holds
+    position base + 1). The tree is rebuilt around the live positions when a
+    new position falls outside it, so its size tracks the spread of waiting
+    positions rather than every position ever handed out.
+    """
+
+    def __init__(self):
+        # position -> entry
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self.base = 0
+        self.tree: List[int] = [0] * (MIN_TREE_CAPACITY + 1)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _add(self, slot: int, delta: int):
+        while slot < len(self.tree):
+            self.tree[slot] += delta
+            slot += slot & -slot
+
+    def _prefix(self, slot: int) -> int:
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def _find(self, k: int) -> int:
+        """Slot of the k-th waiting entry (1-based)"""
+        slot = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            candidate = slot + step
+            if candidate < len(self.tree) and self.tree[candidate] < k:
+                slot = candidate
+                k -= self.tree[candidate]
+            step >>= 1
+        return slot + 1
+
+    def _rebuild(self):
+        positions = sorted(self.entries)
+        self.base = positions[0] - 1 if positions else 0
+        span = positions[-1] - self.base if positions else 0
+        capacity = MIN_TREE_CAPACITY
+        while capacity < 2 * span:
+            capacity *= 2
+
+        # Linear-time Fenwick construction
+        tree = [0] * (capacity + 1)
+        for position in positions:
+            tree[position - self.base] += 1
+        for slot in range(1, capacity + 1):
+            parent = slot + (slot & -slot)
+            if parent <= capacity:
+                tree[parent] += tree[slot]
+        self.tree = tree
+
+    def add(self, entry: Dict[str, Any]):
+        """Index an entry at its position (which must be free)"""
+        position = entry["position"]
+        self.entries[position] = entry
+        slot = position - self.base
+        if 0 < slot < len(self.tree):
+            self._add(slot, 1)
+        else:
+            self._rebuild()
+
+    def remove(self, position: int) -> Optional[Dict[str, Any]]:
+        """Remove and return the entry at a position"""
+        entry = self.entries.pop(position, None)
+        if entry is not None:
+            if self.entries:
+                self._add(position - self.base, -1)
+            else:
+                self._rebuild()
+        return entry
+
+    def last_position(self) -> int:
+        """Highest waiting position, or 0 if nobody is waiting"""
+        if not self.entries:
+            return 0
+        return self.base + self._find(len(self.entries))
+
+    def rank(self, position: int) -> int:
+        """Place in line of the entry at a position (1 = next to be served)"""
+        return self._prefix(position - self.base)
+
+    def ordered(self) -> List[Dict[str, Any]]:
+        """Waiting entries, first in line first"""
+        return [self.entries[position] for position in sorted(self.entries)]
+
+
+class QueueEngine:
+    """In-memory queues of every room plus the ordered write-through to the queue table"""
+
+    def __init__(self, notify_interval: float, manager=None):
+        self.notify_interval = notify_interval
+        # ConnectionManager whose backplane reaches the other workers (default: the app's)
+        self.manager = manager
+        self.rooms: Dict[str, RoomQueue] = {}
+        # Waiting entries by queue id, participant and session
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.by_participant: Dict[str, Dict[str, Any]] = {}
+        self.by_session: Dict[str, Dict[str, Any]] = {}
+        # Database writes not yet applied, oldest first: ("insert", row) or ("update", queue_id, values)
+        self.pending: List[tuple] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self._loaded = asyncio.Event()
+        # Set when the in-memory queues are dropped (step-down, stop); wakes operations waiting for the rebuild
+        self._reset_event = asyncio.Event()
+        # Rooms whose places in line changed since the last notify tick
+        self._reordered_rooms: Set[str] = set()
+        self._notify_task: Optional[asyncio.Task] = None
+        # Leadership
+        self.worker_id = uuid.uuid4().hex
+        self.leading = False
+        self._lease_deadline = 0.0
+        self._campaign_task: Optional[asyncio.Task] = None
+        self._campaigned = asyncio.Event()
+        # Forwarded operations awaiting the leader's reply, by request id
+        self._replies: Dict[str, asyncio.Future] = {}
+        # Dequeues still being retried until a leader answers
+        self._dequeue_retries: Set[asyncio.Task] = set()
+
+    # Queue operations (synchronous, so each is atomic on the event loop)
+
+    def _index(self, entry: Dict[str, Any]):
+        self.rooms.setdefault(entry["room_id"], RoomQueue()).add(entry)
+        self.entries[entry["id"]] = entry
+        self.by_participant[entry["participant_id"]] = entry
+        if entry.get("session_id"):
+            self.by_session[entry["session_id"]] = entry
+
+    def enqueue(self, room_id: str, participant_id: str, session_id: Optional[str],
+                host_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add a participant to the end of a room's queue
+
+        Returns the new waiting entry; the insert is written through in the background.
+        host_id (the room's host) is only kept to correct the dashboard if the insert is rejected.
+        """
+        room_queue = self.rooms.get(room_id)
+        entry = {
+            "id": str(uuid.uuid4()),
+            "participant_id": participant_id,
+            "room_id": room_id,
+            "position": (room_queue.last_position() if room_queue else 0) + 1,
+            "status": "waiting",
+            "requested_at": datetime.utcnow().isoformat()
+        }
+        self._index({**entry, "session_id": session_id, "host_id": host_id})
+        self._write(("insert", entry))
+        queue_item = self.entries[entry["id"]]
+        # call_host tells the participant their place itself
+        queue_item["notified_position"] = self.position_of(queue_item)
+        return queue_item
+
+    def dequeue(self, queue_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a waiting entry (accepted, declined, ...); returns it, or None if it was not waiting"""
+        entry = self.entries.pop(queue_id, None)
+        if entry is None:
+            return None
+
+        room_queue = self.rooms[entry["room_id"]]
+        room_queue.remove(entry["position"])
+        if not room_queue:
+            del self.rooms[entry["room_id"]]
+        elif room_queue.last_position() > entry["position"]:
+            # Everyone behind moved up a place
+            self._reordered_rooms.add(entry["room_id"])
+            if self._notify_task is None:
+                self._notify_task = asyncio.create_task(self._notify_later())
+        if self.by_participant.get(entry["participant_id"]) is entry:
+            del self.by_participant[entry["participant_id"]]
+        if entry.get("session_id") and self.by_session.get(entry["session_id"]) is entry:
+            del self.by_session[entry["session_id"]]
+        return entry
+
+    def get(self, queue_id: str) -> Optional[Dict[str, Any]]:
+        """Get a waiting entry by queue id"""
+        return self.entries.get(queue_id)
+
+    def get_for_participant(self, participant_id: str) -> Optional[Dict[str, Any]]:
+        """Get a participant's waiting entry"""
+        return self.by_participant.get(participant_id)
+
+    def get_for_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get the waiting entry whose participant is on a session"""
+        return self.by_session.get(session_id)
+
+    def rebind_session(self, entry: Dict[str, Any], session_id: Optional[str]):
+        """
+        Point a waiting entry at the participant's current session
+
+        A participant who rejoins gets a new session; place-in-line pushes must
+        go to that one, not to the session that pressed Call Host.
+        """
+        if not session_id or entry.get("session_id") == session_id:
+            return
+        old_session_id = entry.get("session_id")
+        if old_session_id and self.by_session.get(old_session_id) is entry:
+            del self.by_session[old_session_id]
+        entry["session_id"] = session_id
+        self.by_session[session_id] = entry
+
+    def waiting(self, room_id: str) -> List[Dict[str, Any]]:
+        """Waiting entries of a room, first in line first"""
+        room_queue = self.rooms.get(room_id)
+        return room_queue.ordered() if room_queue else []
+
+    def position_of(self, entry: Dict[str, Any]) -> int:
+        """Place in line of a waiting entry (1 = next to be served)"""
+        return self.rooms[entry["room_id"]].rank(entry["position"])
+
+    # Place-in-line notifications
+
+    async def _notify_later(self):
+        await asyncio.sleep(self.notify_interval)
+        self._notify_task = None
+        await self.notify_reordered()
+
+    async def notify_reordered(self):
+        """Push the new place in line to every participant whose place changed since they were last told"""
+        from routes.websocket import notify_participant_queue_status
+
+        rooms, self._reordered_rooms = self._reordered_rooms, set()
+        sends = []
+        for room_id in rooms:
+            for place, entry in enumerate(self.waiting(room_id), start=1):
+                if entry.get("notified_position") == place:
+                    continue
+                entry["notified_position"] = place
+                if entry.get("session_id"):
+                    sends.append(notify_participant_queue_status(entry["session_id"], {
+                        "queue_id": entry["id"],
+                        "position": place,
+                        "status": "waiting"
+                    }))
+        if sends:
+            await asyncio.gather(*sends, return_exceptions=True)
+
+    # Write-through
+
+    def _write(self, operation: tuple):
+        self.pending.append(operation)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_until_written())
+
+    async def _flush_until_written(self):
+        while self.pending:
+            if not await self.flush():
+                await asyncio.sleep(QUEUE_WRITE_RETRY_SECONDS)
+
+    async def flush(self) -> bool:
+        """
+        Apply pending writes in order; returns False if one failed (it stays pending)
+
+        A write the database rejects for its data (e.g. an insert whose room or
+        participant was deleted meanwhile) is dropped instead, along with its
+        waiting entry, so it cannot hold up the writes behind it.
+        """
+        async with self._flush_lock:
+            rejected: List[Dict[str, Any]] = []
+            try:
+                while self.pending:
+                    operation = self.pending[0]
+                    try:
+                        if operation[0] == "insert":
+                            # Consecutive inserts go in one request
+                            count = 1
+                            while count < len(self.pending) and self.pending[count][0] == "insert":
+                                count += 1
+                            rejected += await self._upsert([op[1] for op in self.pending[:count]])
+                        else:
+                            count = 1
+                            await self._update(operation[1], operation[2])
+                    except Exception as e:
+                        logger.error(f"Failed to write queue changes ({len(self.pending)} pending): {e}")
+                        return False
+                    del self.pending[:count]
+                return True
+            finally:
+                if rejected:
+                    await self._drop_rejected(rejected)
+
+    async def _upsert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Upsert new rows in one request; returns the rows the database rejected
+
+        An upsert, so a retried batch is harmless. A batch rejected because of
+        its rows is split in halves until the bad rows are isolated; other
+        errors are raised.
+        """
+        try:
+            await get_supabase_client().table("queue").upsert(rows).execute()
+            return []
+        except Exception as e:
+            if not is_row_error(e):
+                raise
+            if len(rows) == 1:
+                logger.error(f"Queue entry {rows[0]['id']} was rejected by the database: {e}")
+                return rows
+        middle = len(rows) // 2
+        return await self._upsert(rows[:middle]) + await self._upsert(rows[middle:])
+
+    async def _update(self, queue_id: str, values: Dict[str, Any]):
+        """Update one row; an update rejected for its data is dropped, other errors are raised"""
+        try:
+            await get_supabase_client().table("queue")\
+                .update(values)\
+                .eq("id", queue_id)\
+                .execute()
+        except Exception as e:
+            if not is_row_error(e):
+                raise
+            logger.error(f"Dropped queue update of {queue_id} rejected by the database: {e}")
+
+    async def _drop_rejected(self, rows: List[Dict[str, Any]]):
+        """Take entries whose insert was rejected out of line and tell their participant and host"""
+        from routes.websocket import notify_host_stats, notify_participant_queue_status, notify_queue_update
+
+        sends = []
+        for row in rows:
+            entry = self.dequeue(row["id"])
+            if entry is None:
+                continue
+            sends.append(notify_queue_update(entry["room_id"], {
+                "id": entry["id"],
+                "participant_id": entry["participant_id"],
+                "status": "expired"
+            }, "removed"))
+            if entry.get("session_id"):
+                sends.append(notify_participant_queue_status(entry["session_id"], {
+                    "queue_id": entry["id"],
+                    "status": "expired"
+                }))
+            # call_host counted it on the dashboard; the database never did
+            sends.append(notify_host_stats(entry.get("host_id"), {"pending_queue_requests": -1}))
+        if sends:
+            await asyncio.gather(*sends, return_exceptions=True)
+
+    # Startup
+
+    async def load(self):
+        """Rebuild the in-memory queues from the waiting rows of the queue table"""
+        supabase = get_supabase_client()
+        rows: List[Dict[str, Any]] = []
+        while True:
+            response = await supabase.table("queue")\
+                .select("id, participant_id, room_id, position, status, requested_at")\
+                .eq("status", "waiting")\
+                .order("id")\
+                .range(len(rows), len(rows) + QUEUE_LOAD_PAGE_SIZE - 1)\
+                .execute()
+            rows.extend(response.data or [])
+            if len(response.data or []) < QUEUE_LOAD_PAGE_SIZE:
+                break
+
+        sessions: Dict[str, str] = {}
+        participant_ids = list({row["participant_id"] for row in rows})
+        for i in range(0, len(participant_ids), 200):
+            participants_response = await supabase.table("participants")\
+                .select("id, session_id")\
+                .in_("id", participant_ids[i:i + 200])\
+                .execute()
+            sessions.update({p["id"]: p["session_id"] for p in (participants_response.data or [])})
+
+        repaired = 0
+        for row in sorted(rows, key=lambda r: (r["room_id"], r["position"], r["requested_at"] or "")):
+            room_queue = self.rooms.get(row["room_id"])
+            last_position = room_queue.last_position() if room_queue else 0
+            if row["position"] <= last_position or row["participant_id"] in self.by_participant:
+                if row["participant_id"] in self.by_participant:
+                    # A participant waits once; a duplicate request from the old racy path is stale
+                    self._write(("update", row["id"], {"status": "expired"}))
+                    repaired += 1
+                    continue
+                # Two requests raced to the same position; move the later one behind
+                row = {**row, "position": last_position + 1}
+                self._write(("update", row["id"], {"position": row["position"]}))
+                repaired += 1
+            self._index({**row, "session_id": sessions.get(row["participant_id"])})
+
+        # Clients ask for their place when they reconnect
+        for entry in self.entries.values():
+            entry["notified_position"] = self.position_of(entry)
+
+        self._loaded.set()
+        logger.info(f"Queue engine loaded {len(self.entries)} waiting entries in {len(self.rooms)} rooms"
+                    + (f", repaired {repaired} duplicates" if repaired else ""))
+
+    async def _load_until_loaded(self):
+        while True:
+            try:
+                await self.load()
+                return
+            except Exception as e:
+                logger.error(f"Failed to load queue engine, retrying: {e}")
+                await asyncio.sleep(QUEUE_WRITE_RETRY_SECONDS)
+
+    async def wait_loaded(self, timeout: Optional[float] = None):
+        """
+        Wait until the startup rebuild has finished
+
+        Raises QueueUnavailable if it has not within timeout seconds (default
+        QUEUE_LOAD_WAIT_SECONDS) or the queues are dropped meanwhile.
+        """
+        if self._loaded.is_set():
+            return
+        waits = [asyncio.ensure_future(self._loaded.wait()), asyncio.ensure_future(self._reset_event.wait())]
+        try:
+            await asyncio.wait(waits, timeout=QUEUE_LOAD_WAIT_SECONDS if timeout is None else timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for wait in waits:
+                wait.cancel()
+        if not self._loaded.is_set():
+            raise QueueUnavailable("The queues are not loaded")
+
+    # Leadership
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this worker holds an unexpired lease (and so serves the queues)"""
+        return self.leading and time.monotonic() < self._lease_deadline
+
+    def _get_manager(self):
+        if self.manager is None:
+            from routes.websocket import manager
+            self.manager = manager
+        return self.manager
+
+    async def _campaign(self):
+        supabase = get_supabase_client()
+        while True:
+            started = time.monotonic()
+            claimed: Optional[bool] = None
+            try:
+                response = await supabase.rpc("claim_queue_engine", {
+                    "p_holder": self.worker_id,
+                    "p_lease_seconds": QUEUE_ENGINE_LEASE_SECONDS
+                }).execute()
+                claimed = bool(response.data)
+            except Exception as e:
+                logger.error(f"Failed to claim the queue engine lease: {e}")
+
+            if claimed:
+                self._lease_deadline = started + QUEUE_ENGINE_LEASE_SECONDS
+                if not self.leading:
+                    self._lead()
+            elif self.leading and (claimed is False or time.monotonic() >= self._lease_deadline):
+                self._step_down()
+            self._campaigned.set()
+            await asyncio.sleep(QUEUE_ENGINE_LEASE_SECONDS / 3)
+
+    def _reset(self):
+        """Forget the in-memory queues (writes still pending keep being applied)"""
+        if self._load_task is not None:
+            self._load_task.cancel()
+            self._load_task = None
+        if self._notify_task is not None:
+            self._notify_task.cancel()
+            self._notify_task = None
+        self.rooms = {}
+        self.entries = {}
+        self.by_participant = {}
+        self.by_session = {}
+        self._reordered_rooms = set()
+        self._loaded.clear()
+        # Operations waiting for the rebuild fail instead of waiting for a next term
+        self._reset_event.set()
+        self._reset_event = asyncio.Event()
+
+    def _lead(self):
+        logger.info(f"Worker {self.worker_id} leads the queue engine")
+        self._reset()
+        self.leading = True
+        self._load_task = asyncio.create_task(self._load_until_loaded())
+
+    def _step_down(self):
+        logger.warning(f"Worker {self.worker_id} lost the queue engine lease, handing the queues over")
+        self.leading = False
+        self._reset()
+
+    # Operations (run by the leader, whichever worker they come from)
+
+    async def request(self, operation: str, **arguments) -> Any:
+        """
+        Run a queue operation on the leader: here if this worker leads, else forwarded to it
+
+        Operations:
+            call_host(room_id, participant_id, session_id, host_id) -> {"entry", "position", "created"}
+            status(participant_id, session_id) -> {"entry", "position"} or None
+            flush() -> whether every pending write is saved
+            dequeue(queue_id) -> whether the request was waiting
+            places(queue_ids) -> {queue_id: place in line} of those still waiting
+
+        Raises QueueUnavailable if no leader answered.
+        """
+        self.start()
+        await self._campaigned.wait()
+        if self.is_leader:
+            return await self._run(operation, arguments)
+        return await self._forward(operation, arguments)
+
+    async def request_dequeue(self, queue_id: str):
+        """
+        Take a request that left 'waiting' in the database out of line on the leader
+
+        If no leader answers, the dequeue is retried in the background until one
+        does; otherwise the leader would keep the participant waiting and
+        everyone behind them a place too far back.
+        """
+        try:
+            await self.request("dequeue", queue_id=queue_id)
+        except QueueUnavailable as e:
+            logger.warning(f"Could not take queue request {queue_id} out of line, retrying: {e}")
+            task = asyncio.create_task(self._dequeue_until_answered(queue_id))
+            self._dequeue_retries.add(task)
+            task.add_done_callback(self._dequeue_retries.discard)
+
+    async def _dequeue_until_answered(self, queue_id: str):
+        while True:
+            await asyncio.sleep(QUEUE_WRITE_RETRY_SECONDS)
+            try:
+                await self.request("dequeue", queue_id=queue_id)
+                return
+            except QueueUnavailable:
+                pass
+            except Exception as e:
+                logger.error(f"Failed to take queue request {queue_id} out of line: {e}")
+                return
+
+    async def sync(self) -> bool:
+        """Have the leader write its pending changes; False if they are not all saved (or no leader answered)"""
+        try:
+            return await self.request("flush")
+        except QueueUnavailable:
+            return False
+
+    async def _run(self, operation: str, arguments: Dict[str, Any]) -> Any:
+        await self.wait_loaded()
+        if not self.is_leader:
+            # The lease ran out while waiting; another worker serves the queues now
+            raise QueueUnavailable("This worker no longer leads the queue engine")
+        if operation == "flush":
+            return await self.flush()
+        if operation == "call_host":
+            queue_item = self.get_for_participant(arguments["participant_id"])
+            created = queue_item is None
+            if created:
+                # Check and append happen without yielding, so concurrent requests get distinct positions
+                queue_item = self.enqueue(arguments["room_id"], arguments["participant_id"],
+                                          arguments["session_id"], arguments.get("host_id"))
+            else:
+                self.rebind_session(queue_item, arguments["session_id"])
+            return {"entry": dict(queue_item), "position": self.position_of(queue_item), "created": created}
+        if operation == "status":
+            queue_item = self.get_for_participant(arguments["participant_id"])
+            if queue_item is None:
+                return None
+            self.rebind_session(queue_item, arguments.get("session_id"))
+            return {"entry": dict(queue_item), "position": self.position_of(queue_item)}
+        if operation == "dequeue":
+            return self.dequeue(arguments["queue_id"]) is not None
+        if operation == "places":
+            return {
+                queue_id: self.position_of(self.entries[queue_id])
+                for queue_id in arguments["queue_ids"] if queue_id in self.entries
+            }
+        raise ValueError(f"Unknown queue operation {operation!r}")
+
+    async def _forward(self, operation: str, arguments: Dict[str, Any]) -> Any:
+        request_id = uuid.uuid4().hex
+        reply = asyncio.get_running_loop().create_future()
+        self._replies[request_id] = reply
+        try:
+            published = await self._get_manager().publish({
+                "kind": "queue_request",
+                "request_id": request_id,
+                "reply_to": self.worker_id,
+                "operation": operation,
+                "arguments": arguments
+            })
+            if not published:
+                raise QueueUnavailable("The queue engine runs in another worker and the WebSocket backplane can't reach it")
+            try:
+                answer = await asyncio.wait_for(reply, QUEUE_FORWARD_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise QueueUnavailable("The queue engine did not answer")
+        finally:
+            self._replies.pop(request_id, None)
+        if "unavailable" in answer:
+            raise QueueUnavailable(answer["unavailable"])
+        if "error" in answer:
+            raise RuntimeError(f"Queue operation {operation} failed on the leader: {answer['error']}")
+        return answer["result"]
+
+    def _on_request(self, envelope: dict):
+        if self.is_leader:
+            asyncio.create_task(self._answer(envelope))
+
+    async def _answer(self, envelope: dict):
+        try:
+            reply = {"result": await self._run(envelope["operation"], envelope["arguments"])}
+        except QueueUnavailable as e:
+            reply = {"unavailable": str(e)}
+        except Exception as e:
+            logger.error(f"Forwarded queue operation {envelope['operation']} failed: {e}", exc_info=True)
+            reply = {"error": str(e)}
+        await self._get_manager().publish({
+            "kind": "queue_reply",
+            "request_id": envelope["request_id"],
+            "reply_to": envelope["reply_to"],
+            **reply
+        })
+
+    def _on_reply(self, envelope: dict):
+        if envelope.get("reply_to") != self.worker_id:
+            return
+        reply = self._replies.get(envelope["request_id"])
+        if reply is not None and not reply.done():
+            reply.set_result(envelope)
+
+    # Lifecycle
+
+    def start(self):
+        """Start campaigning for the lease and answering operations forwarded by other workers"""
+        if self._campaign_task is None:
+            manager = self._get_manager()
+            manager.add_handler("queue_request", self._on_request)
+            manager.add_handler("queue_reply", self._on_reply)
+            self._campaign_task = asyncio.create_task(self._campaign())
+
+    async def stop(self):
+        """Stop campaigning, write anything still pending and hand the lease over"""
+        if self._campaign_task is not None:
+            self._campaign_task.cancel()
+            self._campaign_task = None
+        # A later leader rebuilds from the table, which no longer lists these as waiting
+        for task in list(self._dequeue_retries):
+            task.cancel()
+        was_leading = self.leading
+        self.leading = False
+        self._reset()
+        await self.flush()
+        if was_leading:
+            try:
+                await get_supabase_client().rpc("release_queue_engine", {"p_holder": self.worker_id}).execute()
+            except Exception as e:
+                logger.warning(f"Failed to release the queue engine lease: {e}")
+
+
+# Global queue engine
+_queue_engine: Optional[QueueEngine] = None
+
+
+def get_queue_engine() -> QueueEngine:
+    """Get or create queue engine instance (singleton pattern)"""
+    global _queue_engine
+    if _queue_engine is None:
+        _queue_engine = QueueEngine(QUEUE_NOTIFY_INTERVAL_MS / 1000)
+    return _queue_engine
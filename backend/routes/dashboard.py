@@ -4,11 +4,21 @@ Dashboard routes for host
 from fastapi import APIRouter, Depends
 from database import get_supabase_client
 from auth import get_current_host
+from queue_engine import QueueUnavailable, get_queue_engine
 from schemas import HostResponse
 from typing import Dict, Any
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# Counters in the host_stats table, as returned by /stats
+HOST_STATS_COLUMNS = [
+    "total_rooms",
+    "active_rooms",
+    "total_participants",
+    "active_sessions",
+    "pending_queue_requests"
+]
+
 
 @router.get("/me", response_model=HostResponse)
 async def get_current_user(current_host: dict = Depends(get_current_host)):
@@ -18,62 +28,24 @@ async def get_current_user(current_host: dict = Depends(get_current_host)):
 
 @router.get("/stats")
 async def get_dashboard_stats(current_host: dict = Depends(get_current_host)):
-    """Get dashboard statistics"""
-    supabase = get_supabase_client()
-    
-    # Count rooms
-    rooms_response = supabase.table("rooms")\
-        .select("id", count="exact")\
-        .eq("host_id", current_host["id"])\
-        .execute()
+    """
+    Get dashboard statistics
     
-    # Count active rooms
-    active_rooms_response = supabase.table("rooms")\
-        .select("id", count="exact")\
-        .eq("host_id", current_host["id"])\
-        .eq("active", True)\
-        .execute()
+    Counters are kept in host_stats by database triggers, so this reads one row;
+    the host WebSocket pushes stats_update deltas as they change.
+    """
+    supabase = get_supabase_client()
     
-    # Count total participants across all rooms
-    rooms_list = supabase.table("rooms")\
-        .select("id")\
+    # Queue requests count once the queue engine's pending inserts are written
+    await get_queue_engine().sync()
+    stats_response = await supabase.table("host_stats")\
+        .select(", ".join(HOST_STATS_COLUMNS))\
         .eq("host_id", current_host["id"])\
         .execute()
     
-    room_ids = [room["id"] for room in rooms_list.data] if rooms_list.data else []
-    
-    total_participants = 0
-    if room_ids:
-        participants_response = supabase.table("participants")\
-            .select("id", count="exact")\
-            .in_("room_id", room_ids)\
-            .execute()
-        total_participants = participants_response.count or 0
-    
-    # Count active sessions
-    active_sessions = 0
-    if room_ids:
-        sessions_response = supabase.table("sessions")\
-            .select("id", count="exact")\
-            .in_("room_id", room_ids)\
-            .is_("ended_at", "null")\
-            .execute()
-        active_sessions = sessions_response.count or 0
-    
-    # Count queue requests
-    queue_response = supabase.table("queue")\
-        .select("id", count="exact")\
-        .in_("room_id", room_ids)\
-        .eq("status", "waiting")\
-        .execute()
-    
-    return {
-        "total_rooms": rooms_response.count or 0,
-        "active_rooms": active_rooms_response.count or 0,
-        "total_participants": total_participants,
-        "active_sessions": active_sessions,
-        "pending_queue_requests": queue_response.count or 0
-    }
+    # No row yet: the host has never created a room
+    stats = stats_response.data[0] if stats_response.data else {}
+    return {column: stats.get(column) or 0 for column in HOST_STATS_COLUMNS}
 
 
 @router.get("/queue")
@@ -82,7 +54,7 @@ async def get_queue(current_host: dict = Depends(get_current_host)):
     supabase = get_supabase_client()
     
     # Get all room IDs for this host
-    rooms_response = supabase.table("rooms")\
+    rooms_response = await supabase.table("rooms")\
         .select("id")\
         .eq("host_id", current_host["id"])\
         .execute()
@@ -92,8 +64,10 @@ async def get_queue(current_host: dict = Depends(get_current_host)):
     if not room_ids:
         return []
     
-    # Get queue entries
-    queue_response = supabase.table("queue")\
+    # Get queue entries (after the queue engine's pending inserts are written)
+    engine = get_queue_engine()
+    await engine.sync()
+    queue_response = await supabase.table("queue")\
         .select("*")\
         .in_("room_id", room_ids)\
         .eq("status", "waiting")\
@@ -103,24 +77,30 @@ async def get_queue(current_host: dict = Depends(get_current_host)):
     # Get participant and room info separately
     queue_items = []
     if queue_response.data:
+        # Places in line come from the queue engine
+        try:
+            places = await engine.request("places", queue_ids=[item["id"] for item in queue_response.data])
+        except QueueUnavailable:
+            places = {}
+        
         participant_ids = [item["participant_id"] for item in queue_response.data]
         room_ids_for_queue = list(set([item["room_id"] for item in queue_response.data]))
         
         # Get participants
-        participants_response = supabase.table("participants")\
+        participants_response = await supabase.table("participants")\
             .select("id, name")\
             .in_("id", participant_ids)\
             .execute()
         participants_dict = {p["id"]: p["name"] for p in (participants_response.data or [])}
         
         # Get rooms
-        rooms_response = supabase.table("rooms")\
+        rooms_response = await supabase.table("rooms")\
             .select("id, name")\
             .in_("id", room_ids_for_queue)\
             .execute()
         rooms_dict = {r["id"]: r["name"] for r in (rooms_response.data or [])}
         
-        # Format the response
+        # Format the response (position is the place in line, which closes up as requests are handled)
         for item in queue_response.data:
             queue_items.append({
                 "id": item["id"],
@@ -129,7 +109,7 @@ async def get_queue(current_host: dict = Depends(get_current_host)):
                 "room_id": item["room_id"],
                 "room_name": rooms_dict.get(item["room_id"], "Unknown"),
                 "requested_at": item["requested_at"],
-                "position": item["position"],
+                "position": places.get(item["id"], item["position"]),
                 "status": item["status"]
             })
     
@@ -9,6 +9,9 @@ from schemas import ParticipantJoin, SessionResponse, ParticipantResponse
 from typing import Optional
 import logging
 from auth import decode_token
+from context_engine import get_participant_context, invalidate_session
+from routes.websocket import notify_host_stats
+from transcript_store import get_transcript_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +33,7 @@ async def join_room(request: Request, join_data: ParticipantJoin):
     
     try:
         # Step 1: Verify invite link and get room
-        room_response = supabase.table("rooms")\
+        room_response = await supabase.table("rooms")\
             .select("*")\
             .eq("invite_link", join_data.invite_link)\
             .eq("active", True)\
@@ -67,13 +70,14 @@ async def join_room(request: Request, join_data: ParticipantJoin):
         participant_name = join_data.name.strip()
         
         # Step 2: Check if participant already exists for this room and name
-        existing_participant_response = supabase.table("participants")\
+        existing_participant_response = await supabase.table("participants")\
             .select("*")\
             .eq("room_id", room_id)\
             .eq("name", participant_name)\
             .execute()
         
         participant_id = None
+        new_participant = False
         if existing_participant_response.data:
             # Participant already exists
             participant_id = existing_participant_response.data[0]["id"]
@@ -81,7 +85,7 @@ async def join_room(request: Request, join_data: ParticipantJoin):
             
             # Check if they have an active session
             if existing_session_id:
-                session_response = supabase.table("sessions")\
+                session_response = await supabase.table("sessions")\
                     .select("*")\
                     .eq("id", existing_session_id)\
                     .is_("ended_at", "null")\
@@ -107,7 +111,7 @@ async def join_room(request: Request, join_data: ParticipantJoin):
                 "name": participant_name,
                 "status": "active"
             }
-            participant_response = supabase.table("participants")\
+            participant_response = await supabase.table("participants")\
                 .insert(participant_data)\
                 .execute()
             
@@ -118,6 +122,7 @@ async def join_room(request: Request, join_data: ParticipantJoin):
                 )
             
             participant_id = participant_response.data[0]["id"]
+            new_participant = True
             logger.info(f"Created new participant {participant_id} for room {room_id}")
         
         # Step 4: Create new session
@@ -126,7 +131,7 @@ async def join_room(request: Request, join_data: ParticipantJoin):
             "room_id": room_id,
             "transcript": []
         }
-        session_response = supabase.table("sessions")\
+        session_response = await supabase.table("sessions")\
             .insert(session_data)\
             .execute()
         
@@ -140,13 +145,18 @@ async def join_room(request: Request, join_data: ParticipantJoin):
         session_id = session["id"]
         
         # Step 5: Update participant with session_id
-        supabase.table("participants")\
+        await supabase.table("participants")\
             .update({"session_id": session_id})\
             .eq("id", participant_id)\
             .execute()
         
         logger.info(f"Created new session {session_id} for participant {participant_name} in room {room_id}")
         
+        await notify_host_stats(room["host_id"], {
+            "total_participants": 1 if new_participant else 0,
+            "active_sessions": 1
+        })
+        
         return {
             "session_id": session_id,
             "participant_id": participant_id,
@@ -172,7 +182,7 @@ async def get_session(session_id: str):
     supabase = get_supabase_client()
     
     # Get session
-    session_response = supabase.table("sessions")\
+    session_response = await supabase.table("sessions")\
         .select("*")\
         .eq("id", session_id)\
         .execute()
@@ -188,7 +198,7 @@ async def get_session(session_id: str):
     room_id = session["room_id"]
     
     # Get participant name
-    participant_response = supabase.table("participants")\
+    participant_response = await supabase.table("participants")\
         .select("name")\
         .eq("id", participant_id)\
         .execute()
@@ -196,7 +206,7 @@ async def get_session(session_id: str):
     participant_name = participant_response.data[0]["name"] if participant_response.data else "Unknown"
     
     # Get room name
-    room_response = supabase.table("rooms")\
+    room_response = await supabase.table("rooms")\
         .select("name")\
         .eq("id", room_id)\
         .execute()
@@ -219,7 +229,7 @@ async def end_session(session_id: str):
     supabase = get_supabase_client()
     
     # Check if session exists
-    session_response = supabase.table("sessions")\
+    session_response = await supabase.table("sessions")\
         .select("id, ended_at")\
         .eq("id", session_id)\
         .execute()
@@ -236,24 +246,32 @@ async def end_session(session_id: str):
         return {"message": "Session already ended", "session_id": session_id}
     
     # Update session with end time
-    supabase.table("sessions")\
+    await supabase.table("sessions")\
         .update({"ended_at": datetime.utcnow().isoformat()})\
         .eq("id", session_id)\
         .execute()
     
     # Update participant status
-    participant_response = supabase.table("sessions")\
+    participant_response = await supabase.table("sessions")\
         .select("participant_id")\
         .eq("id", session_id)\
         .execute()
     
     if participant_response.data:
         participant_id = participant_response.data[0]["participant_id"]
-        supabase.table("participants")\
+        await supabase.table("participants")\
             .update({"status": "completed"})\
             .eq("id", participant_id)\
             .execute()
     
+    # Resolve the host before dropping the cached context
+    context = await get_participant_context(session_id)
+    await invalidate_session(session_id)
+    await notify_host_stats(context and context.get("host_id"), {"active_sessions": -1})
+    
+    # Persist any buffered transcript turns now that the conversation is over
+    await get_transcript_buffer().flush()
+    
     logger.info(f"Ended session {session_id}")
     
     return {"message": "Session ended successfully", "session_id": session_id}
@@ -1,12 +1,13 @@
 """
 Queue management routes for Call Host feature
 """
-from datetime import datetime
 from fastapi import APIRouter, HTTPException, status, Depends
 from database import get_supabase_client
 from auth import get_current_host
+from queue_engine import QueueUnavailable, get_queue_engine
 from schemas import CallHostRequest, QueueStatusResponse, QueueActionResponse
-from routes.websocket import manager, notify_queue_update, notify_participant_queue_status, send_intervention_message
+from routes.websocket import manager, notify_host_stats, notify_queue_update, notify_participant_queue_status, send_intervention_message
+from postgrest.exceptions import APIError
 from typing import Optional
 import logging
 
@@ -14,6 +15,24 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/queue", tags=["queue"])
 
+# Errors raised by the transition_queue_request database function (SQLSTATE -> HTTP status)
+QUEUE_TRANSITION_ERRORS = {
+    "P0002": status.HTTP_404_NOT_FOUND,  # request not found
+    "22P02": status.HTTP_404_NOT_FOUND,  # queue id is not a UUID
+    "42501": status.HTTP_403_FORBIDDEN,  # room belongs to another host
+    "55000": status.HTTP_409_CONFLICT,  # already accepted or declined
+}
+
+
+def queue_unavailable(error: QueueUnavailable) -> HTTPException:
+    """503 for a queue operation no queue engine worker answered"""
+    logger.warning(f"Queue engine unavailable: {error}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The queue is not available right now, please retry",
+        headers={"Retry-After": "1"}
+    )
+
 
 @router.get("/item/{queue_id}")
 async def get_queue_item(queue_id: str, current_host: dict = Depends(get_current_host)):
@@ -21,8 +40,11 @@ async def get_queue_item(queue_id: str, current_host: dict = Depends(get_current
     supabase = get_supabase_client()
     
     try:
+        # Entries created by call_host may not have been written through yet
+        await get_queue_engine().sync()
+        
         # Get queue item
-        queue_response = supabase.table("queue")\
+        queue_response = await supabase.table("queue")\
             .select("*")\
             .eq("id", queue_id)\
             .execute()
@@ -37,7 +59,7 @@ async def get_queue_item(queue_id: str, current_host: dict = Depends(get_current
         room_id = queue_item["room_id"]
         
         # Verify room belongs to host
-        room_response = supabase.table("rooms")\
+        room_response = await supabase.table("rooms")\
             .select("host_id, name")\
             .eq("id", room_id)\
             .execute()
@@ -49,7 +71,7 @@ async def get_queue_item(queue_id: str, current_host: dict = Depends(get_current
             )
         
         # Get participant name
-        participant_response = supabase.table("participants")\
+        participant_response = await supabase.table("participants")\
             .select("id, name, session_id")\
             .eq("id", queue_item["participant_id"])\
             .execute()
@@ -84,18 +106,19 @@ async def call_host(request: CallHostRequest):
     Participant requests host intervention
     
     Flow:
-    1. Get session info (participant_id, room_id)
-    2. Check if already in queue
-    3. Get next position in queue
-    4. Create queue entry
-    5. Return queue status
+    1. Get session info (participant_id, room_id, the room's host_id)
+    2. Check if already in queue and otherwise append to the room's queue, in one
+       queue engine operation (in memory, on the worker leading the queue engine;
+       written to the database in the background)
+    3. Return queue status
     """
     supabase = get_supabase_client()
+    engine = get_queue_engine()
     
     try:
         # Get session information
-        session_response = supabase.table("sessions")\
-            .select("participant_id, room_id")\
+        session_response = await supabase.table("sessions")\
+            .select("participant_id, room_id, rooms!fk_room(host_id)")\
             .eq("id", request.session_id)\
             .is_("ended_at", "null")\
             .execute()
@@ -109,56 +132,28 @@ async def call_host(request: CallHostRequest):
         session = session_response.data[0]
         participant_id = session["participant_id"]
         room_id = session["room_id"]
-        
-        # Check if participant already has a waiting request
-        existing_queue = supabase.table("queue")\
-            .select("*")\
-            .eq("participant_id", participant_id)\
-            .eq("status", "waiting")\
-            .execute()
-        
-        if existing_queue.data:
+        host_id = (session.get("rooms") or {}).get("host_id")
+        
+        # Check and append happen in one operation, so concurrent requests get distinct positions
+        result = await engine.request(
+            "call_host",
+            room_id=room_id,
+            participant_id=participant_id,
+            session_id=request.session_id,
+            host_id=host_id
+        )
+        queue_item = result["entry"]
+        if not result["created"]:
             # Already in queue
-            queue_item = existing_queue.data[0]
+            position = result["position"]
             return {
                 "queue_id": queue_item["id"],
-                "position": queue_item["position"],
+                "position": position,
                 "status": "waiting",
-                "message": f"You are already in the queue at position {queue_item['position']}"
+                "message": f"You are already in the queue at position {position}"
             }
         
-        # Get the next position in queue for this room
-        # Get all waiting positions and find the max
-        all_positions = supabase.table("queue")\
-            .select("position")\
-            .eq("room_id", room_id)\
-            .eq("status", "waiting")\
-            .execute()
-        
-        next_position = 1
-        if all_positions.data:
-            max_pos = max([item.get("position", 0) for item in all_positions.data], default=0)
-            next_position = max_pos + 1
-        
-        # Create queue entry
-        queue_data = {
-            "participant_id": participant_id,
-            "room_id": room_id,
-            "position": next_position,
-            "status": "waiting"
-        }
-        
-        queue_response = supabase.table("queue")\
-            .insert(queue_data)\
-            .execute()
-        
-        if not queue_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create queue entry"
-            )
-        
-        queue_item = queue_response.data[0]
+        next_position = result["position"]
         logger.info(f"Created queue entry {queue_item['id']} for participant {participant_id} at position {next_position}")
         
         # Notify host via WebSocket about new queue request
@@ -167,7 +162,7 @@ async def call_host(request: CallHostRequest):
             "participant_id": participant_id,
             "position": next_position,
             "status": "waiting",
-            "requested_at": queue_item.get("requested_at")
+            "requested_at": queue_item["requested_at"]
         }, "new")
         
         # Notify participant about their queue status
@@ -177,6 +172,8 @@ async def call_host(request: CallHostRequest):
             "status": "waiting"
         })
         
+        await notify_host_stats(host_id, {"pending_queue_requests": 1})
+        
         return {
             "queue_id": queue_item["id"],
             "position": next_position,
@@ -186,6 +183,8 @@ async def call_host(request: CallHostRequest):
     
     except HTTPException:
         raise
+    except QueueUnavailable as e:
+        raise queue_unavailable(e)
     except Exception as e:
         logger.error(f"Error creating queue entry: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -196,12 +195,19 @@ async def call_host(request: CallHostRequest):
 
 @router.get("/status/{session_id}", response_model=QueueStatusResponse)
 async def get_queue_status(session_id: str):
-    """Get queue status for a participant session"""
+    """
+    Get queue status for a participant session
+    
+    The queue entry is looked up by participant, so a participant who rejoined
+    on a new session still finds the request made from the old one (and gets
+    its place-in-line pushes on the new session from then on).
+    """
     supabase = get_supabase_client()
+    engine = get_queue_engine()
     
     try:
         # Get session to find participant_id
-        session_response = supabase.table("sessions")\
+        session_response = await supabase.table("sessions")\
             .select("participant_id")\
             .eq("id", session_id)\
             .execute()
@@ -214,18 +220,13 @@ async def get_queue_status(session_id: str):
                 "message": "Session not found"
             }
         
-        participant_id = session_response.data[0]["participant_id"]
-        
-        # Get queue entry
-        queue_response = supabase.table("queue")\
-            .select("*")\
-            .eq("participant_id", participant_id)\
-            .eq("status", "waiting")\
-            .order("requested_at")\
-            .limit(1)\
-            .execute()
+        result = await engine.request(
+            "status",
+            participant_id=session_response.data[0]["participant_id"],
+            session_id=session_id
+        )
         
-        if not queue_response.data:
+        if not result:
             return {
                 "queue_id": None,
                 "position": None,
@@ -233,12 +234,13 @@ async def get_queue_status(session_id: str):
                 "message": "Not in queue"
             }
         
-        queue_item = queue_response.data[0]
+        queue_item = result["entry"]
+        position = result["position"]
         return {
             "queue_id": queue_item["id"],
-            "position": queue_item["position"],
+            "position": position,
             "status": queue_item["status"],
-            "message": f"You are in the queue at position {queue_item['position']}"
+            "message": f"You are in the queue at position {position}"
         }
     
     except Exception as e:
@@ -251,66 +253,71 @@ async def get_queue_status(session_id: str):
         }
 
 
+async def transition_queue_request(queue_id: str, host_id: str, new_status: str) -> dict:
+    """
+    Move a waiting request to "accepted" or "declined" in one round trip
+    
+    The transition_queue_request database function checks ownership, updates
+    the row and returns the participant's session_id atomically.
+    
+    Returns:
+        {"queue_id", "room_id", "participant_id", "session_id", "status"}
+    """
+    supabase = get_supabase_client()
+    engine = get_queue_engine()
+    
+    # Entries created by call_host may not have been written through yet;
+    # without them the database function would report the request as missing.
+    # (The leader syncs only after its startup rebuild, which would re-add a
+    # request dequeued before it finished.)
+    if not await engine.sync():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Queue changes are still being saved, please retry",
+            headers={"Retry-After": "1"}
+        )
+
+    try:
+        response = await supabase.rpc("transition_queue_request", {
+            "p_queue_id": queue_id,
+            "p_host_id": host_id,
+            "p_status": new_status
+        }).execute()
+    except APIError as e:
+        status_code = QUEUE_TRANSITION_ERRORS.get(e.code)
+        if status_code is None:
+            raise
+        raise HTTPException(status_code=status_code, detail=e.message)
+    
+    result = response.data
+    if isinstance(result, list):
+        result = result[0] if result else None
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Queue request not found"
+        )
+    
+    await engine.request_dequeue(queue_id)
+    await notify_host_stats(host_id, {"pending_queue_requests": -1})
+    return result
+
+
 @router.post("/{queue_id}/accept", response_model=QueueActionResponse)
 async def accept_queue_request(queue_id: str, current_host: dict = Depends(get_current_host)):
     """Host accepts a queue request"""
-    supabase = get_supabase_client()
-    
     try:
-        # Get queue item
-        queue_response = supabase.table("queue")\
-            .select("*")\
-            .eq("id", queue_id)\
-            .execute()
-        
-        if not queue_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Queue request not found"
-            )
-        
-        queue_item = queue_response.data[0]
-        room_id = queue_item["room_id"]
-        
-        # Verify room belongs to host
-        room_response = supabase.table("rooms")\
-            .select("host_id")\
-            .eq("id", room_id)\
-            .execute()
-        
-        if not room_response.data or room_response.data[0]["host_id"] != current_host["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to accept this request"
-            )
-        
-        # Update queue status
-        update_response = supabase.table("queue")\
-            .update({
-                "status": "accepted",
-                "accepted_at": datetime.utcnow().isoformat()
-            })\
-            .eq("id", queue_id)\
-            .execute()
-        
-        updated_item = update_response.data[0] if update_response.data else queue_item
+        result = await transition_queue_request(queue_id, current_host["id"], "accepted")
+        session_id = result.get("session_id")
         
         # Notify via WebSocket
-        await notify_queue_update(room_id, {
+        await notify_queue_update(result["room_id"], {
             "id": queue_id,
-            "participant_id": queue_item["participant_id"],
+            "participant_id": result["participant_id"],
             "status": "accepted"
         }, "accepted")
         
-        # Get session_id to notify participant
-        participant_response = supabase.table("participants")\
-            .select("session_id")\
-            .eq("id", queue_item["participant_id"])\
-            .execute()
-        
-        session_id = None
-        if participant_response.data and participant_response.data[0].get("session_id"):
-            session_id = participant_response.data[0]["session_id"]
+        if session_id:
             await notify_participant_queue_status(session_id, {
                 "queue_id": queue_id,
                 "status": "accepted"
@@ -328,7 +335,7 @@ async def accept_queue_request(queue_id: str, current_host: dict = Depends(get_c
             "message": "Request accepted",
             "queue_id": queue_id,
             "status": "accepted",
-            "participant_id": queue_item["participant_id"],
+            "participant_id": result["participant_id"],
             "session_id": session_id
         }
     
@@ -345,58 +352,18 @@ async def accept_queue_request(queue_id: str, current_host: dict = Depends(get_c
 @router.post("/{queue_id}/decline", response_model=QueueActionResponse)
 async def decline_queue_request(queue_id: str, current_host: dict = Depends(get_current_host)):
     """Host declines a queue request"""
-    supabase = get_supabase_client()
-    
     try:
-        # Get queue item
-        queue_response = supabase.table("queue")\
-            .select("*")\
-            .eq("id", queue_id)\
-            .execute()
-        
-        if not queue_response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Queue request not found"
-            )
-        
-        queue_item = queue_response.data[0]
-        room_id = queue_item["room_id"]
-        
-        # Verify room belongs to host
-        room_response = supabase.table("rooms")\
-            .select("host_id")\
-            .eq("id", room_id)\
-            .execute()
-        
-        if not room_response.data or room_response.data[0]["host_id"] != current_host["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to decline this request"
-            )
-        
-        # Update queue status
-        update_response = supabase.table("queue")\
-            .update({"status": "declined"})\
-            .eq("id", queue_id)\
-            .execute()
+        result = await transition_queue_request(queue_id, current_host["id"], "declined")
         
         # Notify via WebSocket
-        await notify_queue_update(room_id, {
+        await notify_queue_update(result["room_id"], {
             "id": queue_id,
-            "participant_id": queue_item["participant_id"],
+            "participant_id": result["participant_id"],
             "status": "declined"
         }, "declined")
         
-        # Get session_id to notify participant
-        participant_response = supabase.table("participants")\
-            .select("session_id")\
-            .eq("id", queue_item["participant_id"])\
-            .execute()
-        
-        if participant_response.data and participant_response.data[0].get("session_id"):
-            session_id = participant_response.data[0]["session_id"]
-            await notify_participant_queue_status(session_id, {
+        if result.get("session_id"):
+            await notify_participant_queue_status(result["session_id"], {
                 "queue_id": queue_id,
                 "status": "declined"
             })
@@ -6,6 +6,8 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from database import get_supabase_client
 from auth import get_current_host
 from schemas import RoomCreate, RoomResponse, RoomUpdate
+from context_engine import invalidate_room, precompile_room_prompts
+from routes.websocket import notify_host_stats
 from typing import List
 
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
@@ -25,10 +27,10 @@ async def create_room(room_data: RoomCreate, current_host: dict = Depends(get_cu
     invite_link = generate_invite_link()
     
     # Ensure uniqueness (very unlikely collision, but check anyway)
-    existing = supabase.table("rooms").select("id").eq("invite_link", invite_link).execute()
+    existing = await supabase.table("rooms").select("id").eq("invite_link", invite_link).execute()
     while existing.data:
         invite_link = generate_invite_link()
-        existing = supabase.table("rooms").select("id").eq("invite_link", invite_link).execute()
+        existing = await supabase.table("rooms").select("id").eq("invite_link", invite_link).execute()
     
     room_data_dict = {
         "host_id": current_host["id"],
@@ -40,7 +42,7 @@ async def create_room(room_data: RoomCreate, current_host: dict = Depends(get_cu
         "active": True
     }
     
-    response = supabase.table("rooms").insert(room_data_dict).execute()
+    response = await supabase.table("rooms").insert(room_data_dict).execute()
     
     if not response.data:
         raise HTTPException(
@@ -48,6 +50,9 @@ async def create_room(room_data: RoomCreate, current_host: dict = Depends(get_cu
             detail="Failed to create room"
         )
     
+    precompile_room_prompts(response.data[0], current_host["name"])
+    await notify_host_stats(current_host["id"], {"total_rooms": 1, "active_rooms": 1})
+    
     return response.data[0]
 
 
@@ -56,7 +61,7 @@ async def list_rooms(current_host: dict = Depends(get_current_host)):
     """Get all rooms for the current host"""
     supabase = get_supabase_client()
     
-    response = supabase.table("rooms")\
+    response = await supabase.table("rooms")\
         .select("*")\
         .eq("host_id", current_host["id"])\
         .order("created_at", desc=True)\
@@ -70,7 +75,7 @@ async def get_room(room_id: str, current_host: dict = Depends(get_current_host))
     """Get a specific room by ID"""
     supabase = get_supabase_client()
     
-    response = supabase.table("rooms")\
+    response = await supabase.table("rooms")\
         .select("*")\
         .eq("id", room_id)\
         .eq("host_id", current_host["id"])\
@@ -91,8 +96,8 @@ async def update_room(room_id: str, room_data: RoomUpdate, current_host: dict =
     supabase = get_supabase_client()
     
     # Verify room belongs to host
-    existing = supabase.table("rooms")\
-        .select("id")\
+    existing = await supabase.table("rooms")\
+        .select("id, active")\
         .eq("id", room_id)\
         .eq("host_id", current_host["id"])\
         .execute()
@@ -118,10 +123,10 @@ async def update_room(room_id: str, room_data: RoomUpdate, current_host: dict =
     
     if not update_dict:
         # No updates, just return existing room
-        response = supabase.table("rooms").select("*").eq("id", room_id).execute()
+        response = await supabase.table("rooms").select("*").eq("id", room_id).execute()
         return response.data[0]
     
-    response = supabase.table("rooms")\
+    response = await supabase.table("rooms")\
         .update(update_dict)\
         .eq("id", room_id)\
         .execute()
@@ -132,6 +137,13 @@ async def update_room(room_id: str, room_data: RoomUpdate, current_host: dict =
             detail="Failed to update room"
         )
     
+    # Sessions in this room must pick up the new context/tone/knowledge base
+    await invalidate_room(room_id)
+    precompile_room_prompts(response.data[0], current_host["name"])
+    
+    if "active" in update_dict and update_dict["active"] != existing.data[0]["active"]:
+        await notify_host_stats(current_host["id"], {"active_rooms": 1 if update_dict["active"] else -1})
+    
     return response.data[0]
 
 
@@ -140,7 +152,7 @@ async def get_invite_link(room_id: str, current_host: dict = Depends(get_current
     """Get the full invite link URL for a room"""
     supabase = get_supabase_client()
     
-    response = supabase.table("rooms")\
+    response = await supabase.table("rooms")\
         .select("invite_link, name")\
         .eq("id", room_id)\
         .eq("host_id", current_host["id"])\
@@ -169,8 +181,8 @@ async def delete_room(room_id: str, current_host: dict = Depends(get_current_hos
     supabase = get_supabase_client()
     
     # Verify room belongs to host
-    existing = supabase.table("rooms")\
-        .select("id")\
+    existing = await supabase.table("rooms")\
+        .select("id, active")\
         .eq("id", room_id)\
         .eq("host_id", current_host["id"])\
         .execute()
@@ -182,9 +194,14 @@ async def delete_room(room_id: str, current_host: dict = Depends(get_current_hos
         )
     
     # Soft delete
-    supabase.table("rooms")\
+    await supabase.table("rooms")\
         .update({"active": False})\
         .eq("id", room_id)\
         .execute()
     
+    await invalidate_room(room_id)
+    
+    if existing.data[0]["active"]:
+        await notify_host_stats(current_host["id"], {"active_rooms": -1})
+    
     return None
@@ -1,105 +1,426 @@
 """
 WebSocket routes for real-time communication
 """
+import os
 import json
+import time
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, Set
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.routing import APIRouter
 from database import get_supabase_client
+from metrics import WS_CONNECTIONS, WS_IDENTITIES, WS_REAPED_CONNECTIONS, WS_ROOMS, WS_SLOW_CONSUMER_EVENTS
+from ws_backplane import Backplane, create_backplane
+from context_engine import get_participant_context, handle_invalidation
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
+# Outbound queue configuration
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))  # Messages buffered per connection
+# What to do when a connection's queue is full: "disconnect" (close with 1013) or "drop" (drop its oldest message)
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect")
+
+# Close code for connections dropped as slow consumers (RFC 6455: Try Again Later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Server heartbeat: every interval each socket gets {"type": "ping"}; sockets that have sent
+# nothing (pong or otherwise) for the timeout are evicted
+WS_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "20"))
+WS_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("WS_HEARTBEAT_TIMEOUT_SECONDS", "60"))
+
+# Close code for connections evicted by the heartbeat (RFC 6455: Going Away)
+HEARTBEAT_CLOSE_CODE = 1001
+
+# ICE candidates relayed within this window go out as one webrtc_ice_candidates frame
+WS_ICE_BATCH_WINDOW_MS = int(os.getenv("WS_ICE_BATCH_WINDOW_MS", "20"))
+
+# A signaling route that could not be resolved is looked up again at most this often
+WS_SIGNALING_ROUTE_RETRY_SECONDS = float(os.getenv("WS_SIGNALING_ROUTE_RETRY_SECONDS", "1"))
+
+
+def encode_message(message: dict) -> str:
+    """Serialize a message once for any number of recipients (same encoding as send_json)"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class ClientConnection:
+    """
+    One WebSocket with a bounded outbound queue drained by its own writer task
+    
+    Senders only enqueue, so a slow client backs up its own queue instead of
+    stalling whoever is sending to it.
+    """
+    
+    def __init__(self, websocket: WebSocket, connection_type: str, identifier: str):
+        self.websocket = websocket
+        self.connection_type = connection_type
+        self.identifier = identifier
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.closed = False
+        # Signaling route, resolved once at connect: the host a participant's WebRTC messages go to
+        self.host_id: Optional[str] = None
+        # When an unresolved route may be looked up again (monotonic)
+        self.route_retry_at = 0.0
+        # Last time anything was received from the client (monotonic)
+        self.last_seen = time.monotonic()
+        self._writer: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the writer task"""
+        self._writer = asyncio.create_task(self._write())
+    
+    def touch(self):
+        """Record that the client is alive (call on every received message)"""
+        self.last_seen = time.monotonic()
+    
+    def send_text(self, text: str) -> bool:
+        """Queue an already encoded message; returns False if the connection is closed"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return self._handle_overflow(text)
+    
+    def send_json(self, message: dict) -> bool:
+        """Queue a message for this connection only"""
+        return self.send_text(encode_message(message))
+    
+    def _handle_overflow(self, text: str) -> bool:
+        WS_SLOW_CONSUMER_EVENTS.labels(self.connection_type, WS_SLOW_CONSUMER_POLICY).inc()
+        if WS_SLOW_CONSUMER_POLICY == "drop":
+            # Keep the newest messages; the client is behind anyway
+            self.queue.get_nowait()
+            self.queue.put_nowait(text)
+            logger.warning(f"Send queue full for {self.connection_type}:{self.identifier}, dropped oldest message")
+            return True
+        
+        logger.warning(f"Send queue full for {self.connection_type}:{self.identifier}, disconnecting slow consumer")
+        self.close()
+        asyncio.create_task(self.close_socket(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer"))
+        return False
+    
+    async def _write(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending message to {self.connection_type}:{self.identifier}: {e}")
+            self.closed = True
+    
+    async def close_socket(self, code: int, reason: str):
+        """Close the underlying socket, ignoring errors from an already dead connection"""
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+    
+    def close(self):
+        """Stop the writer task; anything still queued is discarded"""
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+
+class IceCandidateBatcher:
+    """Coalesces ICE candidates arriving within a short window into one relayed frame"""
+    
+    def __init__(self, send: Callable[[List[dict]], Awaitable], window_seconds: float):
+        self.send = send
+        self.window_seconds = window_seconds
+        self.pending: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def add(self, candidate: dict):
+        """Queue a candidate; the batch is sent when the window closes"""
+        self.pending.append(candidate)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.window_seconds)
+        self._flush_task = None
+        await self.flush()
+    
+    async def flush(self):
+        """Send pending candidates now (e.g. before an offer, to keep signaling in order)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        batch, self.pending = self.pending, []
+        if batch:
+            await self.send(batch)
+    
+    def cancel(self):
+        """Drop pending candidates (the connection is gone)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.pending = []
+
+
 # Connection management
 class ConnectionManager:
-    """Manages WebSocket connections"""
+    """
+    Manages WebSocket connections
+    
+    An identity (connection type + host_id or session_id) may have several
+    sockets open, e.g. two dashboard tabs; all of them get its messages.
+    Room subscriptions belong to the identity and are indexed both ways, so
+    disconnecting touches only the rooms that identity joined, and rooms with
+    no subscribers left are deleted.
+    
+    Sends are delivered to this worker's sockets and published on the
+    backplane for the sockets other workers hold. Other modules can exchange
+    their own envelope kinds between workers through publish() and add_handler().
+    """
     
-    def __init__(self):
+    def __init__(self, backplane: Optional[Backplane] = None):
         # Store connections by type and identifier
-        # Format: {type: {identifier: websocket}}
+        # Format: {type: {identifier: Set[ClientConnection]}}
         # Types: "host", "participant"
-        self.connections: Dict[str, Dict[str, WebSocket]] = {
-            "host": {},  # host_id -> WebSocket
-            "participant": {}  # session_id -> WebSocket
+        self.connections: Dict[str, Dict[str, Set[ClientConnection]]] = {
+            "host": {},  # host_id -> connections
+            "participant": {}  # session_id -> connections
         }
-        # Room subscriptions: {room_id: Set[session_id or host_id]}
-        self.room_subscriptions: Dict[str, Set[str]] = {}
+        # Rooms each identity is subscribed to: {(type, identifier): Set[room_id]}
+        self.identity_rooms: Dict[Tuple[str, str], Set[str]] = {}
+        # Room subscriptions: {room_id: Set[ClientConnection]}
+        self.room_subscriptions: Dict[str, Set[ClientConnection]] = {}
+        self.backplane = backplane or Backplane()
+        # Envelope kind -> callback for envelopes that are not socket messages
+        self.handlers: Dict[str, Callable[[dict], None]] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
     
-    async def connect(self, websocket: WebSocket, connection_type: str, identifier: str):
-        """Connect a WebSocket client"""
+    async def start(self):
+        """Start receiving messages from other workers and the heartbeat"""
+        await self.backplane.start(self.deliver)
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+    
+    async def stop(self):
+        """Stop the heartbeat and the backplane"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await self.backplane.stop()
+    
+    async def _heartbeat(self):
+        ping = encode_message({"type": "ping"})
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                self.reap_idle()
+                for identities in self.connections.values():
+                    for connections in identities.values():
+                        for connection in connections:
+                            connection.send_text(ping)
+                self.report_stats()
+            except Exception as e:
+                logger.error(f"WebSocket heartbeat failed: {e}", exc_info=True)
+    
+    def reap_idle(self, timeout_seconds: float = WS_HEARTBEAT_TIMEOUT_SECONDS) -> int:
+        """Evict every connection that has sent nothing for timeout_seconds; returns how many"""
+        deadline = time.monotonic() - timeout_seconds
+        stale = [
+            connection
+            for identities in self.connections.values()
+            for connections in identities.values()
+            for connection in connections
+            if connection.last_seen < deadline
+        ]
+        for connection in stale:
+            self.disconnect(connection)
+            WS_REAPED_CONNECTIONS.labels(connection.connection_type).inc()
+            asyncio.create_task(connection.close_socket(HEARTBEAT_CLOSE_CODE, "Heartbeat timeout"))
+        if stale:
+            logger.info(f"Heartbeat evicted {len(stale)} unresponsive WebSocket connections")
+        return len(stale)
+    
+    def stats(self) -> Dict[str, int]:
+        """Counts of live connections, identities and rooms"""
+        return {
+            "host_connections": sum(len(c) for c in self.connections.get("host", {}).values()),
+            "participant_connections": sum(len(c) for c in self.connections.get("participant", {}).values()),
+            "host_identities": len(self.connections.get("host", {})),
+            "participant_identities": len(self.connections.get("participant", {})),
+            "rooms": len(self.room_subscriptions)
+        }
+    
+    def report_stats(self):
+        """Export the identity and room counts as gauges (connections are counted as they change)"""
+        stats = self.stats()
+        WS_IDENTITIES.labels("host").set(stats["host_identities"])
+        WS_IDENTITIES.labels("participant").set(stats["participant_identities"])
+        WS_ROOMS.set(stats["rooms"])
+        logger.debug(f"WebSocket stats: {stats}")
+    
+    async def connect(self, websocket: WebSocket, connection_type: str, identifier: str) -> ClientConnection:
+        """Connect a WebSocket client and start its writer"""
         await websocket.accept()
-        if connection_type not in self.connections:
-            self.connections[connection_type] = {}
-        self.connections[connection_type][identifier] = websocket
+        connection = ClientConnection(websocket, connection_type, identifier)
+        connection.start()
+        self.connections.setdefault(connection_type, {}).setdefault(identifier, set()).add(connection)
+        WS_CONNECTIONS.labels(connection_type).inc()
+        
+        # A further socket for an identity joins the rooms it is already in
+        for room_id in self.identity_rooms.get((connection_type, identifier), ()):
+            self.room_subscriptions[room_id].add(connection)
+        
         logger.info(f"WebSocket connected: {connection_type}:{identifier}")
+        return connection
     
-    def disconnect(self, connection_type: str, identifier: str):
-        """Disconnect a WebSocket client"""
-        if connection_type in self.connections:
-            self.connections[connection_type].pop(identifier, None)
-        # Remove from room subscriptions
-        for room_id, subscribers in self.room_subscriptions.items():
-            subscribers.discard(identifier)
+    def disconnect(self, connection: ClientConnection):
+        """Disconnect a WebSocket client (safe to call more than once)"""
+        connection.close()
+        connection_type, identifier = connection.connection_type, connection.identifier
+        identity = (connection_type, identifier)
+        
+        identity_connections = self.connections.get(connection_type, {}).get(identifier)
+        if identity_connections is None or connection not in identity_connections:
+            return
+        identity_connections.discard(connection)
+        WS_CONNECTIONS.labels(connection_type).dec()
+        
+        rooms = self.identity_rooms.get(identity, set())
+        for room_id in rooms:
+            self._discard_from_room(room_id, {connection})
+        
+        # The identity's subscriptions go with its last socket
+        if not identity_connections:
+            del self.connections[connection_type][identifier]
+            self.identity_rooms.pop(identity, None)
+        
         logger.info(f"WebSocket disconnected: {connection_type}:{identifier}")
     
-    async def send_personal_message(self, message: dict, connection_type: str, identifier: str):
-        """Send message to a specific connection"""
-        if connection_type in self.connections:
-            websocket = self.connections[connection_type].get(identifier)
-            if websocket:
-                try:
-                    await websocket.send_json(message)
-                    return True
-                except Exception as e:
-                    logger.error(f"Error sending message to {connection_type}:{identifier}: {e}")
-                    return False
-        return False
+    def _discard_from_room(self, room_id: str, connections: Set[ClientConnection]):
+        subscribers = self.room_subscriptions.get(room_id)
+        if subscribers is None:
+            return
+        subscribers -= connections
+        if not subscribers:
+            del self.room_subscriptions[room_id]
     
-    async def broadcast_to_room(self, message: dict, room_id: str, exclude: str = None):
-        """Broadcast message to all subscribers of a room"""
-        subscribers = self.room_subscriptions.get(room_id, set())
-        sent_count = 0
+    def deliver(self, envelope: dict):
+        """Deliver a message published by another worker to the sockets held here (or to its handler)"""
+        kind = envelope.get("kind")
+        if kind == "room":
+            self._deliver_to_room(envelope["text"], envelope["room_id"], envelope.get("exclude"))
+        elif kind == "personal":
+            self._deliver_to_identity(envelope["text"], envelope["connection_type"], envelope["identifier"])
+        elif kind in self.handlers:
+            self.handlers[kind](envelope)
+    
+    def add_handler(self, kind: str, handler: Callable[[dict], None]):
+        """Have envelopes of a kind published by other workers passed to handler (called on the event loop)"""
+        self.handlers[kind] = handler
+    
+    async def publish(self, envelope: dict) -> bool:
+        """
+        Send an envelope to the handlers of the other workers
         
-        for subscriber_id in subscribers:
-            if subscriber_id == exclude:
+        Returns False if there are no other workers to reach (single-process backplane) or publishing failed.
+        """
+        if not self.backplane.distributed:
+            return False
+        return await self.backplane.publish(envelope)
+    
+    def _deliver_to_identity(self, text: str, connection_type: str, identifier: str) -> bool:
+        sent = False
+        for connection in self.connections.get(connection_type, {}).get(identifier, ()):
+            sent = connection.send_text(text) or sent
+        return sent
+    
+    def _deliver_to_room(self, text: str, room_id: str, exclude: Optional[str]) -> int:
+        sent_count = 0
+        for connection in self.room_subscriptions.get(room_id, ()):
+            if connection.identifier == exclude:
                 continue
-            
-            # Try to find subscriber in host or participant connections
-            sent = False
-            if subscriber_id in self.connections.get("host", {}):
-                sent = await self.send_personal_message(
-                    message, "host", subscriber_id
-                )
-            elif subscriber_id in self.connections.get("participant", {}):
-                sent = await self.send_personal_message(
-                    message, "participant", subscriber_id
-                )
-            
-            if sent:
+            if connection.send_text(text):
                 sent_count += 1
+        return sent_count
+    
+    async def send_personal_message(self, message: dict, connection_type: str, identifier: str):
+        """
+        Queue a message for every connection of an identity, on any worker
         
-        logger.info(f"Broadcasted to {sent_count} subscribers in room {room_id}")
+        Returns True if it was queued on a local socket or published to other workers.
+        """
+        text = encode_message(message)
+        sent = self._deliver_to_identity(text, connection_type, identifier)
+        if self.backplane.distributed:
+            # The identity may have (further) sockets on other workers
+            published = await self.backplane.publish({
+                "kind": "personal",
+                "connection_type": connection_type,
+                "identifier": identifier,
+                "text": text
+            })
+            sent = sent or published
+        return sent
+    
+    async def broadcast_to_room(self, message: dict, room_id: str, exclude: str = None):
+        """
+        Broadcast message to all subscribers of a room, on any worker
+        
+        Encoded once and queued per connection. Returns the number of local subscribers reached.
+        """
+        text = encode_message(message)
+        sent_count = self._deliver_to_room(text, room_id, exclude)
+        if self.backplane.distributed:
+            await self.backplane.publish({"kind": "room", "room_id": room_id, "exclude": exclude, "text": text})
+        
+        logger.info(f"Broadcasted to {sent_count} local subscribers in room {room_id}")
         return sent_count
     
-    def subscribe_to_room(self, room_id: str, identifier: str):
-        """Subscribe a connection to a room"""
-        if room_id not in self.room_subscriptions:
-            self.room_subscriptions[room_id] = set()
-        self.room_subscriptions[room_id].add(identifier)
+    def subscribe_to_room(self, room_id: str, connection_type: str, identifier: str):
+        """Subscribe all of an identity's connections to a room"""
+        connections = self.connections.get(connection_type, {}).get(identifier)
+        if not connections:
+            # Nothing to deliver to; subscriptions don't outlive an identity's sockets
+            return
+        self.identity_rooms.setdefault((connection_type, identifier), set()).add(room_id)
+        self.room_subscriptions.setdefault(room_id, set()).update(connections)
         logger.info(f"{identifier} subscribed to room {room_id}")
     
-    def unsubscribe_from_room(self, room_id: str, identifier: str):
-        """Unsubscribe a connection from a room"""
-        if room_id in self.room_subscriptions:
-            self.room_subscriptions[room_id].discard(identifier)
+    def unsubscribe_from_room(self, room_id: str, connection_type: str, identifier: str):
+        """Unsubscribe all of an identity's connections from a room"""
+        rooms = self.identity_rooms.get((connection_type, identifier))
+        if rooms is None or room_id not in rooms:
+            return
+        rooms.discard(room_id)
+        self._discard_from_room(room_id, self.connections.get(connection_type, {}).get(identifier, set()))
         logger.info(f"{identifier} unsubscribed from room {room_id}")
 
 
 # Global connection manager
-manager = ConnectionManager()
+manager = ConnectionManager(create_backplane())
+# Room and session changes made on other workers drop this worker's cached participant context
+manager.add_handler("context_invalidation", handle_invalidation)
+
+
+async def resolve_signaling_route(connection: ClientConnection):
+    """
+    Look up the host a participant connection's WebRTC messages go to
+    
+    After a failed lookup (e.g. a database error) the next one waits
+    WS_SIGNALING_ROUTE_RETRY_SECONDS, so a burst of candidates costs one query.
+    """
+    if time.monotonic() < connection.route_retry_at:
+        return
+    context = await get_participant_context(connection.identifier)
+    connection.host_id = context.get("host_id") if context else None
+    if not connection.host_id:
+        connection.route_retry_at = time.monotonic() + WS_SIGNALING_ROUTE_RETRY_SECONDS
 
 
 @router.websocket("/host/{host_id}")
@@ -111,12 +432,12 @@ async def websocket_host(websocket: WebSocket, host_id: str):
     - Queue status changes
     - Room updates
     """
-    await manager.connect(websocket, "host", host_id)
+    connection = await manager.connect(websocket, "host", host_id)
     
     try:
         # Verify host exists
         supabase = get_supabase_client()
-        host_response = supabase.table("hosts")\
+        host_response = await supabase.table("hosts")\
             .select("id")\
             .eq("id", host_id)\
             .execute()
@@ -126,17 +447,17 @@ async def websocket_host(websocket: WebSocket, host_id: str):
             return
         
         # Subscribe to all host's rooms
-        rooms_response = supabase.table("rooms")\
+        rooms_response = await supabase.table("rooms")\
             .select("id")\
             .eq("host_id", host_id)\
             .eq("active", True)\
             .execute()
         
         for room in rooms_response.data or []:
-            manager.subscribe_to_room(room["id"], host_id)
+            manager.subscribe_to_room(room["id"], "host", host_id)
         
         # Send welcome message
-        await websocket.send_json({
+        connection.send_json({
             "type": "connected",
             "message": "WebSocket connected",
             "host_id": host_id
@@ -145,25 +466,29 @@ async def websocket_host(websocket: WebSocket, host_id: str):
         # Keep connection alive and handle incoming messages
         while True:
             data = await websocket.receive_text()
+            connection.touch()
             try:
                 message = json.loads(data)
                 message_type = message.get("type")
                 
                 if message_type == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    connection.send_json({"type": "pong"})
+                elif message_type == "pong":
+                    # Heartbeat reply; touch() above already recorded it
+                    pass
                 elif message_type == "subscribe_room":
                     room_id = message.get("room_id")
                     if room_id:
-                        manager.subscribe_to_room(room_id, host_id)
-                        await websocket.send_json({
+                        manager.subscribe_to_room(room_id, "host", host_id)
+                        connection.send_json({
                             "type": "subscribed",
                             "room_id": room_id
                         })
                 elif message_type == "unsubscribe_room":
                     room_id = message.get("room_id")
                     if room_id:
-                        manager.unsubscribe_from_room(room_id, host_id)
-                        await websocket.send_json({
+                        manager.unsubscribe_from_room(room_id, "host", host_id)
+                        connection.send_json({
                             "type": "unsubscribed",
                             "room_id": room_id
                         })
@@ -173,11 +498,11 @@ async def websocket_host(websocket: WebSocket, host_id: str):
                 logger.error(f"Error processing message from host {host_id}: {e}")
     
     except WebSocketDisconnect:
-        manager.disconnect("host", host_id)
         logger.info(f"Host {host_id} disconnected")
     except Exception as e:
         logger.error(f"Error in host WebSocket: {e}", exc_info=True)
-        manager.disconnect("host", host_id)
+    finally:
+        manager.disconnect(connection)
 
 
 @router.websocket("/participant/{session_id}")
@@ -189,12 +514,13 @@ async def websocket_participant(websocket: WebSocket, session_id: str):
     - Session updates
     - Host notifications
     """
-    await manager.connect(websocket, "participant", session_id)
+    connection = await manager.connect(websocket, "participant", session_id)
+    ice_batcher: Optional[IceCandidateBatcher] = None
     
     try:
         # Verify session exists and get room_id
         supabase = get_supabase_client()
-        session_response = supabase.table("sessions")\
+        session_response = await supabase.table("sessions")\
             .select("room_id, participant_id")\
             .eq("id", session_id)\
             .is_("ended_at", "null")\
@@ -207,11 +533,18 @@ async def websocket_participant(websocket: WebSocket, session_id: str):
         session = session_response.data[0]
         room_id = session["room_id"]
         
+        # Resolve the signaling route once; relaying offers and candidates then needs no queries
+        await resolve_signaling_route(connection)
+        ice_batcher = IceCandidateBatcher(
+            lambda candidates: send_webrtc_ice_candidates("host", connection.host_id, candidates, session_id),
+            WS_ICE_BATCH_WINDOW_MS / 1000
+        )
+        
         # Subscribe to room for broadcasts
-        manager.subscribe_to_room(room_id, session_id)
+        manager.subscribe_to_room(room_id, "participant", session_id)
         
         # Send welcome message
-        await websocket.send_json({
+        connection.send_json({
             "type": "connected",
             "message": "WebSocket connected",
             "session_id": session_id,
@@ -221,58 +554,59 @@ async def websocket_participant(websocket: WebSocket, session_id: str):
         # Keep connection alive and handle incoming messages
         while True:
             data = await websocket.receive_text()
+            connection.touch()
             try:
                 message = json.loads(data)
                 message_type = message.get("type")
                 
                 if message_type == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    connection.send_json({"type": "pong"})
+                elif message_type == "pong":
+                    # Heartbeat reply; touch() above already recorded it
+                    pass
                 elif message_type == "intervention_message":
                     # Participant sending message back to host (for future use)
                     # This would need to find the host_id from the session's room
                     pass
-                elif message_type == "webrtc_offer":
-                    # Forward WebRTC offer to host (for future use)
-                    # Get room_id to find host
-                    supabase = get_supabase_client()
-                    session_response = supabase.table("sessions")\
-                        .select("room_id")\
-                        .eq("id", session_id)\
-                        .execute()
-                    if session_response.data:
-                        room_id = session_response.data[0]["room_id"]
-                        room_response = supabase.table("rooms")\
-                            .select("host_id")\
-                            .eq("id", room_id)\
-                            .execute()
-                        if room_response.data:
-                            host_id = room_response.data[0]["host_id"]
-                            offer = message.get("offer")
-                            if offer:
-                                await send_webrtc_offer("host", host_id, offer, session_id)
-                elif message_type == "webrtc_answer":
-                    # Forward WebRTC answer to host
-                    target_id = message.get("target_id")
-                    answer = message.get("answer")
-                    if target_id and answer:
-                        await send_webrtc_answer("host", target_id, answer, session_id)
-                elif message_type == "webrtc_ice_candidate":
-                    # Forward ICE candidate to host
-                    target_id = message.get("target_id")
-                    candidate = message.get("candidate")
-                    if target_id and candidate:
-                        await send_webrtc_ice_candidate("host", target_id, candidate, session_id)
+                elif message_type in ("webrtc_offer", "webrtc_answer", "webrtc_ice_candidate"):
+                    # Relay WebRTC signaling to the room's host (route cached at connect,
+                    # looked up again if that failed)
+                    if not connection.host_id:
+                        await resolve_signaling_route(connection)
+                    if not connection.host_id:
+                        logger.warning(f"No signaling route for session {session_id}, dropping {message_type}")
+                        connection.send_json({
+                            "type": "signaling_error",
+                            "message": "Could not reach the host, please retry",
+                            "dropped": message_type
+                        })
+                    elif message_type == "webrtc_ice_candidate":
+                        candidate = message.get("candidate")
+                        if candidate:
+                            ice_batcher.add(candidate)
+                    elif message_type == "webrtc_offer":
+                        offer = message.get("offer")
+                        if offer:
+                            await ice_batcher.flush()
+                            await send_webrtc_offer("host", connection.host_id, offer, session_id)
+                    else:
+                        answer = message.get("answer")
+                        if answer:
+                            await ice_batcher.flush()
+                            await send_webrtc_answer("host", connection.host_id, answer, session_id)
             except json.JSONDecodeError:
                 logger.warning(f"Invalid JSON from session {session_id}: {data}")
             except Exception as e:
                 logger.error(f"Error processing message from session {session_id}: {e}")
     
     except WebSocketDisconnect:
-        manager.disconnect("participant", session_id)
         logger.info(f"Participant session {session_id} disconnected")
     except Exception as e:
         logger.error(f"Error in participant WebSocket: {e}", exc_info=True)
-        manager.disconnect("participant", session_id)
+    finally:
+        if ice_batcher is not None:
+            ice_batcher.cancel()
+        manager.disconnect(connection)
 
 
 # Helper functions to send notifications via WebSocket
@@ -301,6 +635,22 @@ async def notify_participant_queue_status(session_id: str, queue_status: dict):
     await manager.send_personal_message(message, "participant", session_id)
 
 
+async def notify_host_stats(host_id: Optional[str], delta: dict):
+    """
+    Push changes to a host's dashboard counters, e.g. {"active_sessions": -1}
+    
+    Keys match GET /api/dashboard/stats; the dashboard adds them to what it loaded.
+    """
+    delta = {key: value for key, value in delta.items() if value}
+    if not host_id or not delta:
+        return
+    message = {
+        "type": "stats_update",
+        "delta": delta
+    }
+    await manager.send_personal_message(message, "host", host_id)
+
+
 async def send_intervention_message(session_id: str, message_text: str, sender: str):
     """
     Send a message to a participant during host intervention
@@ -349,3 +699,18 @@ async def send_webrtc_ice_candidate(connection_type: str, identifier: str, candi
         "target_id": target_id
     }
     return await manager.send_personal_message(message, connection_type, identifier)
+
+
+async def send_webrtc_ice_candidates(connection_type: str, identifier: str, candidates: List[dict], target_id: str = None):
+    """
+    Send a batch of WebRTC ICE candidates to a connection in one frame
+    (a single candidate is sent as a plain webrtc_ice_candidate message)
+    """
+    if len(candidates) == 1:
+        return await send_webrtc_ice_candidate(connection_type, identifier, candidates[0], target_id)
+    message = {
+        "type": "webrtc_ice_candidates",
+        "candidates": candidates,
+        "target_id": target_id
+    }
+    return await manager.send_personal_message(message, connection_type, identifier)
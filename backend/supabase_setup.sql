@@ -63,6 +63,32 @@ CREATE TABLE queue (
     CONSTRAINT fk_room FOREIGN KEY (room_id) REFERENCES rooms(id) ON DELETE CASCADE
 );
 
+-- Transcript Turns Table (append-only; written in batches by the transcript buffer)
+CREATE TABLE transcript_turns (
+    id BIGSERIAL PRIMARY KEY,
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    role VARCHAR(20) NOT NULL, -- user, assistant
+    content TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Host Stats Table (dashboard counters, kept up to date by the triggers below)
+CREATE TABLE host_stats (
+    host_id UUID PRIMARY KEY REFERENCES hosts(id) ON DELETE CASCADE,
+    total_rooms INTEGER NOT NULL DEFAULT 0,
+    active_rooms INTEGER NOT NULL DEFAULT 0,
+    total_participants INTEGER NOT NULL DEFAULT 0,
+    active_sessions INTEGER NOT NULL DEFAULT 0,
+    pending_queue_requests INTEGER NOT NULL DEFAULT 0
+);
+
+-- Queue Engine Lease (at most one row: the worker running the in-memory queue engine)
+CREATE TABLE queue_engine_lease (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    holder TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
 -- Indexes for performance
 CREATE INDEX idx_rooms_host_id ON rooms(host_id);
 CREATE INDEX idx_rooms_invite_link ON rooms(invite_link);
@@ -73,6 +99,7 @@ CREATE INDEX idx_sessions_room_id ON sessions(room_id);
 CREATE INDEX idx_queue_room_id ON queue(room_id);
 CREATE INDEX idx_queue_status ON queue(status);
 CREATE INDEX idx_queue_position ON queue(position);
+CREATE INDEX idx_transcript_turns_session_id ON transcript_turns(session_id, id);
 
 -- Enable Row Level Security (RLS)
 -- Note: For now, we'll use permissive policies since we're using custom JWT auth
@@ -82,6 +109,9 @@ ALTER TABLE rooms ENABLE ROW LEVEL SECURITY;
 ALTER TABLE participants ENABLE ROW LEVEL SECURITY;
 ALTER TABLE sessions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE queue ENABLE ROW LEVEL SECURITY;
+ALTER TABLE transcript_turns ENABLE ROW LEVEL SECURITY;
+ALTER TABLE host_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE queue_engine_lease ENABLE ROW LEVEL SECURITY;
 
 -- RLS Policies (Permissive for custom auth - will be refined later)
 -- For custom JWT auth, we'll handle authorization in the API layer
@@ -107,6 +137,18 @@ CREATE POLICY "Allow all sessions operations" ON sessions
 CREATE POLICY "Allow all queue operations" ON queue
     FOR ALL USING (true) WITH CHECK (true);
 
+-- Transcript turns - allow all (authorization handled in API)
+CREATE POLICY "Allow all transcript_turns operations" ON transcript_turns
+    FOR ALL USING (true) WITH CHECK (true);
+
+-- Host stats - allow all (authorization handled in API)
+CREATE POLICY "Allow all host_stats operations" ON host_stats
+    FOR ALL USING (true) WITH CHECK (true);
+
+-- Queue engine lease - allow all (only used by the API workers)
+CREATE POLICY "Allow all queue_engine_lease operations" ON queue_engine_lease
+    FOR ALL USING (true) WITH CHECK (true);
+
 -- Functions for automatic timestamp updates
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -150,3 +192,231 @@ BEGIN
     RETURN max_position + 1;
 END;
 $$ LANGUAGE plpgsql;
+
+-- Function to resolve everything the context engine needs for a session in one round trip
+-- (sessions -> participants -> rooms -> hosts). Returns NULL if the session doesn't exist.
+CREATE OR REPLACE FUNCTION get_session_context(p_session_id UUID)
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'session_id', s.id,
+        'participant_id', p.id,
+        'participant_name', p.name,
+        'room_id', r.id,
+        'room_name', r.name,
+        'room_context', r.context,
+        'knowledge_base', r.knowledge_base,
+        'tone', r.tone,
+        'room_updated_at', r.updated_at,
+        'host_id', h.id,
+        'host_name', h.name
+    )
+    FROM sessions s
+    JOIN participants p ON p.id = s.participant_id
+    JOIN rooms r ON r.id = s.room_id
+    JOIN hosts h ON h.id = r.host_id
+    WHERE s.id = p_session_id;
+$$ LANGUAGE sql STABLE;
+
+-- Function to accept or decline a queue request in one round trip: checks that the host owns the
+-- room, moves the request out of 'waiting' (stamping accepted_at on accept) and returns who to notify.
+-- The row is locked, so of two concurrent accepts only one succeeds. Errors (SQLSTATE):
+--   P0002  request not found
+--   42501  room belongs to another host
+--   55000  request is no longer waiting (already accepted or declined)
+CREATE OR REPLACE FUNCTION transition_queue_request(p_queue_id UUID, p_host_id UUID, p_status TEXT)
+RETURNS JSON AS $$
+DECLARE
+    q queue%ROWTYPE;
+    room_host_id UUID;
+    participant_session_id UUID;
+BEGIN
+    IF p_status NOT IN ('accepted', 'declined') THEN
+        RAISE EXCEPTION 'Invalid queue status: %', p_status USING ERRCODE = '22023';
+    END IF;
+
+    SELECT * INTO q FROM queue WHERE id = p_queue_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Queue request not found' USING ERRCODE = 'P0002';
+    END IF;
+
+    SELECT host_id INTO room_host_id FROM rooms WHERE id = q.room_id;
+    IF room_host_id IS DISTINCT FROM p_host_id THEN
+        RAISE EXCEPTION 'Not authorized to change this request' USING ERRCODE = '42501';
+    END IF;
+
+    IF q.status <> 'waiting' THEN
+        RAISE EXCEPTION 'Queue request already %', q.status USING ERRCODE = '55000';
+    END IF;
+
+    UPDATE queue
+    SET status = p_status,
+        accepted_at = CASE WHEN p_status = 'accepted' THEN CURRENT_TIMESTAMP ELSE accepted_at END
+    WHERE id = p_queue_id;
+
+    SELECT session_id INTO participant_session_id FROM participants WHERE id = q.participant_id;
+
+    RETURN json_build_object(
+        'queue_id', q.id,
+        'room_id', q.room_id,
+        'participant_id', q.participant_id,
+        'session_id', participant_session_id,
+        'status', p_status
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to elect the worker that runs the queue engine: takes the lease if it is free or
+-- expired, or renews it for its holder. Returns whether p_holder holds the lease now.
+CREATE OR REPLACE FUNCTION claim_queue_engine(p_holder TEXT, p_lease_seconds DOUBLE PRECISION)
+RETURNS BOOLEAN AS $$
+BEGIN
+    INSERT INTO queue_engine_lease AS l (id, holder, expires_at)
+    VALUES (1, p_holder, CURRENT_TIMESTAMP + make_interval(secs => p_lease_seconds))
+    ON CONFLICT (id) DO UPDATE SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+    WHERE l.holder = p_holder OR l.expires_at < CURRENT_TIMESTAMP;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to give up the queue engine lease (on shutdown), so another worker takes over at once
+CREATE OR REPLACE FUNCTION release_queue_engine(p_holder TEXT)
+RETURNS VOID AS $$
+    DELETE FROM queue_engine_lease WHERE holder = p_holder;
+$$ LANGUAGE sql;
+
+-- Dashboard counters: every change to rooms, participants, sessions and queue adjusts the
+-- owning host's host_stats row, so GET /api/dashboard/stats reads one row instead of counting.
+CREATE OR REPLACE FUNCTION bump_host_stats(
+    p_host_id UUID,
+    p_total_rooms INTEGER,
+    p_active_rooms INTEGER,
+    p_total_participants INTEGER,
+    p_active_sessions INTEGER,
+    p_pending_queue_requests INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    IF p_host_id IS NULL OR (p_total_rooms = 0 AND p_active_rooms = 0 AND p_total_participants = 0
+                             AND p_active_sessions = 0 AND p_pending_queue_requests = 0) THEN
+        RETURN;
+    END IF;
+    -- A host being deleted cascades to its rooms; don't recreate its host_stats row
+    IF NOT EXISTS (SELECT 1 FROM hosts WHERE id = p_host_id) THEN
+        RETURN;
+    END IF;
+    INSERT INTO host_stats AS hs (host_id, total_rooms, active_rooms, total_participants, active_sessions, pending_queue_requests)
+    VALUES (p_host_id, p_total_rooms, p_active_rooms, p_total_participants, p_active_sessions, p_pending_queue_requests)
+    ON CONFLICT (host_id) DO UPDATE SET
+        total_rooms = hs.total_rooms + EXCLUDED.total_rooms,
+        active_rooms = hs.active_rooms + EXCLUDED.active_rooms,
+        total_participants = hs.total_participants + EXCLUDED.total_participants,
+        active_sessions = hs.active_sessions + EXCLUDED.active_sessions,
+        pending_queue_requests = hs.pending_queue_requests + EXCLUDED.pending_queue_requests;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION host_stats_rooms_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_host_stats(OLD.host_id, -1, CASE WHEN OLD.active THEN -1 ELSE 0 END, 0, 0, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_host_stats(NEW.host_id, 1, CASE WHEN NEW.active THEN 1 ELSE 0 END, 0, 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A room's participants, sessions and queue rows are deleted by ON DELETE CASCADE after the
+-- room itself, when their triggers can no longer find the host; take their counts back first
+CREATE OR REPLACE FUNCTION host_stats_rooms_delete_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_host_stats(
+        OLD.host_id, 0, 0,
+        -(SELECT COUNT(*) FROM participants WHERE room_id = OLD.id)::INTEGER,
+        -(SELECT COUNT(*) FROM sessions WHERE room_id = OLD.id AND ended_at IS NULL)::INTEGER,
+        -(SELECT COUNT(*) FROM queue WHERE room_id = OLD.id AND status = 'waiting')::INTEGER
+    );
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION host_stats_participants_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_host_stats((SELECT host_id FROM rooms WHERE id = OLD.room_id), 0, 0, -1, 0, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_host_stats((SELECT host_id FROM rooms WHERE id = NEW.room_id), 0, 0, 1, 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION host_stats_sessions_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.ended_at IS NULL THEN
+        PERFORM bump_host_stats((SELECT host_id FROM rooms WHERE id = OLD.room_id), 0, 0, 0, -1, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.ended_at IS NULL THEN
+        PERFORM bump_host_stats((SELECT host_id FROM rooms WHERE id = NEW.room_id), 0, 0, 0, 1, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION host_stats_queue_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'waiting' THEN
+        PERFORM bump_host_stats((SELECT host_id FROM rooms WHERE id = OLD.room_id), 0, 0, 0, 0, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'waiting' THEN
+        PERFORM bump_host_stats((SELECT host_id FROM rooms WHERE id = NEW.room_id), 0, 0, 0, 0, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updates only fire on the columns that move a counter
+CREATE TRIGGER host_stats_rooms AFTER INSERT OR DELETE OR UPDATE OF host_id, active ON rooms
+    FOR EACH ROW EXECUTE FUNCTION host_stats_rooms_trigger();
+
+CREATE TRIGGER host_stats_rooms_children BEFORE DELETE ON rooms
+    FOR EACH ROW EXECUTE FUNCTION host_stats_rooms_delete_trigger();
+
+CREATE TRIGGER host_stats_participants AFTER INSERT OR DELETE OR UPDATE OF room_id ON participants
+    FOR EACH ROW EXECUTE FUNCTION host_stats_participants_trigger();
+
+CREATE TRIGGER host_stats_sessions AFTER INSERT OR DELETE OR UPDATE OF room_id, ended_at ON sessions
+    FOR EACH ROW EXECUTE FUNCTION host_stats_sessions_trigger();
+
+CREATE TRIGGER host_stats_queue AFTER INSERT OR DELETE OR UPDATE OF room_id, status ON queue
+    FOR EACH ROW EXECUTE FUNCTION host_stats_queue_trigger();
+
+-- Recount host_stats from scratch; run once after adding the table to an existing database
+-- (SELECT refresh_host_stats();) or to repair drift
+CREATE OR REPLACE FUNCTION refresh_host_stats()
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO host_stats (host_id, total_rooms, active_rooms, total_participants, active_sessions, pending_queue_requests)
+    SELECT
+        h.id,
+        (SELECT COUNT(*) FROM rooms r WHERE r.host_id = h.id),
+        (SELECT COUNT(*) FROM rooms r WHERE r.host_id = h.id AND r.active),
+        (SELECT COUNT(*) FROM participants p JOIN rooms r ON r.id = p.room_id WHERE r.host_id = h.id),
+        (SELECT COUNT(*) FROM sessions s JOIN rooms r ON r.id = s.room_id WHERE r.host_id = h.id AND s.ended_at IS NULL),
+        (SELECT COUNT(*) FROM queue q JOIN rooms r ON r.id = q.room_id WHERE r.host_id = h.id AND q.status = 'waiting')
+    FROM hosts h
+    ON CONFLICT (host_id) DO UPDATE SET
+        total_rooms = EXCLUDED.total_rooms,
+        active_rooms = EXCLUDED.active_rooms,
+        total_participants = EXCLUDED.total_participants,
+        active_sessions = EXCLUDED.active_sessions,
+        pending_queue_requests = EXCLUDED.pending_queue_requests;
+END;
+$$ LANGUAGE plpgsql;
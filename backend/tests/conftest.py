@@ -0,0 +1,27 @@
+"""
+Test setup: make the backend modules importable and point them at dummy credentials
+
+The database is always benchmarks.fakes.FakePostgrest; nothing here talks to Supabase.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read at import time by database.py; the values only have to look valid
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+import pytest
+import database
+from benchmarks.fakes import FakePostgrest
+
+
+@pytest.fixture
+def fake_db():
+    """FakePostgrest plugged in as the app's database"""
+    fake = FakePostgrest()
+    database._db_instance = database.Database(transport=fake)
+    yield fake
+    database._db_instance = None
@@ -0,0 +1,44 @@
+"""
+Tests for context_engine: cached participant context invalidated across workers
+"""
+import asyncio
+import context_engine
+import routes.websocket
+from ws_backplane import Backplane
+
+
+class RecordingBackplane(Backplane):
+    """Stands in for Redis: records what this worker publishes"""
+
+    distributed = True
+
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, envelope):
+        self.published.append(envelope)
+        return True
+
+
+def test_invalidations_reach_other_workers(monkeypatch):
+    backplane = RecordingBackplane()
+    monkeypatch.setattr(routes.websocket.manager, "backplane", backplane)
+    context_engine._context_cache.clear()
+    for session_id, room_id in (("s1", "room-a"), ("s2", "room-a"), ("s3", "room-b")):
+        context_engine._context_cache.set(session_id, {"room_id": room_id})
+
+    asyncio.run(context_engine.invalidate_room("room-a"))
+    asyncio.run(context_engine.invalidate_session("s3"))
+
+    assert backplane.published == [
+        {"kind": "context_invalidation", "room_id": "room-a"},
+        {"kind": "context_invalidation", "session_id": "s3"},
+    ]
+
+    # Another worker applies what this one published
+    for session_id, room_id in (("s1", "room-a"), ("s3", "room-b"), ("s4", "room-b")):
+        context_engine._context_cache.set(session_id, {"room_id": room_id})
+    for envelope in backplane.published:
+        routes.websocket.manager.deliver(envelope)
+    assert list(context_engine._context_cache.keys()) == ["s4"]
+    context_engine._context_cache.clear()
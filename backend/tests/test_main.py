@@ -0,0 +1,78 @@
+"""
+Tests for main: the voice endpoints and their helpers
+"""
+import asyncio
+from urllib.parse import quote, unquote
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+import main
+from main import text_header
+
+
+def test_text_header_fits_short_reply():
+    assert text_header("Hello, world", 2048) == (quote("Hello, world"), False)
+
+
+def test_text_header_cuts_long_reply_at_a_character_boundary():
+    reply = "नमस्ते दुनिया " * 100
+    value, truncated = text_header(reply, 2048)
+    assert truncated
+    assert len(value) <= 2048
+    # Never splits a percent-encoded character
+    assert reply.startswith(unquote(value, errors="strict"))
+    assert len(value) > 2048 - len(quote("न"))
+
+
+class StubTTSCache:
+    """Streams canned audio chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self, text, voice):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def stage_count(stage, mode, outcome):
+    return REGISTRY.get_sample_value(
+        "sia_voice_stage_duration_seconds_count",
+        {"stage": stage, "voice": main.ENGLISH_VOICE, "room": "none", "mode": mode, "outcome": outcome}
+    ) or 0.0
+
+
+def test_stream_stages_are_recorded_when_the_stream_ends(monkeypatch):
+    async def reply(audio, session_id):
+        return "Hello there.", False
+
+    monkeypatch.setattr(main, "generate_reply", reply)
+    monkeypatch.setattr(main, "get_tts_cache", lambda: StubTTSCache([b"a", b"b"]))
+    before = {stage: stage_count(stage, "stream", "ok") for stage in ("first_audio", "tts", "total")}
+
+    async def turn():
+        response = await main.process_audio_stream(audio=None, session_id=None)
+        assert "first_audio;dur=" in response.headers["Server-Timing"]
+        # Nothing is recorded until the body has been sent
+        assert stage_count("total", "stream", "ok") == before["total"]
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    assert asyncio.run(turn()) == b"ab"
+    for stage, count in before.items():
+        assert stage_count(stage, "stream", "ok") == count + 1
+
+
+def test_stream_failure_is_recorded_as_error(monkeypatch):
+    async def reply(audio, session_id):
+        return "Hello there.", False
+
+    monkeypatch.setattr(main, "generate_reply", reply)
+    monkeypatch.setattr(main, "get_tts_cache", lambda: StubTTSCache([]))
+    before = stage_count("total", "stream", "error")
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(main.process_audio_stream(audio=None, session_id=None))
+
+    assert raised.value.status_code == 500
+    assert "Server-Timing" in raised.value.headers
+    assert stage_count("total", "stream", "error") == before + 1
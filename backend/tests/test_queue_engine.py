@@ -0,0 +1,294 @@
+"""
+Tests for queue_engine: the RoomQueue Fenwick index against a plain sorted list,
+and the engine's enqueue/dequeue, startup duplicate repair, rejected writes and
+leader election over FakePostgrest
+"""
+import json
+import random
+import asyncio
+import httpx
+import pytest
+import queue_engine
+from queue_engine import QueueEngine, QueueUnavailable, RoomQueue
+from routes.websocket import ConnectionManager
+from ws_backplane import Backplane
+
+
+def assert_matches(room_queue: RoomQueue, naive: list):
+    """Check every RoomQueue answer against a sorted list of waiting positions"""
+    assert len(room_queue) == len(naive)
+    assert room_queue.last_position() == (naive[-1] if naive else 0)
+    assert [entry["position"] for entry in room_queue.ordered()] == naive
+    for place, position in enumerate(naive, start=1):
+        assert room_queue.rank(position) == place
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_room_queue_matches_naive_list(seed):
+    rng = random.Random(seed)
+    room_queue = RoomQueue()
+    naive = []
+    for _ in range(2000):
+        if naive and rng.random() < 0.45:
+            # Dequeue anywhere in line, mostly from the front as hosts do
+            position = naive[0] if rng.random() < 0.5 else rng.choice(naive)
+            assert room_queue.remove(position)["position"] == position
+            naive.remove(position)
+        else:
+            # Enqueue at the end; gaps (from repaired positions) force rebuilds
+            position = room_queue.last_position() + (1 if rng.random() < 0.9 else rng.randint(2, 100))
+            room_queue.add({"position": position})
+            naive.append(position)
+        assert_matches(room_queue, naive)
+
+
+def test_room_queue_rebuilds_around_live_positions():
+    room_queue = RoomQueue()
+    for position in range(1, 1001):
+        room_queue.add({"position": position})
+    for position in range(1, 1000):
+        room_queue.remove(position)
+    # Only position 1000 is left; an entry past the end of the tree rebuilds it from there
+    far = len(room_queue.tree) + 10
+    room_queue.add({"position": far})
+    assert room_queue.base == 999
+    assert len(room_queue.tree) - 1 >= 2 * (far - 999)
+    assert_matches(room_queue, [1000, far])
+    # Dropping back to one entry keeps indexing positions relative to the new base
+    room_queue.remove(1000)
+    room_queue.add({"position": far + 1})
+    assert_matches(room_queue, [far, far + 1])
+
+
+def test_room_queue_remove_missing_position():
+    room_queue = RoomQueue()
+    room_queue.add({"position": 1})
+    assert room_queue.remove(2) is None
+    assert_matches(room_queue, [1])
+    room_queue.remove(1)
+    assert_matches(room_queue, [])
+
+
+def test_engine_enqueue_dequeue_places(fake_db):
+    async def scenario():
+        engine = QueueEngine(notify_interval=60)
+        entries = [engine.enqueue("room-a", f"participant-{i}", f"session-{i}") for i in range(5)]
+        other = engine.enqueue("room-b", "participant-x", None)
+
+        assert [engine.position_of(entry) for entry in entries] == [1, 2, 3, 4, 5]
+        assert engine.position_of(other) == 1
+
+        assert engine.dequeue(entries[1]["id"]) is entries[1]
+        assert engine.dequeue(entries[1]["id"]) is None
+        assert [engine.position_of(entry) for entry in engine.waiting("room-a")] == [1, 2, 3, 4]
+        assert engine.get_for_participant("participant-1") is None
+        assert engine.get_for_session("session-3") is entries[3]
+
+        # A new entry goes behind the last waiting one, not into the freed position
+        late = engine.enqueue("room-a", "participant-late", None)
+        assert late["position"] == 6
+        assert engine.position_of(late) == 5
+
+        assert await engine.flush()
+        stored = {row["id"]: row["position"] for row in fake_db.rows("queue")}
+        assert stored[late["id"]] == 6
+        assert len(stored) == 7
+        if engine._notify_task is not None:
+            engine._notify_task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_engine_load_repairs_duplicates(fake_db):
+    room = "room-a"
+    for participant, session in (("p1", "s1"), ("p2", "s2"), ("p3", "s3")):
+        fake_db.insert("participants", {"id": participant, "room_id": room, "session_id": session})
+    first = fake_db.insert("queue", {"participant_id": "p1", "room_id": room, "position": 1, "requested_at": "2024-01-01T00:00:01"})
+    same_position = fake_db.insert("queue", {"participant_id": "p2", "room_id": room, "position": 1, "requested_at": "2024-01-01T00:00:02"})
+    same_participant = fake_db.insert("queue", {"participant_id": "p1", "room_id": room, "position": 3, "requested_at": "2024-01-01T00:00:03"})
+    after = fake_db.insert("queue", {"participant_id": "p3", "room_id": room, "position": 4, "requested_at": "2024-01-01T00:00:04"})
+    fake_db.insert("queue", {"participant_id": "p3", "room_id": "room-b", "position": 1, "status": "accepted"})
+
+    async def scenario():
+        engine = QueueEngine(notify_interval=60)
+        await engine.load()
+
+        assert [entry["id"] for entry in engine.waiting(room)] == [first["id"], same_position["id"], after["id"]]
+        assert engine.get(same_position["id"])["position"] == 2
+        assert engine.get(same_participant["id"]) is None
+        assert engine.get_for_participant("p1")["id"] == first["id"]
+        assert engine.get_for_session("s2")["id"] == same_position["id"]
+        assert [engine.position_of(entry) for entry in engine.waiting(room)] == [1, 2, 3]
+        assert "room-b" not in engine.rooms
+
+        assert await engine.flush()
+
+    asyncio.run(scenario())
+
+    assert fake_db.get("queue", same_position["id"])["position"] == 2
+    assert fake_db.get("queue", same_participant["id"])["status"] == "expired"
+    assert fake_db.get("queue", first["id"])["position"] == 1
+
+
+def test_flush_drops_entries_the_database_rejects(fake_db, monkeypatch):
+    import routes.websocket
+
+    handle = fake_db.handle_async_request
+
+    async def handle_async_request(request: httpx.Request) -> httpx.Response:
+        # Like the participant foreign key after a hard delete: one unknown participant fails the whole insert
+        if request.method == "POST" and request.url.path.endswith("/queue"):
+            if any(row["participant_id"] == "deleted" for row in json.loads(request.content)):
+                return httpx.Response(409, json={"code": "23503", "message": "rejected", "details": None, "hint": None})
+        return await handle(request)
+
+    monkeypatch.setattr(fake_db, "handle_async_request", handle_async_request)
+
+    statuses = []
+
+    async def record_status(session_id, status):
+        statuses.append((session_id, status))
+
+    monkeypatch.setattr(routes.websocket, "notify_participant_queue_status", record_status)
+
+    async def scenario():
+        engine = QueueEngine(notify_interval=60)
+        first = engine.enqueue("room-a", "p1", "s1")
+        rejected = engine.enqueue("room-a", "deleted", "s-deleted", "host-a")
+        last = engine.enqueue("room-a", "p3", "s3")
+
+        assert await engine.flush()
+        assert engine.pending == []
+        assert [entry["id"] for entry in engine.waiting("room-a")] == [first["id"], last["id"]]
+        assert engine.get_for_participant("deleted") is None
+
+        # Later writes are not held up
+        engine.dequeue(first["id"])
+        engine._write(("update", first["id"], {"status": "accepted"}))
+        assert await engine.flush()
+        if engine._notify_task is not None:
+            engine._notify_task.cancel()
+        return first, rejected
+
+    first, rejected = asyncio.run(scenario())
+    assert sorted(row["participant_id"] for row in fake_db.rows("queue")) == ["p1", "p3"]
+    assert fake_db.get("queue", first["id"])["status"] == "accepted"
+    assert statuses == [("s-deleted", {"queue_id": rejected["id"], "status": "expired"})]
+
+
+class LinkedBackplane(Backplane):
+    """Delivers each published envelope straight to the other backplanes in the same list"""
+
+    distributed = True
+
+    def __init__(self, peers: list):
+        self.peers = peers
+        peers.append(self)
+
+    async def start(self, deliver):
+        self.deliver = deliver
+
+    async def publish(self, envelope):
+        for peer in self.peers:
+            if peer is not self:
+                peer.deliver(envelope)
+        return True
+
+
+def test_one_worker_leads_and_the_others_forward(fake_db, monkeypatch):
+    monkeypatch.setattr(queue_engine, "QUEUE_ENGINE_LEASE_SECONDS", 0.3)
+    peers = []
+
+    async def worker():
+        manager = ConnectionManager(LinkedBackplane(peers))
+        await manager.backplane.start(manager.deliver)
+        return QueueEngine(notify_interval=60, manager=manager)
+
+    async def scenario():
+        first, second = await worker(), await worker()
+        assert await first.sync()
+        # Both workers start; the second one forwards to the lease holder
+        created = await second.request("call_host", room_id="room-a", participant_id="p1", session_id="s1")
+        again = await second.request("call_host", room_id="room-a", participant_id="p1", session_id="s1")
+        assert first.is_leader and not second.is_leader
+        assert (created["created"], created["position"]) == (True, 1)
+        assert (again["created"], again["entry"]["id"]) == (False, created["entry"]["id"])
+        assert first.get_for_participant("p1")["id"] == created["entry"]["id"]
+        assert second.entries == {}
+        assert (await second.request("status", participant_id="p1", session_id="s1"))["position"] == 1
+
+        # The leader hands over on stop; the next one rebuilds from the table
+        await first.stop()
+        await asyncio.sleep(0.2)
+        assert second.is_leader
+        assert (await second.request("status", participant_id="p1", session_id="s1"))["entry"]["id"] == created["entry"]["id"]
+        assert await second.request("dequeue", queue_id=created["entry"]["id"])
+        await second.stop()
+
+    fake_db.insert("participants", {"id": "p1", "room_id": "room-a", "session_id": "s1"})
+    asyncio.run(scenario())
+
+
+def test_operations_fail_without_a_reachable_leader(fake_db):
+    fake_db.queue_engine_lease = ("another-worker", float("inf"))
+
+    async def scenario():
+        # A single-process backplane can't reach the other worker's engine
+        engine = QueueEngine(notify_interval=60, manager=ConnectionManager())
+        with pytest.raises(QueueUnavailable):
+            await engine.request("status", participant_id="p1", session_id="s1")
+        assert not await engine.sync()
+        await engine.stop()
+
+    asyncio.run(scenario())
+
+
+def test_operations_waiting_for_the_rebuild_fail_instead_of_hanging(fake_db, monkeypatch):
+    async def failing_load():
+        raise RuntimeError("database down")
+
+    async def scenario():
+        engine = QueueEngine(notify_interval=60, manager=ConnectionManager())
+        monkeypatch.setattr(engine, "load", failing_load)
+        monkeypatch.setattr(queue_engine, "QUEUE_LOAD_WAIT_SECONDS", 0.1)
+        # The rebuild keeps failing: operations give up after the wait
+        with pytest.raises(QueueUnavailable):
+            await engine.request("status", participant_id="p1", session_id="s1")
+        assert not await engine.sync()
+
+        # Losing the lease fails operations still waiting right away
+        monkeypatch.setattr(queue_engine, "QUEUE_LOAD_WAIT_SECONDS", 60)
+        waiting = asyncio.create_task(engine.request("status", participant_id="p1", session_id="s1"))
+        await asyncio.sleep(0.05)
+        engine._step_down()
+        with pytest.raises(QueueUnavailable):
+            await asyncio.wait_for(waiting, 1)
+        await engine.stop()
+
+    asyncio.run(scenario())
+
+
+def test_dequeue_is_retried_until_a_leader_answers(fake_db, monkeypatch):
+    monkeypatch.setattr(queue_engine, "QUEUE_WRITE_RETRY_SECONDS", 0.01)
+
+    async def scenario():
+        engine = QueueEngine(notify_interval=60, manager=ConnectionManager())
+        created = await engine.request("call_host", room_id="room-a", participant_id="p1", session_id="s1")
+        request = engine.request
+        unanswered = [2]
+
+        async def flaky_request(operation, **arguments):
+            if operation == "dequeue" and unanswered[0]:
+                unanswered[0] -= 1
+                raise QueueUnavailable("no leader answered")
+            return await request(operation, **arguments)
+
+        monkeypatch.setattr(engine, "request", flaky_request)
+        await engine.request_dequeue(created["entry"]["id"])
+        assert engine.get_for_participant("p1") is not None
+        await asyncio.sleep(0.1)
+        assert engine.get_for_participant("p1") is None
+        assert not engine._dequeue_retries
+        await engine.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+"""
+Tests for the queue routes, run through the app against FakePostgrest
+"""
+import asyncio
+import httpx
+import pytest
+import auth
+import database
+import queue_engine
+import routes.queue
+from postgrest.exceptions import APIError
+
+
+@pytest.fixture
+def room(fake_db):
+    """A host's room with one participant in an active session"""
+    host = fake_db.insert("hosts", {"email": "host@test.local", "name": "Host", "password_hash": "not-used"})
+    room = fake_db.insert("rooms", {"host_id": host["id"], "name": "Room", "invite_link": "invite"})
+    participant = fake_db.insert("participants", {"room_id": room["id"], "name": "Participant"})
+    session = fake_db.insert("sessions", {"participant_id": participant["id"], "room_id": room["id"]})
+    fake_db.tables["participants"].update(participant, {"session_id": session["id"]})
+    queue_engine._queue_engine = None
+    yield {"host_id": host["id"], "room_id": room["id"], "participant_id": participant["id"], "session_id": session["id"]}
+    queue_engine._queue_engine = None
+
+
+def test_call_host_sends_stats_delta_to_room_host(room, monkeypatch):
+    import main
+
+    deltas = []
+
+    async def record_delta(host_id, delta):
+        deltas.append((host_id, delta))
+
+    monkeypatch.setattr(routes.queue, "notify_host_stats", record_delta)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            first = await client.post("/api/queue/call-host", json={"session_id": room["session_id"]})
+            again = await client.post("/api/queue/call-host", json={"session_id": room["session_id"]})
+        await queue_engine.get_queue_engine().stop()
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first.status_code == 201, first.text
+    assert first.json()["position"] == 1
+    assert again.json()["message"] == "You are already in the queue at position 1"
+    assert deltas == [(room["host_id"], {"pending_queue_requests": 1})]
+
+
+def test_fake_rejects_ambiguous_embed(fake_db):
+    # sessions has two foreign keys to rooms (the inline REFERENCES and fk_room)
+    async def select(columns):
+        return await database.get_supabase_client().table("sessions").select(columns).execute()
+
+    with pytest.raises(APIError) as error:
+        asyncio.run(select("room_id, rooms(host_id)"))
+    assert error.value.code == "PGRST201"
+    assert asyncio.run(select("room_id, rooms!fk_room(host_id)")).data == []
+
+
+def test_accept_during_startup_load_does_not_leave_stale_entry(fake_db, room):
+    import main
+
+    queued = fake_db.insert("queue", {"participant_id": room["participant_id"], "room_id": room["room_id"], "position": 1})
+    token = auth.create_access_token({"sub": room["host_id"]})
+
+    async def scenario():
+        engine = queue_engine.get_queue_engine()
+        # The accept arrives while the startup rebuild is still reading the queue table
+        fake_db.latency_seconds = 0.05
+        engine.start()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            accepted = await client.post(f"/api/queue/{queued['id']}/accept", headers={"Authorization": f"Bearer {token}"})
+            status = await client.get(f"/api/queue/status/{room['session_id']}")
+        await engine.stop()
+        return accepted, status
+
+    accepted, status = asyncio.run(scenario())
+    assert accepted.status_code == 200, accepted.text
+    assert status.json()["status"] == "none"
+    assert fake_db.get("queue", queued["id"])["status"] == "accepted"
+
+
+def test_rejoined_participant_finds_request_from_old_session(fake_db, room):
+    import main
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            called = await client.post("/api/queue/call-host", json={"session_id": room["session_id"]})
+            # The participant leaves and joins again on a new session
+            fake_db.tables["sessions"].update(fake_db.get("sessions", room["session_id"]), {"ended_at": "2024-01-01T00:00:00"})
+            new_session = fake_db.insert("sessions", {"participant_id": room["participant_id"], "room_id": room["room_id"]})
+            status = await client.get(f"/api/queue/status/{new_session['id']}")
+            again = await client.post("/api/queue/call-host", json={"session_id": new_session["id"]})
+        engine = queue_engine.get_queue_engine()
+        entry = engine.get(called.json()["queue_id"])
+        await engine.stop()
+        return called, status, again, entry, new_session
+
+    called, status, again, entry, new_session = asyncio.run(scenario())
+    assert status.json()["status"] == "waiting"
+    assert status.json()["queue_id"] == called.json()["queue_id"]
+    assert again.json()["message"] == "You are already in the queue at position 1"
+    # Place-in-line pushes go to the session the participant is on now
+    assert entry["session_id"] == new_session["id"]
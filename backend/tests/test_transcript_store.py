@@ -0,0 +1,58 @@
+"""
+Tests for transcript_store: batches with bad rows, and database outages
+"""
+import json
+import asyncio
+import httpx
+from transcript_store import TranscriptBuffer
+
+
+def reject_inserts(fake_db, reject):
+    """Answer transcript_turns inserts with reject(rows) -> (status, SQLSTATE) instead of storing them"""
+    handle = fake_db.handle_async_request
+
+    async def handle_async_request(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and request.url.path.endswith("/transcript_turns"):
+            error = reject(json.loads(request.content))
+            if error is not None:
+                status_code, code = error
+                return httpx.Response(status_code, json={"code": code, "message": "rejected", "details": None, "hint": None})
+        return await handle(request)
+
+    fake_db.handle_async_request = handle_async_request
+
+
+def test_flush_drops_only_rows_the_database_rejects(fake_db):
+    sessions = [fake_db.insert("sessions", {"participant_id": "p", "room_id": "r"})["id"] for _ in range(3)]
+    known = set(sessions)
+    # Like the transcript_turns foreign key: any unknown session fails the whole insert
+    reject_inserts(fake_db, lambda rows: (409, "23503") if any(row["session_id"] not in known for row in rows) else None)
+
+    buffer = TranscriptBuffer(batch_size=1000, flush_interval=60, max_pending=1000)
+    for i in range(10):
+        buffer.record(sessions[i % 3], "user", f"turn {i}")
+        if i in (2, 7):
+            buffer.record("deleted-session", "user", "lost")
+
+    asyncio.run(buffer.flush())
+
+    assert buffer.pending == []
+    assert [row["content"] for row in fake_db.rows("transcript_turns")] == [f"turn {i}" for i in range(10)]
+
+
+def test_flush_keeps_batch_while_database_is_down(fake_db):
+    session_id = fake_db.insert("sessions", {"participant_id": "p", "room_id": "r"})["id"]
+    down = [True]
+    reject_inserts(fake_db, lambda rows: (503, "PGRST000") if down[0] else None)
+
+    buffer = TranscriptBuffer(batch_size=1000, flush_interval=60, max_pending=1000)
+    buffer.record(session_id, "user", "hello")
+    buffer.record(session_id, "assistant", "hi")
+
+    asyncio.run(buffer.flush())
+    assert [turn["content"] for turn in buffer.pending] == ["hello", "hi"]
+
+    down[0] = False
+    asyncio.run(buffer.flush())
+    assert buffer.pending == []
+    assert len(fake_db.rows("transcript_turns")) == 2
@@ -0,0 +1,71 @@
+"""
+Tests for tts_cache: edge-tts concurrency limit and shared streaming of misses
+"""
+import asyncio
+import pytest
+import tts_cache
+from benchmarks.fakes import FakeCommunicate
+
+
+class CountingCommunicate(FakeCommunicate):
+    """FakeCommunicate recording how many syntheses run at once"""
+
+    latency_seconds = 0.02
+    running = 0
+    peak = 0
+    started = 0
+
+    async def stream(self):
+        cls = CountingCommunicate
+        cls.started += 1
+        cls.running += 1
+        cls.peak = max(cls.peak, cls.running)
+        try:
+            async for message in super().stream():
+                yield message
+        finally:
+            cls.running -= 1
+
+
+async def read_all(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    CountingCommunicate.running = CountingCommunicate.peak = CountingCommunicate.started = 0
+    monkeypatch.setattr(tts_cache.edge_tts, "Communicate", CountingCommunicate)
+    monkeypatch.setattr(tts_cache, "TTS_MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(tts_cache, "_tts_semaphore", None)
+    return tts_cache.TTSCache(tmp_path, 10 ** 9, 3600)
+
+
+def test_syntheses_are_capped(cache):
+    async def scenario():
+        await asyncio.gather(
+            *(cache.synthesize(f"sentence {i}", "voice") for i in range(10)),
+            *(read_all(cache.stream(f"streamed {i}", "voice")) for i in range(10))
+        )
+
+    asyncio.run(scenario())
+    assert CountingCommunicate.started == 20
+    assert CountingCommunicate.peak == 3
+
+
+def test_stalled_stream_reader_does_not_block_others(cache):
+    async def scenario():
+        stalled = cache.stream("hello", "voice")
+        await stalled.__anext__()
+        # Same text while the first reader sits on its first chunk
+        audio = await asyncio.wait_for(
+            asyncio.gather(*(read_all(cache.stream("hello", "voice")) for _ in range(2))),
+            timeout=5
+        )
+        await stalled.aclose()
+        return audio
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert len(first) == FakeCommunicate.chunks * FakeCommunicate.chunk_bytes
+    assert CountingCommunicate.started == 1
+    assert cache.lookup(tts_cache.tts_cache_key("hello", "voice")) is not None
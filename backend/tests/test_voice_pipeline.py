@@ -0,0 +1,57 @@
+"""
+Tests for voice_pipeline: cutting streamed LLM deltas into sentences and spotting the end meeting tag
+"""
+from voice_pipeline import SentenceSplitter
+
+
+def split(deltas):
+    """Feed deltas one by one; returns (sentences as emitted, with the flushed tail last, end_meeting)"""
+    splitter = SentenceSplitter()
+    sentences = []
+    for delta in deltas:
+        sentences += splitter.feed(delta)
+    return sentences + splitter.flush(), splitter.end_meeting
+
+
+def test_sentences_are_cut_at_terminators_across_deltas():
+    sentences, end_meeting = split(["Hello there", ". How are", " you? Fine", "! नमस्ते। Done"])
+    assert sentences == ["Hello there.", "How are you?", "Fine!", "नमस्ते।", "Done"]
+    assert not end_meeting
+
+
+def test_sentence_is_not_emitted_before_its_terminator_is_followed_by_whitespace():
+    splitter = SentenceSplitter()
+    # "3." could still be "3.5"
+    assert splitter.feed("Version 3.") == []
+    assert splitter.feed("5 is out. Next") == ["Version 3.5 is out."]
+
+
+def test_end_meeting_tag_split_across_deltas():
+    sentences, end_meeting = split(["Bye [END_", "MEET", "ING]"])
+    assert sentences == ["Bye"]
+    assert end_meeting
+
+
+def test_partial_tag_is_held_back_not_spoken():
+    splitter = SentenceSplitter()
+    # The sentence before the partial tag goes out; the tag's start is held back
+    assert splitter.feed("Thanks. See you. [END_") == ["Thanks.", "See you."]
+    assert splitter.feed("MEETING]") == []
+    assert splitter.flush() == []
+    assert splitter.end_meeting
+
+
+def test_end_meeting_tag_after_sentence_terminator():
+    sentences, end_meeting = split(["Goodbye everyone. ", "[END_MEETING]"])
+    assert sentences == ["Goodbye everyone."]
+    assert end_meeting
+
+    sentences, end_meeting = split(["All done![END_MEETING]"])
+    assert sentences == ["All done!"]
+    assert end_meeting
+
+
+def test_bracket_that_is_not_the_tag_is_spoken():
+    sentences, end_meeting = split(["See [END_", "NOTES] for details. Thanks"])
+    assert sentences == ["See [END_NOTES] for details.", "Thanks"]
+    assert not end_meeting
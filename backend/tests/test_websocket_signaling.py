@@ -0,0 +1,90 @@
+"""
+Tests for WebRTC signaling relay on the participant WebSocket
+"""
+import json
+import asyncio
+from fastapi import WebSocketDisconnect
+import routes.websocket
+
+
+class ScriptedWebSocket:
+    """Plays a list of client messages to the endpoint, then disconnects; records what was sent"""
+
+    def __init__(self, messages):
+        self.incoming = [json.dumps(message) for message in messages]
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        # Let the connection's writer task drain what the last message produced
+        await asyncio.sleep(0.01)
+        if not self.incoming:
+            raise WebSocketDisconnect()
+        return self.incoming.pop(0)
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        raise AssertionError(f"closed with {code}: {reason}")
+
+
+def run_participant(session_id, messages):
+    websocket = ScriptedWebSocket(messages)
+    asyncio.run(routes.websocket.websocket_participant(websocket, session_id))
+    return websocket.sent
+
+
+def test_unresolved_route_is_looked_up_again(fake_db, monkeypatch):
+    session = fake_db.insert("sessions", {"participant_id": "p", "room_id": "r"})
+    lookups = []
+
+    async def flaky_context(session_id):
+        # The lookup at connect hits a database error; later ones succeed
+        lookups.append(session_id)
+        return None if len(lookups) == 1 else {"host_id": "host-1"}
+
+    relayed = []
+
+    async def record_offer(connection_type, identifier, offer, target_id=None):
+        relayed.append((connection_type, identifier, offer, target_id))
+
+    monkeypatch.setattr(routes.websocket, "get_participant_context", flaky_context)
+    monkeypatch.setattr(routes.websocket, "send_webrtc_offer", record_offer)
+    monkeypatch.setattr(routes.websocket, "WS_SIGNALING_ROUTE_RETRY_SECONDS", 0)
+
+    sent = run_participant(session["id"], [
+        {"type": "webrtc_offer", "offer": {"sdp": "first"}},
+        {"type": "webrtc_offer", "offer": {"sdp": "second"}},
+    ])
+
+    assert [message["type"] for message in sent] == ["connected"]
+    assert lookups == [session["id"], session["id"]]
+    assert relayed == [
+        ("host", "host-1", {"sdp": "first"}, session["id"]),
+        ("host", "host-1", {"sdp": "second"}, session["id"]),
+    ]
+
+
+def test_client_is_told_when_route_cannot_be_resolved(fake_db, monkeypatch):
+    session = fake_db.insert("sessions", {"participant_id": "p", "room_id": "r"})
+    lookups = []
+
+    async def no_context(session_id):
+        lookups.append(session_id)
+        return None
+
+    monkeypatch.setattr(routes.websocket, "get_participant_context", no_context)
+    monkeypatch.setattr(routes.websocket, "WS_SIGNALING_ROUTE_RETRY_SECONDS", 60)
+
+    sent = run_participant(session["id"], [
+        {"type": "webrtc_answer", "answer": {"sdp": "answer"}},
+        {"type": "webrtc_ice_candidate", "candidate": {"candidate": "c"}},
+    ])
+
+    errors = [message for message in sent if message["type"] == "signaling_error"]
+    assert [error["dropped"] for error in errors] == ["webrtc_answer", "webrtc_ice_candidate"]
+    # Within the retry delay the failed lookup isn't repeated
+    assert len(lookups) == 1
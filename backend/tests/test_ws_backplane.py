@@ -0,0 +1,113 @@
+"""
+Tests for ws_backplane: Redis pub/sub between workers
+"""
+import asyncio
+import ws_backplane
+from ws_backplane import RedisBackplane
+
+
+class FakeRedis:
+    """Stands in for a Redis server: one pub/sub bus shared by every worker's client"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    async def publish(self, channel, data):
+        for subscribed, queue in self.subscribers:
+            if subscribed == channel:
+                queue.put_nowait({"type": "message", "channel": channel, "data": data})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append((channel, self.queue))
+        # Not a "message"; the listener has to skip it
+        self.queue.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        self.redis.subscribers = [entry for entry in self.redis.subscribers if entry[1] is not self.queue]
+
+
+def worker(redis):
+    backplane = RedisBackplane("redis://localhost:6379/0", "sia:test")
+    backplane.redis = redis
+    return backplane
+
+
+def test_envelopes_reach_other_workers_but_not_their_origin():
+    async def scenario():
+        redis = FakeRedis()
+        first, second = worker(redis), worker(redis)
+        received = {"first": [], "second": []}
+        await first.start(received["first"].append)
+        await second.start(received["second"].append)
+        await asyncio.sleep(0)
+
+        assert await first.publish({"kind": "room", "room_id": "r1"})
+        assert await second.publish({"kind": "personal", "session_id": "s1"})
+        await asyncio.sleep(0.01)
+
+        await first.stop()
+        await second.stop()
+        return first, second, received
+
+    first, second, received = asyncio.run(scenario())
+    assert received["first"] == [{"kind": "personal", "session_id": "s1", "origin": second.origin}]
+    assert received["second"] == [{"kind": "room", "room_id": "r1", "origin": first.origin}]
+
+
+def test_publish_failure_is_reported():
+    class DownRedis(FakeRedis):
+        async def publish(self, channel, data):
+            raise ConnectionError("connection refused")
+
+    backplane = worker(DownRedis())
+    assert asyncio.run(backplane.publish({"kind": "room"})) is False
+
+
+def test_subscription_is_retried_after_a_failure(monkeypatch):
+    monkeypatch.setattr(ws_backplane, "WS_BACKPLANE_RETRY_SECONDS", 0)
+
+    class FlakyRedis(FakeRedis):
+        def __init__(self):
+            super().__init__()
+            self.subscribe_attempts = 0
+
+        def pubsub(self, ignore_subscribe_messages=False):
+            return FlakyPubSub(self)
+
+    class FlakyPubSub(FakePubSub):
+        async def subscribe(self, channel):
+            self.redis.subscribe_attempts += 1
+            if self.redis.subscribe_attempts == 1:
+                raise ConnectionError("connection refused")
+            await super().subscribe(channel)
+
+    async def scenario():
+        redis = FlakyRedis()
+        listener, publisher = worker(redis), worker(redis)
+        received = []
+        await listener.start(received.append)
+        await asyncio.sleep(0.01)
+        await publisher.publish({"kind": "room", "room_id": "r1"})
+        await asyncio.sleep(0.01)
+        await listener.stop()
+        return redis, received
+
+    redis, received = asyncio.run(scenario())
+    assert redis.subscribe_attempts == 2
+    assert [envelope["room_id"] for envelope in received] == ["r1"]
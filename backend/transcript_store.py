@@ -0,0 +1,119 @@
+"""
+Transcript Store - Write-behind buffer for conversation turns
+
+Turns from /process-audio are appended in memory and flushed to the
+transcript_turns table in batches (on size, on a timer and when a session
+ends), so recording a transcript never adds a database write to a turn.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import get_supabase_client, is_row_error
+
+logger = logging.getLogger(__name__)
+
+# Flush configuration
+TRANSCRIPT_FLUSH_BATCH_SIZE = int(os.getenv("TRANSCRIPT_FLUSH_BATCH_SIZE", "50"))
+TRANSCRIPT_FLUSH_INTERVAL_SECONDS = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL_SECONDS", "2"))
+TRANSCRIPT_MAX_PENDING = int(os.getenv("TRANSCRIPT_MAX_PENDING", "10000"))  # Drop oldest beyond this if the DB is down
+
+
+class TranscriptBuffer:
+    """In-memory write-behind buffer in front of the transcript_turns table"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer_task: Optional[asyncio.Task] = None
+
+    def record(self, session_id: str, role: str, content: str):
+        """Buffer one conversation turn (role: "user" or "assistant")"""
+        self.pending.append({
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.utcnow().isoformat()
+        })
+
+        if len(self.pending) > self.max_pending:
+            dropped = len(self.pending) - self.max_pending
+            del self.pending[:dropped]
+            logger.warning(f"Transcript buffer full, dropped {dropped} oldest turns")
+
+        if len(self.pending) >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Write all buffered turns in one batch insert"""
+        async with self._flush_lock:
+            if not self.pending:
+                return
+
+            batch = self.pending
+            self.pending = []
+            unwritten = await self._insert(batch)
+            if unwritten:
+                # Put what is left back in front of anything recorded meanwhile and retry next tick
+                self.pending = unwritten + self.pending
+            if len(unwritten) < len(batch):
+                logger.info(f"Flushed {len(batch) - len(unwritten)} transcript turns")
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert a batch; returns the turns to retry
+
+        A batch rejected because of its rows is split in halves until the bad
+        turns are isolated and dropped, so one of them cannot block the buffer.
+        """
+        try:
+            supabase = get_supabase_client()
+            await supabase.table("transcript_turns").insert(batch).execute()
+            return []
+        except Exception as e:
+            if not is_row_error(e):
+                logger.error(f"Failed to flush {len(batch)} transcript turns: {e}")
+                return batch
+            if len(batch) == 1:
+                logger.error(f"Dropped transcript turn for session {batch[0]['session_id']}: {e}")
+                return []
+        middle = len(batch) // 2
+        return await self._insert(batch[:middle]) + await self._insert(batch[middle:])
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._timer_task is None:
+            self._timer_task = asyncio.create_task(self._run_timer())
+
+    async def stop(self):
+        """Stop the periodic flush task and write anything still buffered"""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        await self.flush()
+
+
+# Global transcript buffer
+_transcript_buffer: Optional[TranscriptBuffer] = None
+
+
+def get_transcript_buffer() -> TranscriptBuffer:
+    """Get or create transcript buffer instance (singleton pattern)"""
+    global _transcript_buffer
+    if _transcript_buffer is None:
+        _transcript_buffer = TranscriptBuffer(
+            TRANSCRIPT_FLUSH_BATCH_SIZE,
+            TRANSCRIPT_FLUSH_INTERVAL_SECONDS,
+            TRANSCRIPT_MAX_PENDING
+        )
+    return _transcript_buffer
@@ -0,0 +1,326 @@
+"""
+TTS Cache - Content-addressed edge-tts output with a size- and age-bounded LRU
+
+Each (text, voice) pair is synthesized once into static/tts/<sha256>.mp3 and
+served from there until it is evicted. A shared semaphore caps how many
+edge-tts connections are open per worker.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import aiofiles
+import edge_tts
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+TTS_CACHE_DIR = Path(__file__).parent / "static" / "tts"
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # 200 MB
+TTS_CACHE_MAX_AGE_SECONDS = int(os.getenv("TTS_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 60 * 60)))  # 7 days
+TTS_STREAM_CHUNK_BYTES = 16 * 1024  # Read size when streaming a cached file
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))  # In-flight edge-tts syntheses per worker
+
+# Concurrency limit (created lazily)
+_tts_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_tts_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore that bounds concurrent edge-tts syntheses"""
+    global _tts_semaphore
+    if _tts_semaphore is None:
+        _tts_semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+    return _tts_semaphore
+
+
+def tts_cache_key(text: str, voice: str) -> str:
+    """Get the content-addressed cache key for a (text, voice) pair"""
+    return hashlib.sha256(f"{voice}\n{text}".encode("utf-8")).hexdigest()
+
+
+class _Synthesis:
+    """
+    One in-flight edge-tts stream, shared by every request for the same (text, voice)
+
+    A producer task appends chunks; each reader walks the buffer at its own
+    pace, so a slow or stalled client never holds up the others.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: bytes):
+        """Append a chunk for the readers"""
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Mark the stream complete (or failed)"""
+        self.done = True
+        self.error = error
+        self._wake()
+
+    async def read(self) -> AsyncIterator[bytes]:
+        """Yield every chunk from the start, waiting for new ones until the stream is done"""
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise RuntimeError(f"TTS synthesis failed: {self.error}") from self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class TTSCache:
+    """LRU disk cache in front of edge_tts.Communicate"""
+
+    def __init__(self, directory: Path, max_bytes: int, max_age_seconds: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        # key -> (size_bytes, created_at), least recently used first
+        self.entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.total_bytes = 0
+        # Per-key locks so concurrent requests for the same reply synthesize once, with
+        # how many requests hold or wait for each (the lock is dropped when that reaches 0)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        # Streams being synthesized, joined by later requests for the same key
+        self._synthesizing: Dict[str, _Synthesis] = {}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Index mp3 files left over from a previous run, oldest first"""
+        files = []
+        for path in self.directory.glob("*.mp3"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for mtime, key, size in sorted(files):
+            self.entries[key] = (size, mtime)
+            self.total_bytes += size
+
+        self._evict()
+        logger.info(f"TTS cache loaded {len(self.entries)} entries ({self.total_bytes} bytes)")
+
+    @asynccontextmanager
+    async def _key_lock(self, key: str):
+        """Hold the lock for a cache key; it is discarded once nobody holds or waits for it"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+            self._lock_users[key] = 0
+        self._lock_users[key] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._locks[key]
+                del self._lock_users[key]
+
+    def path_for(self, key: str) -> Path:
+        """Get the file path for a cache key"""
+        return self.directory / f"{key}.mp3"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Return the cached file for a key if present and fresh, marking it recently used"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        _, created_at = entry
+        path = self.path_for(key)
+        if time.time() - created_at > self.max_age_seconds or not path.exists():
+            self._remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return path
+
+    async def synthesize(self, text: str, voice: str) -> str:
+        """
+        Get the cache key for (text, voice), synthesizing with edge-tts on a miss
+
+        Returns:
+            Cache key; the audio is at path_for(key)
+        """
+        key = tts_cache_key(text, voice)
+        if self.lookup(key):
+            logger.info(f"TTS cache hit: {key[:12]}")
+            return key
+
+        async with self._key_lock(key):
+            # Another request may have synthesized it while we waited
+            if self.lookup(key):
+                return key
+
+            path = self.path_for(key)
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                async with get_tts_semaphore():
+                    communicate = edge_tts.Communicate(text=text, voice=voice)
+                    await communicate.save(str(temp_path))
+                os.replace(temp_path, path)
+            finally:
+                if temp_path.exists():
+                    temp_path.unlink()
+
+            self._add(key, path.stat().st_size)
+            logger.info(f"TTS cache miss, synthesized: {key[:12]}")
+            return key
+
+    async def stream(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        """
+        Stream mp3 bytes for (text, voice) as they become available
+
+        Cache hits are read from disk. On a miss, a producer task streams from
+        edge-tts into a shared buffer and the cache; this request and any
+        concurrent ones for the same key read from that buffer as chunks arrive.
+        """
+        key = tts_cache_key(text, voice)
+        synthesis = self._synthesizing.get(key)
+        if synthesis is None:
+            path = self.lookup(key)
+            if path is not None:
+                logger.info(f"TTS cache hit: {key[:12]}")
+                async for chunk in self._read_file(path):
+                    yield chunk
+                return
+
+            logger.info(f"TTS cache miss, streaming: {key[:12]}")
+            synthesis = self._synthesizing[key] = _Synthesis()
+            synthesis.task = asyncio.create_task(self._produce(key, text, voice, synthesis))
+
+        async with aclosing(synthesis.read()) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def _read_file(self, path: Path) -> AsyncIterator[bytes]:
+        async with aiofiles.open(path, "rb") as f:
+            while True:
+                chunk = await f.read(TTS_STREAM_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def _produce(self, key: str, text: str, voice: str, synthesis: _Synthesis):
+        """
+        Fill a shared synthesis buffer, holding the key lock but never waiting on a reader
+
+        Runs to completion even if every reader has gone, so the result is cached.
+        """
+        try:
+            async with self._key_lock(key):
+                # synthesize() may have produced the file while we waited for the lock
+                path = self.lookup(key)
+                chunks = self._read_file(path) if path is not None else self._stream_and_store(key, text, voice)
+                async with aclosing(chunks):
+                    async for chunk in chunks:
+                        synthesis.publish(chunk)
+        except asyncio.CancelledError:
+            synthesis.finish(RuntimeError("cancelled"))
+            raise
+        except Exception as e:
+            logger.error(f"TTS stream synthesis failed for {key[:12]}: {e}")
+            synthesis.finish(e)
+        else:
+            synthesis.finish()
+        finally:
+            if self._synthesizing.get(key) is synthesis:
+                del self._synthesizing[key]
+
+    async def _stream_and_store(self, key: str, text: str, voice: str) -> AsyncIterator[bytes]:
+        """
+        Yield edge-tts audio chunks while writing them to the cache file
+
+        Holds a TTS semaphore slot throughout; only _produce() consumes this, so a
+        slow client never keeps the slot.
+        """
+        path = self.path_for(key)
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        size = 0
+        try:
+            async with get_tts_semaphore(), aiofiles.open(temp_path, "wb") as f:
+                communicate = edge_tts.Communicate(text=text, voice=voice)
+                async for message in communicate.stream():
+                    if message["type"] != "audio":
+                        continue
+                    data = message["data"]
+                    await f.write(data)
+                    size += len(data)
+                    yield data
+            # Only complete syntheses are cached
+            os.replace(temp_path, path)
+            self._add(key, size)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def _add(self, key: str, size: int):
+        """Record a new entry and evict down to the size limit"""
+        if key in self.entries:
+            self.total_bytes -= self.entries[key][0]
+        self.entries[key] = (size, time.time())
+        self.entries.move_to_end(key)
+        self.total_bytes += size
+        self._evict()
+
+    def _remove(self, key: str):
+        """Drop an entry and delete its file"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry[0]
+        try:
+            self.path_for(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not delete TTS cache file {key}: {e}")
+
+    def _evict(self):
+        """Evict expired entries, then least recently used ones until under max_bytes"""
+        now = time.time()
+        expired = [key for key, (_, created_at) in self.entries.items() if now - created_at > self.max_age_seconds]
+        for key in expired:
+            self._remove(key)
+
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            oldest_key = next(iter(self.entries))
+            self._remove(oldest_key)
+
+
+# Global TTS cache instance
+_tts_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> TTSCache:
+    """Get or create TTS cache instance (singleton pattern)"""
+    global _tts_cache
+    if _tts_cache is None:
+        _tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, TTS_CACHE_MAX_AGE_SECONDS)
+    return _tts_cache
@@ -0,0 +1,143 @@
+"""
+Voice pipeline - Groq speech-to-text, chat completion and sentence streaming
+
+All upstream calls go through the async Groq client so they never block the
+event loop, and a shared semaphore caps how many are in flight per worker.
+"""
+import os
+import re
+import asyncio
+import logging
+from typing import AsyncIterator, Optional, List, Dict
+from groq import AsyncGroq
+
+logger = logging.getLogger(__name__)
+
+# Upstream configuration
+STT_MODEL = "whisper-large-v3"
+LLM_MODEL = "llama-3.1-8b-instant"
+END_MEETING_TAG = "[END_MEETING]"
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "16"))  # In-flight Groq calls per worker
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "30"))
+
+# Sentence terminators (incl. Devanagari danda) followed by whitespace
+SENTENCE_END_PATTERN = re.compile(r"[.!?\u0964]+[\"')\]]*\s+")
+
+# Shared client and concurrency limit (created lazily)
+_groq_client: Optional[AsyncGroq] = None
+_groq_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_groq_client() -> AsyncGroq:
+    """Get or create the shared async Groq client"""
+    global _groq_client
+    if _groq_client is None:
+        api_key = os.getenv("GROQ_API_KEY", "")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not set in environment variables")
+        _groq_client = AsyncGroq(api_key=api_key, timeout=GROQ_TIMEOUT_SECONDS)
+    return _groq_client
+
+
+def get_groq_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore that bounds concurrent Groq calls"""
+    global _groq_semaphore
+    if _groq_semaphore is None:
+        _groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+    return _groq_semaphore
+
+
+async def transcribe_audio(audio_bytes: bytes, filename: str, content_type: str) -> str:
+    """Transcribe audio bytes with Groq Whisper"""
+    groq_client = get_groq_client()
+    async with get_groq_semaphore():
+        transcription = await groq_client.audio.transcriptions.create(
+            file=(filename, audio_bytes, content_type),
+            model=STT_MODEL,
+            language="en"
+        )
+    return transcription.text
+
+
+async def get_chat_completion(messages: List[Dict[str, str]]) -> str:
+    """Get a chat completion from Groq Llama"""
+    groq_client = get_groq_client()
+    async with get_groq_semaphore():
+        chat_completion = await groq_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500
+        )
+    return chat_completion.choices[0].message.content
+
+
+async def stream_chat_completion(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Stream a chat completion from Groq Llama, yielding text deltas as they arrive"""
+    groq_client = get_groq_client()
+    async with get_groq_semaphore():
+        stream = await groq_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            stream=True
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class SentenceSplitter:
+    """
+    Cuts a stream of LLM text deltas into complete sentences
+
+    The end meeting tag is stripped even when it arrives split across deltas;
+    any tail that could still be the start of the tag is held back.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.end_meeting = False
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a text delta and return any sentences it completed"""
+        self.buffer += delta
+        self._strip_tag()
+
+        # Never cut into a tail that might still become the end meeting tag
+        safe_length = len(self.buffer) - _partial_tag_length(self.buffer)
+
+        sentences = []
+        start = 0
+        for match in SENTENCE_END_PATTERN.finditer(self.buffer, 0, safe_length):
+            sentence = self.buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text remains once the stream has finished"""
+        self._strip_tag()
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        return [remainder] if remainder else []
+
+    def _strip_tag(self):
+        if END_MEETING_TAG in self.buffer:
+            self.end_meeting = True
+            self.buffer = self.buffer.replace(END_MEETING_TAG, "")
+
+
+def _partial_tag_length(text: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of the end meeting tag"""
+    for length in range(min(len(text), len(END_MEETING_TAG) - 1), 0, -1):
+        if END_MEETING_TAG.startswith(text[-length:]):
+            return length
+    return 0
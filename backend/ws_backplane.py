@@ -0,0 +1,117 @@
+"""
+WebSocket Backplane - Routes room broadcasts and personal messages between workers
+
+Each worker delivers to its own sockets directly and publishes the message on
+the backplane; every other worker delivers it to the sockets it holds. Messages
+are published already encoded, so a broadcast is still serialized once.
+
+Implementations:
+    memory  single process; nothing to forward (default)
+    redis   Redis pub/sub, for several uvicorn workers or pods
+"""
+import os
+import json
+import uuid
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Backplane configuration
+WS_BACKPLANE = os.getenv("WS_BACKPLANE", "memory")  # memory or redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+WS_BACKPLANE_CHANNEL = os.getenv("WS_BACKPLANE_CHANNEL", "sia:ws")
+WS_BACKPLANE_RETRY_SECONDS = float(os.getenv("WS_BACKPLANE_RETRY_SECONDS", "1"))
+
+# Receives envelopes published by other workers
+DeliverCallback = Callable[[Dict[str, Any]], Any]
+
+
+class Backplane:
+    """In-process backplane: a single worker holds every socket, so there is nothing to forward"""
+
+    # Whether messages can reach sockets held by other processes
+    distributed = False
+
+    async def start(self, deliver: DeliverCallback):
+        """Start receiving envelopes from other workers"""
+
+    async def publish(self, envelope: Dict[str, Any]) -> bool:
+        """Forward an envelope to the other workers; returns False if that failed"""
+        return True
+
+    async def stop(self):
+        """Stop receiving and release connections"""
+
+
+class RedisBackplane(Backplane):
+    """Redis pub/sub backplane on a single channel"""
+
+    distributed = True
+
+    def __init__(self, url: str, channel: str):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("WS_BACKPLANE=redis requires the redis package (pip install redis)")
+
+        self.redis = aioredis.from_url(url)
+        self.channel = channel
+        # Lets a worker skip its own messages, which it has already delivered locally
+        self.origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: DeliverCallback):
+        self._listener = asyncio.create_task(self._listen(deliver))
+        logger.info(f"Redis WebSocket backplane started on channel {self.channel}")
+
+    async def _listen(self, deliver: DeliverCallback):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    envelope = json.loads(message["data"])
+                    if envelope.get("origin") == self.origin:
+                        continue
+                    deliver(envelope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket backplane subscription failed, retrying: {e}")
+                await asyncio.sleep(WS_BACKPLANE_RETRY_SECONDS)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def publish(self, envelope: Dict[str, Any]) -> bool:
+        try:
+            await self.redis.publish(self.channel, json.dumps({**envelope, "origin": self.origin}))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to publish to WebSocket backplane: {e}")
+            return False
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.redis.aclose()
+
+
+def create_backplane() -> Backplane:
+    """Create the backplane selected by WS_BACKPLANE"""
+    if WS_BACKPLANE == "redis":
+        return RedisBackplane(REDIS_URL, WS_BACKPLANE_CHANNEL)
+    if WS_BACKPLANE != "memory":
+        logger.warning(f"Unknown WS_BACKPLANE {WS_BACKPLANE!r}, using the in-process backplane")
+    return Backplane()
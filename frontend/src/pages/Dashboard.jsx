@@ -1,21 +1,71 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Link } from 'react-router-dom';
 import { dashboardAPI } from '../utils/api';
+import { createHostWebSocket } from '../utils/websocket';
+import { useAuth } from '../contexts/AuthContext';
+
+// Re-fetches of /stats in a row while deltas keep arriving mid-fetch
+const MAX_STATS_RELOADS = 3;
 
 function Dashboard() {
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const { user } = useAuth();
+  // Deltas received during each in-flight /stats fetch (whose row may or may not include them)
+  const inFlightLoads = useRef(new Set());
 
   useEffect(() => {
     loadStats();
   }, []);
 
+  // Apply counter deltas pushed by the server instead of polling /stats; the row is
+  // re-fetched whenever the socket (re)connects, since deltas sent while it was down are lost
+  useEffect(() => {
+    if (!user?.id) return;
+
+    const ws = createHostWebSocket(
+      user.id,
+      (message) => {
+        if (message.type === 'stats_update' && message.delta) {
+          if (inFlightLoads.current.size) {
+            for (const deltas of inFlightLoads.current) deltas.push(message.delta);
+            return;
+          }
+          setStats((current) => {
+            if (!current) return current;
+            const next = { ...current };
+            for (const [key, value] of Object.entries(message.delta)) {
+              next[key] = (next[key] || 0) + value;
+            }
+            return next;
+          });
+        }
+      },
+      () => {},
+      () => loadStats()
+    );
+    ws.connect();
+
+    return () => ws.disconnect();
+  }, [user]);
+
   const loadStats = async () => {
     try {
-      setLoading(true);
-      const data = await dashboardAPI.getStats();
-      setStats(data);
+      for (let attempt = 1; attempt <= MAX_STATS_RELOADS; attempt++) {
+        const deltas = [];
+        inFlightLoads.current.add(deltas);
+        let data;
+        try {
+          data = await dashboardAPI.getStats();
+        } finally {
+          inFlightLoads.current.delete(deltas);
+        }
+        setStats(data);
+        // A delta that raced the fetch may be counted in the row or not; fetch again to settle
+        if (!deltas.length) break;
+      }
+      setError('');
     } catch (err) {
       setError(err.message || 'Failed to load statistics');
     } finally {
@@ -214,7 +214,7 @@ function Meeting() {
         audioRef.current.pause();
       }
       
-      const audio = new Audio(data.audio_url + '?t=' + Date.now());
+      const audio = new Audio(data.audio_url);
       audioRef.current = audio;
       
       // Start talking animation when audio starts
@@ -227,6 +227,10 @@ export function handleWebRTCSignaling(webrtcClient, message) {
     case 'webrtc_ice_candidate':
       webrtcClient.handleIceCandidate(message.candidate);
       break;
+    case 'webrtc_ice_candidates':
+      // Candidates the server coalesced into one frame
+      message.candidates.forEach(candidate => webrtcClient.handleIceCandidate(candidate));
+      break;
     default:
       console.warn('Unknown WebRTC message type:', message.type);
   }
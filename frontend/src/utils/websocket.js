@@ -36,6 +36,11 @@ class WebSocketClient {
       this.ws.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
+          // Answer the server heartbeat, or the server drops the connection as dead
+          if (data.type === 'ping') {
+            this.send({ type: 'pong' });
+            return;
+          }
           if (this.onMessage) this.onMessage(data);
         } catch (error) {
           console.error('Error parsing WebSocket message:', error);
@@ -104,16 +109,20 @@ class WebSocketClient {
  * @param {string} hostId - Host ID
  * @param {function} onMessage - Callback for received messages
  * @param {function} onError - Callback for errors
+ * @param {function} [onOpen] - Callback once connected (also after each reconnect)
  * @returns {WebSocketClient} WebSocket client instance
  */
-export function createHostWebSocket(hostId, onMessage, onError) {
+export function createHostWebSocket(hostId, onMessage, onError, onOpen) {
   const url = `${WS_BASE_URL}/ws/host/${hostId}`;
   
   return new WebSocketClient(
     url,
     onMessage,
     onError,
-    () => console.log('Host WebSocket connected'),
+    () => {
+      console.log('Host WebSocket connected');
+      if (onOpen) onOpen();
+    },
     () => console.log('Host WebSocket disconnected')
   );
 }